@@ -0,0 +1,78 @@
+"""
+Measures peak and retained memory of the estimate pipeline, comparing entities that keep
+their svgelements paths (the previous behaviour) against the flattened GeometryStore.
+
+Usage: python benchmarks/bench_memory.py [--entities 5000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from src.parsers.svg_parser import SVGParser
+from src.engine.calculator import LaserTimeCalculator
+
+
+def write_synthetic_svg(filepath: str, count: int, seed: int = 3):
+    """Mixed sheet of rectangles, circles and Bézier contours on the three laser layers."""
+    rng = np.random.default_rng(seed)
+    colors = ['#FF0000', '#00FF00', '#0000FF']
+    with open(filepath, 'w') as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="1200" height="900">\n')
+        for i in range(count):
+            x, y = rng.uniform(0, 1150, size=2)
+            size = rng.uniform(2, 40)
+            color = colors[i % 3]
+            kind = i % 3
+            if kind == 0:
+                f.write(f'<rect x="{x:.3f}" y="{y:.3f}" width="{size:.3f}" height="{size / 2:.3f}" '
+                        f'stroke="{color}" fill="none"/>\n')
+            elif kind == 1:
+                f.write(f'<circle cx="{x:.3f}" cy="{y:.3f}" r="{size / 2:.3f}" stroke="{color}" fill="none"/>\n')
+            else:
+                f.write(f'<path d="M {x:.3f} {y:.3f} C {x + size:.3f} {y - size:.3f} {x + 2 * size:.3f} {y + size:.3f} '
+                        f'{x + 3 * size:.3f} {y:.3f} Z" stroke="{color}" fill="none"/>\n')
+        f.write('</svg>\n')
+
+
+def measure(label: str, filepath: str, keep_paths: bool):
+    calculator = LaserTimeCalculator(10.0, 50.0, 100.0, 200.0)
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+
+    entities = SVGParser(filepath, ppi=25.4, keep_paths=keep_paths).parse()
+    if keep_paths:
+        calculator.calculate_total_job_scalar(entities)
+    else:
+        calculator.calculate_total_job(entities)
+
+    elapsed = time.perf_counter() - t0
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed:>8.2f} s {peak / 2**20:>10.1f} MiB {retained / 2**20:>12.1f} MiB")
+    del entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory use of the estimate pipeline.")
+    parser.add_argument("--entities", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "sheet.svg")
+        write_synthetic_svg(filepath, args.entities)
+        print(f"{args.entities} entities, {os.path.getsize(filepath) / 2**20:.1f} MiB SVG")
+        print(f"{'pipeline':<24} {'time':>10} {'peak':>14} {'retained':>16}")
+        measure("svgelements paths", filepath, keep_paths=True)
+        measure("geometry store", filepath, keep_paths=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares the KD-tree transit optimizer against the plain nearest-neighbour loop.
+
+Usage: python benchmarks/bench_optimizer.py [--sizes 1000 10000 100000] [--max-reference 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from src.engine.optimizer import TransitOptimizer, nearest_neighbour_reference
+
+
+def synthetic_sheet(count: int, seed: int = 42):
+    """Small contours scattered over a 1200x900 mm sheet."""
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform((0, 0), (1200, 900), size=(count, 2))
+    ends = starts + rng.uniform(-3, 3, size=(count, 2))
+    return starts, ends, np.ones(count, dtype=bool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transit path optimizers.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-reference", type=int, default=10000,
+                        help="Largest size the O(N^2) reference loop is run on; above it the time is extrapolated")
+    args = parser.parse_args()
+
+    print(f"{'entities':>10} {'reference (s)':>16} {'kd-tree (s)':>12} {'speedup':>9}")
+    reference_rate = None
+    for size in args.sizes:
+        starts, ends, valid = synthetic_sheet(size)
+
+        t0 = time.perf_counter()
+        fast_order = TransitOptimizer().order(starts, ends, valid)
+        fast_time = time.perf_counter() - t0
+
+        if size <= args.max_reference:
+            t0 = time.perf_counter()
+            reference_order = nearest_neighbour_reference(starts, ends, valid)
+            reference_time = time.perf_counter() - t0
+            reference_rate = reference_time / (size ** 2)
+            assert list(fast_order) == reference_order, "orderings differ"
+            reference_label = f"{reference_time:.3f}"
+        elif reference_rate is not None:
+            reference_time = reference_rate * size ** 2
+            reference_label = f"~{reference_time:.1f} (est.)"
+        else:
+            reference_time = None
+            reference_label = "skipped"
+
+        speedup = f"{reference_time / fast_time:.0f}x" if reference_time else "-"
+        print(f"{size:>10} {reference_label:>16} {fast_time:>12.3f} {speedup:>9}")
+
+
+if __name__ == "__main__":
+    main()
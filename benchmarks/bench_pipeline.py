@@ -0,0 +1,163 @@
+"""
+Times every stage of the estimate pipeline on the seeded workloads of `benchmarks.generators`
+and compares the results with a stored baseline.
+
+Each (scenario, size) case runs in a fresh process, so its peak RSS is not inflated by earlier
+cases. Every case runs `--repeat` times and each stage keeps its median time, so one slow run
+does not read as a regression. A stage regresses when it is both `--threshold` (relative) and
+`--min-delta` seconds slower than the baseline; peak memory uses the same relative threshold. The exit code is 1
+when anything regressed, so the script can gate CI. Everything runs offline.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 1000 10000 100000] [--scenarios nested_sheet ...]
+    python benchmarks/bench_pipeline.py --save-baseline            # record benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --threshold 0.15           # compare against it
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generators import SCENARIOS, write_scenario
+
+STAGES = ('parse', 'containment', 'order', 'flatten', 'evaluate')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+CALCULATOR_KWARGS = dict(cut_speed=20.0, vector_engrave_speed=200.0, raster_engrave_speed=300.0, transit_speed=500.0)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_case(filepath: str, repeat: int) -> Dict[str, Any]:
+    """Runs the pipeline stage by stage, keeping the median of `repeat` runs of every stage."""
+    from src.parsers.svg_parser import SVGParser
+    from src.engine.calculator import LaserTimeCalculator
+    from src.engine.containment import build_containment
+    from src.engine.geometry import GeometryStore
+    from src.engine.kinematics import flatten_job
+    from src.engine.optimizer import transit_order
+    from src.engine.plan import JobPlan
+
+    rss_before = peak_rss_mb()
+    runs = {stage: [] for stage in STAGES}
+
+    def timed(stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        runs[stage].append(time.perf_counter() - started)
+        return result
+
+    for _ in range(repeat):
+        entities = timed('parse', lambda: SVGParser(filepath, ppi=25.4).parse())
+        store, indices = GeometryStore.for_entities(entities)
+        hierarchy = timed('containment', build_containment, store, indices)
+        order = timed('order', transit_order, store, indices, None, hierarchy.parents)
+        job = timed('flatten', flatten_job, store, indices[order])
+        calculator = LaserTimeCalculator(**CALCULATOR_KWARGS)
+        plan = JobPlan(job=job, order=order, merge_raster=False, sections={})
+        timed('evaluate', calculator.evaluate_plan, plan)
+
+    median = {stage: statistics.median(seconds) for stage, seconds in runs.items()}
+    return {
+        'entities': len(entities),
+        'segments': int(len(job.burn_lengths)),
+        'repeat': repeat,
+        'stages': {stage: round(seconds, 4) for stage, seconds in median.items()},
+        'total_seconds': round(sum(median.values()), 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+def run_suite(scenarios: List[str], sizes: List[int], seed: int, repeat: int, workdir: str) -> Dict[str, Any]:
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for scenario in scenarios:
+        for size in sizes:
+            filepath = write_scenario(workdir, scenario, size, seed)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                case = pool.submit(run_case, filepath, repeat).result()
+            key = f"{scenario}/{size}"
+            results[key] = case
+            stages = ' '.join(f"{stage}={case['stages'][stage]:.3f}" for stage in STAGES)
+            print(f"{key:<24} {case['entities']:>7} entities  {stages}  "
+                  f"peak={case['peak_rss_mb']:.0f}MB", flush=True)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta: float) -> List[str]:
+    """Returns one message per stage or memory figure that regressed beyond the thresholds."""
+    regressions = []
+    for key, case in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for stage in STAGES:
+            now, before = case['stages'][stage], reference['stages'].get(stage)
+            if before is not None and now > before * (1 + threshold) and now - before > min_delta:
+                regressions.append(f"{key} {stage}: {before:.3f}s -> {now:.3f}s (+{(now / max(before, 1e-9) - 1) * 100:.0f}%)")
+        now, before = case['peak_rss_mb'], reference.get('peak_rss_mb')
+        if before is not None and now > before * (1 + threshold):
+            regressions.append(f"{key} peak memory: {before:.0f}MB -> {now:.0f}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the estimate pipeline against a stored baseline.")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median time of every stage is kept (Default = 3)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown (Default = 0.2, i.e. 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Slowdowns below this many seconds are noise (Default = 0.05)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "laser-bench"),
+                        help="Where generated SVGs are cached between runs")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = run_suite(args.scenarios, args.sizes, args.seed, args.repeat, args.workdir)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get('results', {})
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'results': baseline}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    regressions = compare(results, stored['results'], args.threshold, args.min_delta)
+    if stored.get('machine') != platform.platform():
+        print(f"Note: baseline recorded on {stored.get('machine')}")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures the latency of single CLI calls, as nesting scripts make them: a cold `--help`, a cold
+estimate of a small file, and the same estimate forwarded to a warm server (`src/server.py`).
+Every figure is the median of `--runs` calls of a fresh `python src/main.py` process.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--scenario nested_sheet] [--size 100]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.generators import SCENARIOS, write_scenario
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MAIN = os.path.join(ROOT, 'src', 'main.py')
+SERVER = os.path.join(ROOT, 'src', 'server.py')
+SPEEDS = ['--cut_speed', '20', '--vector_engrave_speed', '200', '--raster_engrave_speed', '300', '--transit_speed', '500']
+
+
+def call_latency(arguments: List[str], runs: int) -> float:
+    """Median wall time of `runs` CLI processes, in seconds."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, MAIN] + arguments, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def wait_for_socket(socket_path: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"The server did not start listening on {socket_path}")
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI cold-start and warm-server call latency.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="nested_sheet")
+    parser.add_argument("--size", type=int, default=100, help="Entities in the estimated file (Default = 100)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "laser-bench"))
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    filepath = write_scenario(args.workdir, args.scenario, args.size)
+    estimate = [filepath] + SPEEDS
+
+    results = {
+        'cold --help': call_latency(['--help'], args.runs),
+        'cold estimate': call_latency(estimate, args.runs),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, 'laser.sock')
+        server = subprocess.Popen([sys.executable, SERVER, socket_path], stderr=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket_path)
+            forwarded = estimate + ['--server', socket_path]
+            results['warm first call'] = call_latency(forwarded, 1)
+            results['warm estimate'] = call_latency(forwarded, args.runs)
+        finally:
+            server.terminate()
+            server.wait()
+
+    for name, seconds in results.items():
+        print(f"{name:<18} {seconds * 1000:8.1f} ms")
+    print(f"{'warm speed-up':<18} {results['cold estimate'] / results['warm estimate']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
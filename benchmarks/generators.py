@@ -0,0 +1,137 @@
+"""
+Seeded synthetic SVG workloads for the benchmark suite. The same (scenario, count, seed) always
+produces the same file, so timings can be compared across commits and machines.
+
+Scenarios:
+    nested_sheet  - parts on a sheet, each an outline with holes and a marked label (inner-before-outer)
+    bezier_text   - dense lines of glyph-like cubic Bézier outlines on the mark layer
+    raster_fill   - filled blocks on the raster layer, in rows that share scanlines
+    mixed_layers  - rectangles, circles and Bézier contours spread over all three layers
+"""
+import math
+import os
+from typing import Callable, Dict, List
+import numpy as np
+
+CUT, MARK, RASTER = '#FF0000', '#00FF00', '#0000FF'
+
+
+def _svg(width: float, height: float, elements: List[str]) -> str:
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+            f'viewBox="0 0 {width:.0f} {height:.0f}">\n' + '\n'.join(elements) + '\n</svg>\n')
+
+
+def nested_sheet(count: int, seed: int = 0) -> str:
+    """Parts of four entities each: a rounded outline, two holes and a short mark, plus the sheet outline."""
+    rng = np.random.default_rng(seed)
+    parts = max(count // 4, 1)
+    columns = math.ceil(math.sqrt(parts))
+    pitch = 30.0
+    elements = []
+    for part in range(parts):
+        x, y = (part % columns) * pitch + 2, (part // columns) * pitch + 2
+        w, h = rng.uniform(18, 26, size=2)
+        r = rng.uniform(1, 4)
+        elements.append(
+            f'<path d="M {x + r:.3f} {y:.3f} H {x + w - r:.3f} A {r:.3f} {r:.3f} 0 0 1 {x + w:.3f} {y + r:.3f} '
+            f'V {y + h - r:.3f} A {r:.3f} {r:.3f} 0 0 1 {x + w - r:.3f} {y + h:.3f} H {x + r:.3f} '
+            f'A {r:.3f} {r:.3f} 0 0 1 {x:.3f} {y + h - r:.3f} V {y + r:.3f} A {r:.3f} {r:.3f} 0 0 1 {x + r:.3f} {y:.3f} Z" '
+            f'stroke="{CUT}" fill="none"/>'
+        )
+        for hx, hy in ((0.3, 0.3), (0.7, 0.6)):
+            elements.append(f'<circle cx="{x + hx * w:.3f}" cy="{y + hy * h:.3f}" r="{rng.uniform(1, 2.5):.3f}" '
+                            f'stroke="{CUT}" fill="none"/>')
+        elements.append(f'<polyline points="{x + 3:.3f},{y + h - 4:.3f} {x + 9:.3f},{y + h - 4:.3f} '
+                        f'{x + 9:.3f},{y + h - 6:.3f}" stroke="{MARK}" fill="none"/>')
+    size = columns * pitch + 4
+    elements.append(f'<rect x="0.5" y="0.5" width="{size - 1:.3f}" height="{size - 1:.3f}" stroke="{CUT}" fill="none"/>')
+    return _svg(size, size, elements)
+
+
+def bezier_text(count: int, seed: int = 0) -> str:
+    """Glyph-sized closed outlines of 4-8 cubic Béziers, set in lines like engraved text."""
+    rng = np.random.default_rng(seed)
+    per_line = 120
+    advance, leading, size = 4.0, 7.0, 5.0
+    elements = []
+    for glyph in range(count):
+        x0 = (glyph % per_line) * advance + 2
+        y0 = (glyph // per_line) * leading + 2
+        pieces = int(rng.integers(4, 9))
+        angles = np.sort(rng.uniform(0, 2 * math.pi, pieces))
+        radius = rng.uniform(0.3, 0.5, pieces) * size
+        cx, cy = x0 + size / 2, y0 + size / 2
+        points = np.column_stack([cx + radius * np.cos(angles), cy + radius * np.sin(angles)])
+        handles = rng.uniform(-1.2, 1.2, size=(pieces, 4))
+        d = [f'M {points[0, 0]:.3f} {points[0, 1]:.3f}']
+        for i in range(pieces):
+            end = points[(i + 1) % pieces]
+            start = points[i]
+            d.append(f'C {start[0] + handles[i, 0]:.3f} {start[1] + handles[i, 1]:.3f} '
+                     f'{end[0] + handles[i, 2]:.3f} {end[1] + handles[i, 3]:.3f} {end[0]:.3f} {end[1]:.3f}')
+        elements.append(f'<path d="{" ".join(d)} Z" stroke="{MARK}" fill="none"/>')
+    lines = math.ceil(count / per_line)
+    return _svg(per_line * advance + 4, lines * leading + 4, elements)
+
+
+def raster_fill(count: int, seed: int = 0) -> str:
+    """Filled rectangles, ellipses and triangles in rows, so neighbouring blocks share scanlines."""
+    rng = np.random.default_rng(seed)
+    per_row = 60
+    pitch = 12.0
+    elements = []
+    for block in range(count):
+        x = (block % per_row) * pitch + rng.uniform(0, 2)
+        y = (block // per_row) * pitch + rng.uniform(0, 2)
+        w, h = rng.uniform(4, 10, size=2)
+        kind = block % 3
+        if kind == 0:
+            elements.append(f'<rect x="{x:.3f}" y="{y:.3f}" width="{w:.3f}" height="{h:.3f}" fill="{RASTER}"/>')
+        elif kind == 1:
+            elements.append(f'<ellipse cx="{x + w / 2:.3f}" cy="{y + h / 2:.3f}" rx="{w / 2:.3f}" ry="{h / 2:.3f}" '
+                            f'fill="{RASTER}"/>')
+        else:
+            elements.append(f'<polygon points="{x:.3f},{y + h:.3f} {x + w:.3f},{y + h:.3f} {x + w / 2:.3f},{y:.3f}" '
+                            f'fill="{RASTER}"/>')
+    rows = math.ceil(count / per_row)
+    return _svg(per_row * pitch + 12, rows * pitch + 12, elements)
+
+
+def mixed_layers(count: int, seed: int = 0) -> str:
+    """Rectangles, circles and Bézier contours scattered over a sheet on the three laser layers."""
+    rng = np.random.default_rng(seed)
+    side = max(math.sqrt(count) * 12, 200)
+    colors = [CUT, MARK, RASTER]
+    elements = []
+    for i in range(count):
+        x, y = rng.uniform(0, side - 40, size=2)
+        size = rng.uniform(2, 20)
+        color = colors[i % 3]
+        fill = color if color == RASTER else 'none'
+        kind = (i // 3) % 3
+        if kind == 0:
+            elements.append(f'<rect x="{x:.3f}" y="{y:.3f}" width="{size:.3f}" height="{size / 2:.3f}" '
+                            f'stroke="{color}" fill="{fill}"/>')
+        elif kind == 1:
+            elements.append(f'<circle cx="{x:.3f}" cy="{y:.3f}" r="{size / 2:.3f}" stroke="{color}" fill="{fill}"/>')
+        else:
+            elements.append(f'<path d="M {x:.3f} {y:.3f} C {x + size:.3f} {y - size:.3f} {x + 2 * size:.3f} '
+                            f'{y + size:.3f} {x + 3 * size:.3f} {y:.3f} Z" stroke="{color}" fill="{fill}"/>')
+    return _svg(side, side, elements)
+
+
+SCENARIOS: Dict[str, Callable[[int, int], str]] = {
+    'nested_sheet': nested_sheet,
+    'bezier_text': bezier_text,
+    'raster_fill': raster_fill,
+    'mixed_layers': mixed_layers,
+}
+
+
+def write_scenario(directory: str, scenario: str, count: int, seed: int = 0) -> str:
+    """Writes (or reuses) the SVG of a scenario and returns its path."""
+    filepath = os.path.join(directory, f"{scenario}_{count}_{seed}.svg")
+    if not os.path.exists(filepath):
+        with open(filepath, 'w') as f:
+            f.write(SCENARIOS[scenario](count, seed))
+    return filepath
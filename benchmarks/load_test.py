@@ -0,0 +1,113 @@
+"""
+Fires concurrent uploads at a running API server and reports latency percentiles,
+for /api/calculate and for /api/health probes sent while the uploads are in flight.
+
+Start a server first, e.g.:  uvicorn src.api:app --port 8000
+Usage: python benchmarks/load_test.py [--url http://127.0.0.1:8000] [--requests 40] [--concurrency 8]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_memory import write_synthetic_svg
+
+FORM_FIELDS = {
+    'cut_speed': '10', 'vector_engrave_speed': '50',
+    'raster_engrave_speed': '100', 'transit_speed': '200'
+}
+
+
+def multipart_body(svg: bytes, fields: dict):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="load.svg"\r\n'
+                 f'Content-Type: image/svg+xml\r\n\r\n'.encode() + svg + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def timed_request(request: urllib.request.Request):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except urllib.error.URLError:
+        status = 0
+    return time.perf_counter() - started, status
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def describe(label, samples):
+    latencies = [latency for latency, status in samples if status == 200]
+    statuses = {}
+    for _, status in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{label:<12} n={len(samples):<4} p50={percentile(latencies, 0.5) * 1000:8.1f} ms "
+          f"p99={percentile(latencies, 0.99) * 1000:8.1f} ms  statuses={json.dumps(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent upload load test for the API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--entities", type=int, default=2000, help="Entities in the generated SVG")
+    args = parser.parse_args()
+
+    svg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.load_test.svg')
+    write_synthetic_svg(svg_path, args.entities)
+    with open(svg_path, 'rb') as f:
+        svg = f.read()
+    os.remove(svg_path)
+
+    def upload(i):
+        # A unique comment defeats the result cache so every request does the full work
+        body, content_type = multipart_body(svg + f'<!-- {i} {uuid.uuid4()} -->'.encode(), FORM_FIELDS)
+        request = urllib.request.Request(f"{args.url}/api/calculate", data=body,
+                                         headers={'Content-Type': content_type})
+        return timed_request(request)
+
+    health_samples = []
+    done = threading.Event()
+
+    def probe_health():
+        while not done.is_set():
+            health_samples.append(timed_request(urllib.request.Request(f"{args.url}/api/health")))
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe_health)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        upload_samples = list(pool.map(upload, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    print(f"{args.requests} uploads, concurrency {args.concurrency}, {elapsed:.1f} s wall time")
+    describe("calculate", upload_samples)
+    describe("health", health_samples)
+
+
+if __name__ == "__main__":
+    main()
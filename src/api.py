@@ -1,11 +1,32 @@
+import asyncio
+import copy
+import hashlib
+import io
+import json
 import os
-import shutil
-import tempfile
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+from fastapi import Depends, FastAPI, UploadFile, File, Form, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 
-from src.parsers.svg_parser import SVGParser
+from src.parsers.svg_parser import SVGParser, LaserEntity
+from src.parsers.geometry_file import (
+    GEOMETRY_FILE_SUFFIX, MAGIC, GeometryFileError, is_geometry_file, read_geometry, store_entities, write_geometry
+)
+from src.batch import ENTITY_OVERHEAD_BYTES
 from src.engine.calculator import LaserTimeCalculator
+from src.engine.clustering import ClusteredOptimizer, clustered_transit_order
+from src.engine.geometry import GeometryStore
+from src.engine.options import DEFAULT_TOLERANCE, check_tolerance
+from src.engine.optimizer import order_entities
+from src.engine.plan import JobPlan
+from src.utils.cache import LRUCache
+from src.utils.concurrency import BoundedExecutor, ExecutorSaturated
+from src.utils.diagnostics import DISABLED, Diagnostics, MetricsRegistry
+from src.utils.jobs import FINISHED_STATES, Job, JobManager, JobStoreFull
+from src.utils.progress import ProgressCallback
 
 app = FastAPI(title="LaserTimeCalculator API")
 
@@ -18,56 +39,636 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/api/calculate")
-async def calculate_laser_time(
-    file: UploadFile = File(...),
+
+@dataclass
+class ParsedJob:
+    """Speed-independent result of parsing an upload: entities already sorted for transit."""
+    entities: List[LaserEntity]
+    store: GeometryStore  # Geometry in document order, as written to geometry files
+    nbytes: int
+    sections: Dict[str, Any] = field(default_factory=dict)  # Report sections of the ordering (transit_clustering)
+
+
+REPORT_BYTES = 2048
+# Size of one [entity, parent] pair of the report's containment hierarchy
+CONTAINMENT_PAIR_BYTES = 128
+HASH_CHUNK_BYTES = 1 << 20
+# Chord tolerance in mm for curve flattening; part of the server configuration, not of a request
+CHORD_TOLERANCE = check_tolerance(float(os.environ.get("LASER_CHORD_TOLERANCE", DEFAULT_TOLERANCE)))
+# Processes that parse one large SVG in parallel shards (1 = serial); part of the server configuration
+PARSE_WORKERS = int(os.environ.get("LASER_PARSE_WORKERS", 1))
+# Uploads with at least this many entities are ordered cluster by cluster (0 = never, see ClusteredOptimizer)
+TRANSIT_CLUSTER_THRESHOLD = int(os.environ.get("LASER_TRANSIT_CLUSTER_THRESHOLD", 0))
+TRANSIT_CLUSTER_SIZE = int(os.environ.get("LASER_TRANSIT_CLUSTER_SIZE", 512))
+TRANSIT_CLUSTER_WORKERS = int(os.environ.get("LASER_TRANSIT_CLUSTER_WORKERS", 1))
+# Upper bound on the transit refinement budget a single request may ask for, in seconds
+MAX_REFINE_SECONDS = float(os.environ.get("LASER_MAX_REFINE_SECONDS", 5.0))
+# Rows of a timeline response: enough to animate a job, small enough to ship to the browser
+DEFAULT_TIMELINE_POINTS = 10000
+MAX_TIMELINE_POINTS = 40000
+TIMELINE_FORMATS = ('binary', 'ndjson')
+
+# CPU-bound parsing and estimation run on a bounded thread pool so the event loop stays responsive
+executor = BoundedExecutor(
+    max_workers=int(os.environ.get("LASER_API_WORKERS", os.cpu_count() or 1)),
+    max_queue=int(os.environ.get("LASER_API_QUEUE", 8))
+)
+RETRY_AFTER_SECONDS = 5
+
+# Long estimates submitted through /api/jobs run on their own pool and are polled for progress
+job_manager = JobManager(
+    max_workers=int(os.environ.get("LASER_JOB_WORKERS", 2)),
+    max_jobs=int(os.environ.get("LASER_MAX_JOBS", 100)),
+    ttl_seconds=float(os.environ.get("LASER_JOB_TTL", 600))
+)
+JOB_EVENTS_INTERVAL = 0.5
+
+# Level 1: SVG content hash + ppi -> parsed and ordered geometry
+geometry_cache = LRUCache(
+    max_bytes=int(float(os.environ.get("LASER_GEOMETRY_CACHE_MB", 256)) * 2**20),
+    sizeof=lambda job: job.nbytes
+)
+# Level 2: geometry + ordering settings -> speed-independent job plan, re-costed per request
+plan_cache = LRUCache(
+    max_bytes=int(float(os.environ.get("LASER_PLAN_CACHE_MB", 256)) * 2**20),
+    sizeof=lambda plan: plan.nbytes
+)
+# Level 3: SVG content hash + every parameter -> final report
+report_cache = LRUCache(
+    max_bytes=int(float(os.environ.get("LASER_REPORT_CACHE_MB", 16)) * 2**20),
+    sizeof=lambda report: REPORT_BYTES + CONTAINMENT_PAIR_BYTES * len(report.get('containment', {}).get('parents', ()))
+)
+
+# Stage timings of every estimate are summed for GET /metrics when enabled; otherwise only requests
+# asking for `?diagnostics=true` are instrumented
+COLLECT_METRICS = os.environ.get("LASER_METRICS", "0").lower() in ("1", "true", "yes")
+metrics = MetricsRegistry()
+
+
+def content_digest(upload: BinaryIO) -> str:
+    """SHA-256 of an upload buffer, read in chunks and rewound afterwards."""
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in iter(lambda: upload.read(HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def check_upload_name(filename: str) -> None:
+    if not filename.lower().endswith(('.svg', GEOMETRY_FILE_SUFFIX)):
+        raise HTTPException(status_code=400, detail=f"File must be an SVG or a {GEOMETRY_FILE_SUFFIX} geometry file")
+
+
+def read_entities(upload: BinaryIO,
+                  ppi: float,
+                  progress: ProgressCallback = None,
+                  diagnostics: Diagnostics = DISABLED) -> Tuple[List[LaserEntity], GeometryStore]:
+    """Parses an uploaded SVG straight from its buffer, or wraps an uploaded geometry file without parsing."""
+    upload.seek(0)
+    head = upload.read(len(MAGIC))
+    upload.seek(0)
+    if is_geometry_file(head):
+        try:
+            with diagnostics.stage('parse.geometry_file'):
+                store = read_geometry(upload.read()).store
+        except GeometryFileError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return store_entities(store), store
+
+    parser = SVGParser(upload, ppi=ppi, tolerance=CHORD_TOLERANCE)
+    entities = parser.parse(progress=progress, diagnostics=diagnostics, workers=PARSE_WORKERS)
+    return entities, parser.store
+
+
+def parse_upload(upload: BinaryIO,
+                 ppi: float,
+                 progress: ProgressCallback = None,
+                 diagnostics: Diagnostics = DISABLED) -> ParsedJob:
+    """Reads an upload and sorts the entities for transit."""
+    entities, store = read_entities(upload, ppi, progress, diagnostics)
+
+    # Transit ordering depends on geometry only, so it is computed once per upload
+    sections = {}
+    with diagnostics.stage('calculate.order'):
+        if 0 < TRANSIT_CLUSTER_THRESHOLD <= len(entities):
+            optimizer = ClusteredOptimizer(TRANSIT_CLUSTER_SIZE, TRANSIT_CLUSTER_WORKERS)
+            tour = clustered_transit_order(*GeometryStore.for_entities(entities), optimizer, progress)
+            ordered = [entities[i] for i in tour.order]
+            sections['transit_clustering'] = tour.stats()
+            diagnostics.count('calculate.clusters', tour.clusters)
+        else:
+            ordered = order_entities(entities, progress)
+    return ParsedJob(
+        entities=ordered,
+        store=store,
+        nbytes=store.nbytes + ENTITY_OVERHEAD_BYTES * len(entities),
+        sections=sections
+    )
+
+
+def get_parsed_job(upload: BinaryIO,
+                   digest: str,
+                   ppi: float,
+                   progress: ProgressCallback = None,
+                   diagnostics: Diagnostics = DISABLED) -> ParsedJob:
+    """Returns the parsed geometry of an upload, from the geometry cache when possible."""
+    geometry_key = (digest, ppi)
+    job = geometry_cache.get(geometry_key)
+    if job is None:
+        job = parse_upload(upload, ppi, progress, diagnostics)
+        geometry_cache.put(geometry_key, job)
+    else:
+        diagnostics.count('cache.geometry_hits')
+        if progress:
+            for counter in ('entities_total', 'entities_parsed', 'entities_ordered'):
+                progress(counter, len(job.entities))
+
+    if not job.entities:
+        raise HTTPException(status_code=400, detail="No valid laser operation paths (Red, Green, Blue) found.")
+    return job
+
+
+# Speeds never enter a plan; a calculator only building plans gets placeholders
+PLANNING_SPEEDS = dict(cut_speed=1.0, vector_engrave_speed=1.0, raster_engrave_speed=1.0, transit_speed=1.0)
+
+
+def plan_id_for(digest: str, ppi: float, merge_raster: bool, refine_seconds: float, timeline: bool = False) -> str:
+    """Stable id of the plan of an upload under the settings that shape it."""
+    key = json.dumps([digest, ppi, bool(merge_raster), refine_seconds] + ([True] if timeline else []))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def reproducible(sections: Dict[str, Any]) -> bool:
+    """
+    False when the transit refinement was cut short by its wall-clock bound, so the same request
+    could order the job differently; such results stay out of the content-keyed caches.
+    """
+    return not sections.get('transit_refinement', {}).get('timed_out', False)
+
+
+def get_plan(upload: BinaryIO,
+             digest: str,
+             ppi: float,
+             calculator: LaserTimeCalculator,
+             progress: ProgressCallback = None,
+             diagnostics: Diagnostics = DISABLED,
+             timeline: bool = False,
+             keep: bool = False) -> Tuple[str, JobPlan]:
+    """
+    Returns the job plan of an upload, from the plan cache when possible. Plans that are not
+    `reproducible` are only cached with `keep`, when the caller hands out their id.
+    """
+    plan_id = plan_id_for(digest, ppi, calculator.merge_raster, calculator.refine_seconds, timeline)
+    plan = plan_cache.get(plan_id)
+    if plan is None:
+        job = get_parsed_job(upload, digest, ppi, progress, diagnostics)
+        plan = calculator.plan_job(job.entities, optimize=False, progress=progress, diagnostics=diagnostics,
+                                   timeline=timeline)
+        plan.sections.update(copy.deepcopy(job.sections))
+        if keep or reproducible(plan.sections):
+            plan_cache.put(plan_id, plan)
+    else:
+        diagnostics.count('cache.plan_hits')
+    return plan_id, plan
+
+
+@contextmanager
+def request_recorder(requested: bool = False) -> Iterator[Diagnostics]:
+    """
+    Diagnostics of one estimate, timed as its 'request' stage and added to /metrics: a live recorder
+    when the request asks for diagnostics or LASER_METRICS is on, `DISABLED` otherwise.
+    """
+    recorder = Diagnostics() if requested or COLLECT_METRICS else DISABLED
+    with recorder.stage('request'):
+        yield recorder
+    if recorder.enabled:
+        metrics.observe(recorder)
+
+
+def estimate_upload(upload: BinaryIO,
+                    ppi: float,
+                    calculator_kwargs: Dict[str, float],
+                    progress: ProgressCallback = None,
+                    diagnostics: bool = False) -> Dict[str, Any]:
+    """
+    Blocking part of /api/calculate and /api/jobs; runs on a worker pool.
+    With `diagnostics` the report gets the stage timings of this request; cached levels show up
+    as 'cache.*_hits' counters instead of stages.
+    """
+    with request_recorder(diagnostics) as recorder:
+        report = _estimate_upload(upload, ppi, calculator_kwargs, progress, recorder)
+    if diagnostics:
+        report['diagnostics'] = recorder.report()
+    return report
+
+
+def _estimate_upload(upload: BinaryIO,
+                     ppi: float,
+                     calculator_kwargs: Dict[str, float],
+                     progress: ProgressCallback,
+                     diagnostics: Diagnostics) -> Dict[str, Any]:
+    digest = content_digest(upload)
+    report_key = (digest, ppi, tuple(sorted(calculator_kwargs.items())))
+    report = report_cache.get(report_key)
+    if report is not None:
+        diagnostics.count('cache.report_hits')
+        return copy.deepcopy(report)
+
+    calculator = LaserTimeCalculator(**calculator_kwargs)
+    _, plan = get_plan(upload, digest, ppi, calculator, progress, diagnostics)
+    report = calculator.evaluate_plan(plan, progress, diagnostics)
+    if reproducible(report):
+        report_cache.put(report_key, copy.deepcopy(report))
+    return report
+
+
+def plan_upload(upload: BinaryIO,
+                ppi: float,
+                merge_raster: bool,
+                refine_seconds: float,
+                timeline: bool = False) -> Dict[str, Any]:
+    """Blocking part of /api/plans; runs on the worker pool."""
+    calculator = LaserTimeCalculator(**PLANNING_SPEEDS, merge_raster=merge_raster, refine_seconds=refine_seconds)
+    plan_id, plan = get_plan(upload, content_digest(upload), ppi, calculator, timeline=timeline, keep=True)
+    return {"plan_id": plan_id, "entities": len(plan), "merge_raster": plan.merge_raster, "timeline": plan.has_timeline}
+
+
+def estimate_upload_batch(upload: BinaryIO, ppi: float, parameter_sets: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+    """Blocking part of /api/calculate/batch; runs on the worker pool."""
+    with request_recorder() as recorder:
+        job = get_parsed_job(upload, content_digest(upload), ppi, diagnostics=recorder)
+        with recorder.stage('calculate.batch'):
+            reports = LaserTimeCalculator.calculate_batch(job.entities, parameter_sets, optimize=False)
+        recorder.count('calculate.profiles', len(parameter_sets))
+    for report in reports:
+        report.update(copy.deepcopy(job.sections))
+    return reports
+
+
+async def run_blocking(fn, *args):
+    """Runs parsing/estimation on the bounded worker pool, mapping failures to HTTP errors."""
+    try:
+        return await executor.run(fn, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, too many estimates in progress. Retry shortly.",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing SVG: {str(e)}")
+
+
+def check_calculator_arguments(calculator_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Rejects arguments `LaserTimeCalculator` would refuse (models, non-positive speeds or scan gap) with a 400."""
+    try:
+        LaserTimeCalculator(**calculator_kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return calculator_kwargs
+
+
+def machine_form(
     cut_speed: float = Form(...),
     vector_engrave_speed: float = Form(...),
     raster_engrave_speed: float = Form(...),
     transit_speed: float = Form(...),
     scan_gap: float = Form(0.1),
-    ppi: float = Form(25.4),
     accel: float = Form(500.0),
-    junction_delay: float = Form(0.05),
-    burn_dwell: float = Form(0.1)
+    junction_delay: float = Form(0.05, description=(
+        "Time loss at each path vertex in seconds; only used with junction_model 'constant', "
+        "the default 'lookahead' model ignores it")),
+    burn_dwell: float = Form(0.1),
+    raster_model: str = Form('scanline', description=(
+        "'scanline' sweeps the filled extent of each line and ramps up to and down from the engrave speed "
+        "around it, 2 * speed / accel seconds per line however short, which dominates small raster areas; "
+        "'bbox' full-width passes plus a fixed 10% overscan")),
+    junction_model: str = Form('lookahead'),
+    junction_deviation: float = Form(0.01)
+) -> Dict[str, Any]:
+    """Machine parameter form fields shared by every estimate endpoint, as validated calculator arguments."""
+    return check_calculator_arguments(dict(
+        cut_speed=cut_speed,
+        vector_engrave_speed=vector_engrave_speed,
+        raster_engrave_speed=raster_engrave_speed,
+        transit_speed=transit_speed,
+        acceleration=accel,
+        junction_delay=junction_delay,
+        burn_dwell=burn_dwell,
+        scan_gap=scan_gap,
+        raster_model=raster_model,
+        junction_model=junction_model,
+        junction_deviation=junction_deviation
+    ))
+
+
+def ordering_form(merge_raster: bool = Form(False), refine_seconds: float = Form(0.0)) -> Dict[str, Any]:
+    """Form fields that shape the plan of an upload (see `LaserTimeCalculator.PLAN_SETTINGS`)."""
+    if not 0 <= refine_seconds <= MAX_REFINE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"refine_seconds must be between 0 and {MAX_REFINE_SECONDS}")
+    return dict(merge_raster=merge_raster, refine_seconds=refine_seconds)
+
+
+@app.post("/api/calculate")
+async def calculate_laser_time(
+    file: UploadFile = File(...),
+    ppi: float = Form(25.4),
+    machine: Dict[str, Any] = Depends(machine_form),
+    ordering: Dict[str, Any] = Depends(ordering_form),
+    diagnostics: bool = Query(False)
 ):
-    if not file.filename.lower().endswith('.svg'):
-        raise HTTPException(status_code=400, detail="File must be an SVG")
+    check_upload_name(file.filename)
+    calculator_kwargs = dict(machine, **ordering)
+    # The spooled upload buffer is handed to the parser as-is, nothing is copied to disk
+    return await run_blocking(estimate_upload, file.file, ppi, calculator_kwargs, None, diagnostics)
+
+
+def _boolean(value: Any) -> bool:
+    if not isinstance(value, bool):
+        raise ValueError(f"expected true or false, got {value!r}")
+    return value
+
+
+def _text(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    return value
+
+
+# Profile field names of the API mapped to `LaserTimeCalculator` arguments and their conversion
+PROFILE_ARGUMENTS = {
+    'cut_speed': ('cut_speed', float),
+    'vector_engrave_speed': ('vector_engrave_speed', float),
+    'raster_engrave_speed': ('raster_engrave_speed', float),
+    'transit_speed': ('transit_speed', float),
+    'scan_gap': ('scan_gap', float),
+    'accel': ('acceleration', float),
+    'junction_delay': ('junction_delay', float),
+    'junction_deviation': ('junction_deviation', float),
+    'burn_dwell': ('burn_dwell', float),
+    'raster_model': ('raster_model', _text),
+    'junction_model': ('junction_model', _text),
+    'merge_raster': ('merge_raster', _boolean)
+}
+REQUIRED_PROFILE_FIELDS = ('cut_speed', 'vector_engrave_speed', 'raster_engrave_speed', 'transit_speed')
+
+
+def profile_to_arguments(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Validates one profile of a batch request and converts it to calculator arguments."""
+    missing = [name for name in REQUIRED_PROFILE_FIELDS if name not in profile]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Profile is missing: {', '.join(missing)}")
+    unknown = set(profile) - set(PROFILE_ARGUMENTS) - {'name'}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown profile fields: {', '.join(sorted(unknown))}")
+    arguments = {}
+    for key, value in profile.items():
+        if key == 'name':
+            continue
+        argument, convert = PROFILE_ARGUMENTS[key]
+        try:
+            arguments[argument] = convert(value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid profile value for {key}: {value!r}")
+    return check_calculator_arguments(arguments)
+
+
+@app.post("/api/calculate/batch")
+async def calculate_laser_time_batch(
+    file: UploadFile = File(...),
+    profiles: str = Form(...),
+    ppi: float = Form(25.4)
+):
+    """
+    Estimates one SVG for several machine/material profiles.
+    `profiles` is a JSON list of objects using the same field names as /api/calculate,
+    plus an optional `name`. The SVG is parsed and ordered once for all of them, so every
+    profile must use the same `merge_raster`.
+    """
+    check_upload_name(file.filename)
 
-    # Save to a temporary file because svgelements expects a filepath
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".svg") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        # Parse SVG
-        parser = SVGParser(filepath=tmp_path, ppi=ppi)
-        entities = parser.parse()
-
-        if not entities:
-            raise HTTPException(status_code=400, detail="No valid laser operation paths (Red, Green, Blue) found.")
-
-        # Calculate time
-        calculator = LaserTimeCalculator(
-            cut_speed=cut_speed,
-            vector_engrave_speed=vector_engrave_speed,
-            raster_engrave_speed=raster_engrave_speed,
-            transit_speed=transit_speed,
-            acceleration=accel,
-            junction_delay=junction_delay,
-            burn_dwell=burn_dwell,
-            scan_gap=scan_gap
+        profile_list = json.loads(profiles)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="profiles must be a JSON list")
+    if not isinstance(profile_list, list) or not profile_list or not all(isinstance(p, dict) for p in profile_list):
+        raise HTTPException(status_code=400, detail="profiles must be a non-empty JSON list of objects")
+    parameter_sets = [profile_to_arguments(profile) for profile in profile_list]
+    if len({arguments.get('merge_raster', False) for arguments in parameter_sets}) > 1:
+        raise HTTPException(status_code=400, detail="All profiles must use the same merge_raster")
+
+    reports = await run_blocking(estimate_upload_batch, file.file, ppi, parameter_sets)
+    return {
+        "profiles": [
+            {"name": profile.get("name", f"profile_{i + 1}"), "report": report}
+            for i, (profile, report) in enumerate(zip(profile_list, reports))
+        ]
+    }
+
+def geometry_upload(upload: BinaryIO, ppi: float) -> bytes:
+    """Blocking part of /api/geometry; runs on the worker pool."""
+    job = get_parsed_job(upload, content_digest(upload), ppi)
+    buffer = io.BytesIO()
+    write_geometry(job.store, buffer, ppi, CHORD_TOLERANCE)
+    return buffer.getvalue()
+
+
+@app.post("/api/geometry")
+async def export_geometry(file: UploadFile = File(...), ppi: float = Form(25.4)):
+    """
+    Returns the flattened geometry of an SVG as a binary .ltg file. Uploading that file instead
+    of the SVG to any estimate endpoint skips parsing.
+    """
+    check_upload_name(file.filename)
+    content = await run_blocking(geometry_upload, file.file, ppi)
+    name = os.path.splitext(os.path.basename(file.filename))[0] + GEOMETRY_FILE_SUFFIX
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
+
+
+@app.post("/api/plans")
+async def create_plan(
+    file: UploadFile = File(...),
+    ppi: float = Form(25.4),
+    ordering: Dict[str, Any] = Depends(ordering_form),
+    timeline: bool = Form(False)
+):
+    """
+    Parses and orders an SVG once and keeps the speed-independent plan in the plan cache.
+    The returned `plan_id` is re-costed by POST /api/plans/{plan_id}/calculate, e.g. from sliders.
+    With `timeline` the plan also serves POST /api/plans/{plan_id}/timeline.
+    """
+    check_upload_name(file.filename)
+    return await run_blocking(plan_upload, file.file, ppi, ordering['merge_raster'], ordering['refine_seconds'],
+                              timeline)
+
+
+def cached_plan(plan_id: str) -> JobPlan:
+    plan = plan_cache.get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Unknown or evicted plan, create it again")
+    return plan
+
+
+@app.post("/api/plans/{plan_id}/calculate")
+async def calculate_plan(plan_id: str, machine: Dict[str, Any] = Depends(machine_form)):
+    """Costs a cached plan for new machine parameters, without the SVG."""
+    plan = cached_plan(plan_id)
+    calculator = LaserTimeCalculator(merge_raster=plan.merge_raster, **machine)
+    return await run_blocking(evaluate_cached_plan, calculator, plan)
+
+
+def evaluate_cached_plan(calculator: LaserTimeCalculator, plan: JobPlan) -> Dict[str, Any]:
+    """Blocking part of /api/plans/{plan_id}/calculate; runs on the worker pool."""
+    with request_recorder() as recorder:
+        return calculator.evaluate_plan(plan, diagnostics=recorder)
+
+
+def timeline_of_plan(calculator: LaserTimeCalculator, plan: JobPlan, points: int):
+    """Blocking part of /api/plans/{plan_id}/timeline; runs on the worker pool."""
+    with request_recorder() as recorder:
+        timeline = calculator.evaluate_plan(plan, diagnostics=recorder, timeline=True)['timeline']
+        with recorder.stage('calculate.timeline_downsample'):
+            return timeline.downsample(points)
+
+
+@app.post("/api/plans/{plan_id}/timeline")
+async def plan_timeline(
+    plan_id: str,
+    machine: Dict[str, Any] = Depends(machine_form),
+    points: int = Form(DEFAULT_TIMELINE_POINTS),
+    format: str = Form('binary')
+):
+    """
+    Time-resolved toolpath of a plan created with `timeline=true`, downsampled to `points` rows:
+    the compact binary layout of `Timeline.write`, or NDJSON streamed row by row.
+    """
+    plan = cached_plan(plan_id)
+    if not plan.has_timeline:
+        raise HTTPException(status_code=400, detail="The plan was created without timeline=true")
+    if not 1 <= points <= MAX_TIMELINE_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be between 1 and {MAX_TIMELINE_POINTS}")
+    if format not in TIMELINE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(TIMELINE_FORMATS)}")
+    calculator = LaserTimeCalculator(merge_raster=plan.merge_raster, **machine)
+    timeline = await run_blocking(timeline_of_plan, calculator, plan, points)
+    if format == 'ndjson':
+        return StreamingResponse(timeline.iter_ndjson(), media_type="application/x-ndjson")
+    return Response(content=timeline.to_bytes(), media_type="application/octet-stream")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    ppi: float = Form(25.4),
+    machine: Dict[str, Any] = Depends(machine_form),
+    ordering: Dict[str, Any] = Depends(ordering_form),
+    diagnostics: bool = Query(False)
+):
+    """
+    Same form fields as /api/calculate, but returns a job id immediately.
+    Poll GET /api/jobs/{id} (or stream /api/jobs/{id}/events) for progress and the final report.
+    """
+    check_upload_name(file.filename)
+    calculator_kwargs = dict(machine, **ordering)
+    # The upload buffer is closed when this request ends, so the job keeps its own copy
+    content = io.BytesIO(await file.read())
+    try:
+        job = job_manager.submit(estimate_upload, content, ppi, calculator_kwargs, diagnostics=diagnostics)
+    except JobStoreFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many jobs in progress. Retry shortly.",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
         )
-        report = calculator.calculate_total_job(entities)
-        
-        return report
+    return {"id": job.id, "status": job.status}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing SVG: {str(e)}")
-    finally:
-        # Clean up temp file
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+
+def find_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str):
+    return find_job(job_id).to_dict()
+
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    find_job(job_id)
+    return job_manager.cancel(job_id).to_dict()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `data:` line per progress change, ending with the final state."""
+    job = find_job(job_id)
+
+    async def stream():
+        last = None
+        while True:
+            state = job.to_dict()
+            if state != last:
+                yield f"data: {json.dumps(state)}\n\n"
+                last = state
+            if job.status in FINISHED_STATES:
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {
+        "geometry": geometry_cache.stats(),
+        "plans": plan_cache.stats(),
+        "reports": report_cache.stats()
+    }
+
+# Cache statistics that only grow, exported as counters; lookups are named apart from the
+# 'cache.*_hits' counters of instrumented requests
+CACHE_TOTALS = {'hits': 'lookup_hits', 'misses': 'lookup_misses', 'evictions': 'evictions'}
+EXECUTOR_TOTALS = ('completed', 'rejected')
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Prometheus text exposition: summed stage timings and counters of instrumented estimates
+    (all of them with LASER_METRICS=1), cache and worker pool counters since start-up, plus cache,
+    worker pool and job gauges.
+    """
+    gauges, totals = {}, {}
+    for name, cache in (('geometry', geometry_cache), ('plans', plan_cache), ('reports', report_cache)):
+        for key, value in cache.stats().items():
+            if key in CACHE_TOTALS:
+                totals[f"cache_{name}_{CACHE_TOTALS[key]}"] = value
+            else:
+                gauges[f"cache_{name}_{key}"] = value
+    for key, value in executor.stats().items():
+        if key in EXECUTOR_TOTALS:
+            totals[f"executor_{key}"] = value
+        else:
+            gauges[f"executor_{key}"] = value
+    for key, value in job_manager.stats().items():
+        gauges[f"jobs_{key}"] = value
+    return PlainTextResponse(metrics.render(gauges, totals), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/executor/stats")
+def executor_stats():
+    return executor.stats()
+
+@app.get("/api/jobs")
+def jobs_stats():
+    return job_manager.stats()
 
 @app.get("/api/health")
 def health_check():
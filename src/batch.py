@@ -0,0 +1,211 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.parsers.svg_parser import LaserEntity, SVGParser
+from src.parsers.geometry_file import GEOMETRY_FILE_SUFFIX, load_entities, write_geometry
+from src.engine.calculator import LaserTimeCalculator
+from src.engine.geometry import DEFAULT_TOLERANCE
+from src.utils.cache import LRUCache
+from src.utils.diagnostics import DISABLED, Diagnostics
+
+# Approximate Python overhead of a LaserEntity on top of its share of the geometry arrays
+ENTITY_OVERHEAD_BYTES = 200
+
+# Entities of recently loaded files, kept by long-lived processes (see `enable_entity_cache`)
+_entity_cache: Optional[LRUCache] = None
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """
+    Expands glob patterns and directories into a sorted, de-duplicated list of SVG and geometry
+    files. A directory contributes its .svg and .ltg files, except geometry files saved next to an
+    SVG of the same name, which would estimate that job twice.
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = _directory_inputs(pattern)
+        elif glob.has_magic(pattern) and not os.path.exists(pattern):
+            matches = glob.glob(pattern, recursive=True)
+        else:
+            # Plain paths, even ones like 'part[1].svg', are kept as given; missing ones are reported for that file
+            matches = [pattern]
+        files.extend(sorted(matches))
+    return list(dict.fromkeys(files))
+
+
+def _directory_inputs(directory: str) -> List[str]:
+    svgs = glob.glob(os.path.join(glob.escape(directory), '*.svg'))
+    saved = {geometry_path(svg) for svg in svgs}
+    geometry_files = [path for path in glob.glob(os.path.join(glob.escape(directory), '*' + GEOMETRY_FILE_SUFFIX))
+                      if path not in saved]
+    return svgs + geometry_files
+
+
+def geometry_path(filepath: str) -> str:
+    """Where `--save_geometry` puts the geometry file of an SVG: next to it, with the .ltg suffix."""
+    return os.path.splitext(filepath)[0] + GEOMETRY_FILE_SUFFIX
+
+
+def _entities_nbytes(entities: List[LaserEntity]) -> int:
+    store = entities[0].store if entities else None
+    return (store.nbytes if store is not None else 0) + ENTITY_OVERHEAD_BYTES * len(entities)
+
+
+def enable_entity_cache(max_bytes: int) -> LRUCache:
+    """
+    Keeps the entities of loaded files in this process, keyed by path, modification time, size and
+    parse settings, so a warm process (see `src.server`) skips parsing files it has already seen.
+    """
+    global _entity_cache
+    _entity_cache = LRUCache(max_bytes, _entities_nbytes)
+    return _entity_cache
+
+
+def load_file_entities(filepath: str,
+                       ppi: float,
+                       streaming: bool,
+                       tolerance: float = DEFAULT_TOLERANCE,
+                       save_geometry: bool = False,
+                       diagnostics: Optional[Diagnostics] = None,
+                       parse_workers: int = 1) -> List[LaserEntity]:
+    """
+    Reads the entities of an SVG, or memory-maps them from a geometry file (.ltg), which skips parsing.
+    With `save_geometry` a parsed SVG's geometry is also written next to it for later runs.
+    `parse_workers > 1` parses large SVGs in parallel shards (see `SVGParser.parse`).
+    """
+    diagnostics = diagnostics or DISABLED
+    key = None
+    if _entity_cache is not None and not save_geometry:
+        status = os.stat(filepath)
+        key = (os.path.realpath(filepath), status.st_mtime_ns, status.st_size, ppi, streaming, tolerance)
+        entities = _entity_cache.get(key)
+        if entities is not None:
+            diagnostics.count('cache.geometry_hits')
+            return entities
+    entities = _load_file_entities(filepath, ppi, streaming, tolerance, save_geometry, diagnostics, parse_workers)
+    if key is not None:
+        _entity_cache.put(key, entities)
+    return entities
+
+
+def _load_file_entities(filepath: str,
+                        ppi: float,
+                        streaming: bool,
+                        tolerance: float,
+                        save_geometry: bool,
+                        diagnostics: Diagnostics,
+                        parse_workers: int) -> List[LaserEntity]:
+    if filepath.lower().endswith(GEOMETRY_FILE_SUFFIX):
+        with diagnostics.stage('parse.geometry_file'):
+            return load_entities(filepath)
+    parser = SVGParser(filepath, ppi=ppi, tolerance=tolerance)
+    entities = parser.parse(streaming=streaming, diagnostics=diagnostics, workers=parse_workers)
+    if save_geometry:
+        with diagnostics.stage('parse.save_geometry'):
+            write_geometry(parser.store, geometry_path(filepath), ppi, tolerance)
+    return entities
+
+
+def estimate_file(filepath: str,
+                  ppi: float,
+                  streaming: bool,
+                  calculator_kwargs: Dict[str, float],
+                  tolerance: float = DEFAULT_TOLERANCE,
+                  save_geometry: bool = False,
+                  diagnostics: bool = False) -> Dict[str, Any]:
+    """
+    Parses and estimates a single file. Runs inside worker processes, so failures are
+    returned as an `error` entry instead of being raised.
+    With `diagnostics` the report includes the per-stage timings of this file.
+    """
+    started = time.perf_counter()
+    recorder = Diagnostics() if diagnostics else None
+    try:
+        entities = load_file_entities(filepath, ppi, streaming, tolerance, save_geometry, recorder)
+        if not entities:
+            return {"file": filepath, "error": "No valid laser operation paths found in the provided SVG."}
+        report = LaserTimeCalculator(**calculator_kwargs).calculate_total_job(entities, diagnostics=recorder)
+        return {
+            "file": filepath,
+            "report": report,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+    except FileNotFoundError:
+        return {"file": filepath, "error": f"File not found: {filepath}"}
+    except Exception as e:
+        return {"file": filepath, "error": f"An error occurred while processing the SVG: {str(e)}"}
+
+
+def run_batch(files: List[str],
+              ppi: float,
+              streaming: bool,
+              calculator_kwargs: Dict[str, float],
+              workers: int,
+              tolerance: float = DEFAULT_TOLERANCE,
+              save_geometry: bool = False,
+              diagnostics: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Estimates many files in a process pool, yielding each result as soon as it finishes. Failures
+    stay per file: when a worker dies outright (e.g. killed for running out of memory) the pool
+    breaks, and the files it had not finished are estimated again one process each, so only the
+    file that kills its worker is reported as failed.
+    """
+    arguments = (ppi, streaming, calculator_kwargs, tolerance, save_geometry, diagnostics)
+    if workers <= 1:
+        for filepath in files:
+            yield estimate_file(filepath, *arguments)
+        return
+
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(estimate_file, filepath, *arguments): filepath for filepath in files}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                unfinished.append(futures[future])
+            except Exception as e:
+                yield {"file": futures[future], "error": f"An error occurred while processing the SVG: {str(e)}"}
+    if not unfinished:
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as isolated:
+        futures = {isolated.submit(_estimate_isolated, filepath, arguments): filepath for filepath in unfinished}
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _estimate_isolated(filepath: str, arguments: tuple) -> Dict[str, Any]:
+    """`estimate_file` in a process of its own, reporting a crash of that process as the file's error."""
+    try:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(estimate_file, filepath, *arguments).result()
+    except BrokenProcessPool:
+        return {"file": filepath, "error": "The worker process estimating this file exited unexpectedly"
+                                          " (killed, e.g. for running out of memory)"}
+    except Exception as e:
+        return {"file": filepath, "error": f"An error occurred while processing the SVG: {str(e)}"}
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Aggregates the per-file results of a batch run."""
+    succeeded = [r for r in results if "report" in r]
+    total_time = sum(r["report"]["estimated_total_time_seconds"] for r in succeeded)
+    hours, remainder = divmod(total_time, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    return {
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "estimated_total_time_seconds": round(total_time, 2),
+        "formatted_time": f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}",
+        "total_distance_burned_mm": round(sum(r["report"]["total_distance_burned_mm"] for r in succeeded), 2),
+        "total_distance_transit_mm": round(sum(r["report"]["total_distance_transit_mm"] for r in succeeded), 2),
+        "wall_time_seconds": round(elapsed, 3)
+    }
@@ -1,11 +1,27 @@
+import copy
 import math
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
 from svgelements import Point
 from src.parsers.svg_parser import LaserEntity
 from src.engine.math_engine import MathEngine
+from src.engine.clustering import ClusteredOptimizer, clustered_transit_order
+from src.engine.containment import build_containment
+from src.engine.geometry import GeometryStore, flatten_path
+from src.engine.optimizer import order_entities, transit_order
+from src.engine.kinematics import JUNCTION_MODELS, KinematicsEngine, RASTER_MODELS, flatten_job
+from src.engine.options import DEFAULT_OVERSCAN_FACTOR
+from src.engine.plan import JobPlan
+from src.engine.raster import scan_lines
+from src.engine.refine import TourRefiner
+from src.utils.diagnostics import DISABLED, Diagnostics
+from src.utils.progress import ProgressCallback
 
 class LaserTimeCalculator:
     """Calculates the execution time of a laser job based on the parsed entities."""
+
+    # Settings that shape the speed-independent plan, shared by every calculator of a batch
+    PLAN_SETTINGS = ('merge_raster', 'refine_seconds', 'cluster_size', 'cluster_compare')
     
     def __init__(self, 
                  cut_speed: float, 
@@ -16,7 +32,20 @@ class LaserTimeCalculator:
                  junction_delay: float = 0.05,
                  burn_dwell: float = 0.1,
                  scan_gap: float = 0.1,
-                 overscan_factor: float = 0.1):
+                 overscan_factor: float = DEFAULT_OVERSCAN_FACTOR,
+                 raster_model: str = 'scanline',
+                 merge_raster: bool = False,
+                 junction_model: str = 'lookahead',
+                 junction_deviation: float = 0.01,
+                 refine_seconds: float = 0.0,
+                 cluster_size: int = 0,
+                 cluster_workers: int = 1,
+                 cluster_compare: bool = False):
+        for name, value in (('cut_speed', cut_speed), ('vector_engrave_speed', vector_engrave_speed),
+                            ('raster_engrave_speed', raster_engrave_speed), ('transit_speed', transit_speed),
+                            ('acceleration', acceleration)):
+            if not value > 0:
+                raise ValueError(f"{name} must be greater than 0, got {value}")
         self.cut_speed = cut_speed
         self.vector_engrave_speed = vector_engrave_speed
         self.raster_engrave_speed = raster_engrave_speed
@@ -24,9 +53,38 @@ class LaserTimeCalculator:
         self.acceleration = acceleration
         self.junction_delay = junction_delay
         self.burn_dwell = burn_dwell
+        # Scanlines are counted as height / scan_gap, so a gap of zero has no meaningful estimate
+        if not scan_gap > 0:
+            raise ValueError(f"scan_gap must be greater than 0, got {scan_gap}")
         self.scan_gap = scan_gap
-        # Assume an overscan time penalty of 10% per raster pass for acceleration/deceleration
-        self.overscan_factor = overscan_factor 
+        # 'scanline' costs the real filled extent of each line, 'bbox' full-width passes (see RASTER_MODELS)
+        if raster_model not in RASTER_MODELS:
+            raise ValueError(f"raster_model must be one of: {', '.join(RASTER_MODELS)}, got {raster_model!r}")
+        self.raster_model = raster_model
+        # Only 'bbox' adds this share of every pass for acceleration/deceleration. 'scanline' ramps
+        # each line up to and down from the engrave speed in the overscan, 2 * speed / acceleration
+        # seconds per line however short it is (1.2 s at 300 mm/s and 500 mm/s²), which dominates
+        # small raster areas; a different factor there would be silently ignored
+        if overscan_factor != DEFAULT_OVERSCAN_FACTOR and raster_model != 'bbox':
+            raise ValueError(f"overscan_factor only applies to raster_model 'bbox', got {overscan_factor} "
+                             f"with {raster_model!r}")
+        self.overscan_factor = overscan_factor
+        # Engrave raster blocks with overlapping y-ranges together, in shared sweeps
+        self.merge_raster = merge_raster
+        # 'lookahead' plans the speed through every vertex from `junction_deviation` (mm),
+        # 'constant' adds `junction_delay` at every segment end (see JUNCTION_MODELS)
+        if junction_model not in JUNCTION_MODELS:
+            raise ValueError(f"junction_model must be one of: {', '.join(JUNCTION_MODELS)}, got {junction_model!r}")
+        self.junction_model = junction_model
+        self.junction_deviation = junction_deviation
+        # Budget of the 2-opt/Or-opt pass after the nearest-neighbour order (0 = off): a fixed step
+        # count derived from it (see `TourRefiner`), with the seconds as a wall-clock upper bound
+        self.refine_seconds = refine_seconds
+        # Order huge jobs cluster by cluster, about `cluster_size` entities each, on `cluster_workers`
+        # processes (0 = flat nearest-neighbour); `cluster_compare` also runs the flat solver for the report
+        self.cluster_size = cluster_size
+        self.cluster_workers = cluster_workers
+        self.cluster_compare = cluster_compare
 
     def _calculate_travel_time(self, distance: float, target_speed: float) -> float:
         """Calculates time for a move considering acceleration (trapezoidal profile)."""
@@ -49,20 +107,37 @@ class LaserTimeCalculator:
             peak_time = peak_speed / self.acceleration
             return 2 * peak_time
             
+    @staticmethod
+    def _entity_length(entity: LaserEntity) -> float:
+        if entity.store is not None:
+            return entity.store.entity_length(entity.index)
+        # Curve lengths come from the shared flattening table instead of integrating the path again
+        return float(flatten_path(entity.path)[2].sum()) if entity.path else 0.0
+
+    @staticmethod
+    def _entity_dimensions(entity: LaserEntity) -> Tuple[float, float]:
+        if entity.store is not None:
+            min_x, min_y, max_x, max_y = entity.store.bboxes[entity.index]
+            return (float(max_x - min_x), float(max_y - min_y))
+        return MathEngine.calculate_raster_dimensions(entity.path)
+
     def calculate_entity_time(self, entity: LaserEntity) -> float:
         """Calculates the time required to process a single entity."""
         if entity.process_type == 'cut':
-            length = MathEngine.calculate_length(entity.path)
+            length = self._entity_length(entity)
             return length / self.cut_speed
             
         elif entity.process_type == 'mark':
-            length = MathEngine.calculate_length(entity.path)
+            length = self._entity_length(entity)
             return length / self.vector_engrave_speed
             
         elif entity.process_type == 'raster':
-            width, height = MathEngine.calculate_raster_dimensions(entity.path)
+            width, height = self._entity_dimensions(entity)
             if width == 0 or height == 0:
                 return 0.0
+
+            if self.raster_model == 'scanline':
+                return self._scanline_raster_time(entity)
                 
             # Time per scan line = width / speed
             # Number of scan lines = height / scan_gap
@@ -76,56 +151,184 @@ class LaserTimeCalculator:
             
         return 0.0
 
+    def _scanline_raster_time(self, entity: LaserEntity) -> float:
+        """Sweeps the filled extent of every scanline, ramping up and down in the overscan."""
+        store, indices = GeometryStore.for_entities([entity])
+        lines = scan_lines(store, indices, self.scan_gap)
+        ramp_time = 2 * self.raster_engrave_speed / self.acceleration
+        return float(lines.extents.sum()) / self.raster_engrave_speed + len(lines) * ramp_time
+
     def optimize_transit_path(self, entities: List[LaserEntity]) -> List[LaserEntity]:
         """
-        Sorts entities using a simple nearest-neighbor heuristic to minimize transit moves.
-        Note: True TSP is O(N!), nearest neighbor is O(N^2) but "good enough" for most laser jobs.
+        Sorts entities using a nearest-neighbor heuristic to minimize transit moves.
+        Starting at (0, 0), the next entity is always the one whose start point is closest
+        to the end of the previous one. A KD-tree keeps this at O(N log N).
+        """
+        return order_entities(entities)
+
+    def calculate_total_job(self,
+                            entities: List[LaserEntity],
+                            optimize: bool = True,
+                            progress: ProgressCallback = None,
+                            diagnostics: Optional[Diagnostics] = None,
+                            timeline: bool = False) -> Dict[str, Any]:
+        """
+        Calculates the complete job process analyzing transit between entities and process times.
+        The ordered job is flattened into NumPy arrays and costed in batched operations.
+        Pass `optimize=False` for entities already sorted by `optimize_transit_path`.
+        With `diagnostics` the report gets a `diagnostics` block with the 'calculate.*' stages and
+        whatever else was recorded on it, e.g. the parse stages.
+        With `timeline` the report's `timeline` entry holds the `Timeline` of the job; it is not
+        JSON, callers serialise it (see `Timeline.write`, `iter_ndjson`, `to_dict`).
+        """
+        diagnostics = diagnostics or DISABLED
+        with diagnostics.stage('calculate'):
+            plan = self.plan_job(entities, optimize, progress, diagnostics, timeline)
+            report = self.evaluate_plan(plan, progress, diagnostics, timeline)
+        if diagnostics.enabled:
+            report['diagnostics'] = diagnostics.report()
+        return report
+
+    def plan_job(self,
+                 entities: List[LaserEntity],
+                 optimize: bool = True,
+                 progress: ProgressCallback = None,
+                 diagnostics: Optional[Diagnostics] = None,
+                 timeline: bool = False) -> JobPlan:
+        """
+        Runs the speed-independent part of the estimate: ordering, flattening and the containment
+        hierarchy. Only the `PLAN_SETTINGS` of this calculator shape the plan;
+        any calculator with the same `merge_raster` can evaluate it.
+        With `timeline` the plan keeps the rows a timeline is timed from.
+        """
+        diagnostics = diagnostics or DISABLED
+        store, indices = GeometryStore.for_entities(entities)
+        store, indices, order, sections = self._order_job(
+            store, indices, optimize, self.refine_seconds, progress, diagnostics, self._clustering()
+        )
+        with diagnostics.stage('calculate.flatten'):
+            job = flatten_job(store, indices, self.merge_raster, timeline)
+        diagnostics.count('calculate.entities', len(indices))
+        diagnostics.count('calculate.segments', len(job.burn_lengths))
+        diagnostics.count('calculate.moves', len(job.move_distances))
+        return JobPlan(job=job, order=order, merge_raster=self.merge_raster, sections=sections)
+
+    def evaluate_plan(self,
+                      plan: JobPlan,
+                      progress: ProgressCallback = None,
+                      diagnostics: Optional[Diagnostics] = None,
+                      timeline: bool = False) -> Dict[str, Any]:
+        """
+        Turns a plan into a report for this calculator's machine parameters.
+        With `timeline` (the plan must be built with it) the report holds the job's `Timeline`.
+        """
+        if plan.merge_raster != self.merge_raster:
+            raise ValueError(f"The plan was built with merge_raster={plan.merge_raster}")
+        if timeline and not plan.has_timeline:
+            raise ValueError("The plan was built without timeline rows")
+        with (diagnostics or DISABLED).stage('calculate.evaluate'):
+            result = plan.evaluate([self._profile()], timeline)[0]
+        if progress:
+            progress('segments_costed', len(plan.job.burn_lengths))
+        return self._report_from_result(result, plan.sections)
+
+    @classmethod
+    def calculate_batch(cls,
+                        entities: List[LaserEntity],
+                        parameter_sets: List[Dict[str, float]],
+                        optimize: bool = True) -> List[Dict[str, Any]]:
+        """
+        Calculates one report per parameter set for the same job.
+        Each set holds `LaserTimeCalculator` constructor arguments. Geometry flattening and transit
+        ordering are shared; only the speed-dependent pass runs, vectorized across all sets.
         """
-        if not entities:
+        calculators = [cls(**params) for params in parameter_sets]
+        if not calculators:
             return []
-            
-        unvisited = entities.copy()
-        # Start at 0,0 (Home)
-        current_pos = Point(0, 0)
-        optimized_order = []
-        
-        while unvisited:
-            # Find the nearest next entity
-            nearest = None
-            min_dist = float('inf')
-            
-            for entity in unvisited:
-                # Approximate start point of entity as the first subpath's first point
-                if entity.path and len(entity.path) > 0:
-                    try:
-                        start_point = entity.path[0].start
-                    except AttributeError:
-                        start_point = current_pos # Fallback if path parsing behaves unexpectedly
-                        
-                    dist = MathEngine.calculate_euclidean_distance(current_pos, start_point)
-                    if dist < min_dist:
-                        min_dist = dist
-                        nearest = entity
+        for setting in cls.PLAN_SETTINGS:
+            value = getattr(calculators[0], setting)
+            if any(getattr(c, setting) != value for c in calculators):
+                raise ValueError(f"All parameter sets of a batch must use the same {setting} setting")
+
+        plan = calculators[0].plan_job(entities, optimize)
+        results = plan.evaluate([c._profile() for c in calculators])
+        return [cls._report_from_result(result, plan.sections) for result in results]
+
+    @staticmethod
+    def _order_job(store: GeometryStore,
+                   indices,
+                   optimize: bool,
+                   refine_seconds: float,
+                   progress: ProgressCallback = None,
+                   diagnostics: Diagnostics = DISABLED,
+                   clustering: Optional[ClusteredOptimizer] = None):
+        """
+        Orders the job for cutting: nearest-neighbour first (unless the entities are already ordered),
+        then, with a `refine_seconds` budget, local search that also reverses open paths and rotates
+        closed ones. Both keep inner contours ahead of the cut contours around them. With `clustering`
+        the nearest-neighbour order is built cluster by cluster (see `ClusteredOptimizer`).
+        Returns: (store, indices, order, report sections) where `order` lists the visited entities as
+        positions into the input; a refined job comes back as a new, already oriented store visited
+        in storage order.
+        """
+        with diagnostics.stage('calculate.containment'):
+            hierarchy = build_containment(store, indices)
+        sections = {'containment': hierarchy.report(np.arange(len(indices)))}
+        parents = hierarchy.parents
+        order = np.arange(len(indices))
+        if optimize:
+            with diagnostics.stage('calculate.order'):
+                if clustering is None:
+                    order = transit_order(store, indices, progress, parents)
                 else:
-                    nearest = entity # Handle empty paths by just consuming them
-                    min_dist = 0
-            
-            # Best matched entity
-            unvisited.remove(nearest)
-            optimized_order.append(nearest)
-            
-            # Update current_pos to the endpoint of the processed entity
-            if nearest.path and len(nearest.path) > 0:
-                try:
-                    current_pos = nearest.path[-1].end
-                except AttributeError:
-                    pass
+                    tour = clustered_transit_order(store, indices, clustering, progress, parents)
+                    order = tour.order
+                    sections['transit_clustering'] = tour.stats()
+                    diagnostics.count('calculate.clusters', tour.clusters)
+            indices = indices[order]
+            position = np.empty(len(order), dtype=np.int64)
+            position[order] = np.arange(len(order))
+            parents = np.where(parents >= 0, position[parents], -1)[order]
+        if refine_seconds <= 0:
+            return store, indices, order, sections
+        with diagnostics.stage('calculate.refine'):
+            tour = TourRefiner(refine_seconds).refine(store, indices, parents=parents)
+            store = store.oriented(indices[tour.positions], tour.reverse, tour.start_vertex)
+        sections['transit_refinement'] = tour.stats()
+        return store, np.arange(len(store)), order[tour.positions], sections
 
-        return optimized_order
+    def _clustering(self) -> Optional[ClusteredOptimizer]:
+        if self.cluster_size <= 0:
+            return None
+        return ClusteredOptimizer(self.cluster_size, self.cluster_workers, self.cluster_compare)
 
-    def calculate_total_job(self, entities: List[LaserEntity]) -> Dict[str, Any]:
+    def _profile(self) -> Dict[str, Any]:
+        """Machine parameters in the form the kinematics engine expects."""
+        profile = {name: getattr(self, name) for name in KinematicsEngine.PROFILE_FIELDS}
+        profile['raster_model'] = self.raster_model
+        profile['junction_model'] = self.junction_model
+        return profile
+
+    @classmethod
+    def _report_from_result(cls,
+                            result: Dict[str, Any],
+                            sections: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        report = cls._build_report(
+            result['total_time'],
+            result['transit_time'],
+            result['distance_burned'],
+            result['distance_transit'],
+            result['layer_breakdown']
+        )
+        report.update(copy.deepcopy(sections or {}))
+        if 'timeline' in result:
+            report['timeline'] = result['timeline']
+        return report
+
+    def calculate_total_job_scalar(self, entities: List[LaserEntity]) -> Dict[str, Any]:
         """
-        Calculates the complete job process analyzing transit between entities and process times.
+        Segment-by-segment reference implementation of `calculate_total_job`.
+        Kept to validate the vectorized kinematics engine; requires entities that still hold their `path`.
         """
         optimized_entities = self.optimize_transit_path(entities)
         
@@ -201,6 +404,21 @@ class LaserTimeCalculator:
                     layer_breakdown[entity.process_type]['distance'] += length
                     current_pos = segment.end
         
+        return self._build_report(
+            total_time,
+            transit_time,
+            total_distance_burned,
+            total_distance_transit,
+            layer_breakdown
+        )
+
+    @staticmethod
+    def _build_report(total_time: float,
+                      transit_time: float,
+                      total_distance_burned: float,
+                      total_distance_transit: float,
+                      layer_breakdown: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+        """Formats the final JSON-ready report."""
         # Convert total time to HH:MM:SS format
         hours, remainder = divmod(total_time, 3600)
         minutes, seconds = divmod(remainder, 60)
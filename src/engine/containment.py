@@ -0,0 +1,203 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+import numpy as np
+from src.engine.geometry import GeometryStore, PROCESS_CODES, VERTEX_MOVE
+from src.engine.raster import polygon_edges
+
+# Bbox slack, in mm, when testing whether one box holds another
+BOX_EPSILON = 1e-9
+# Upper bound on (pair, edge) rows processed at once by the point-in-polygon test
+MAX_CROSSING_ROWS = 1 << 21
+
+
+class BoxTree:
+    """
+    Static R-tree over axis-aligned boxes (min_x, min_y, max_x, max_y), bulk-loaded with
+    Sort-Tile-Recursive packing. Queries run for a whole batch of boxes at once, one tree
+    level at a time, so a lookup costs O(log N) array work per query instead of a Python loop.
+    """
+
+    def __init__(self, boxes: np.ndarray, fanout: int = 16):
+        self.fanout = fanout
+        self.item_order = self._str_order(boxes)
+        self.item_boxes = boxes[self.item_order]
+
+        # levels[k] = (boxes, child_start, child_stop) with children in level k - 1 (items for k = 0)
+        self.levels = []
+        entries = self.item_boxes
+        while len(entries) > fanout:
+            child_start = np.arange(0, len(entries), fanout)
+            child_stop = np.minimum(child_start + fanout, len(entries))
+            node_boxes = np.hstack([
+                np.minimum.reduceat(entries[:, :2], child_start),
+                np.maximum.reduceat(entries[:, 2:], child_start)
+            ])
+            order = self._str_order(node_boxes)
+            self.levels.append((node_boxes[order], child_start[order], child_stop[order]))
+            entries = node_boxes[order]
+
+    def _str_order(self, boxes: np.ndarray) -> np.ndarray:
+        """Sorts boxes into vertical slabs by x centre, then by y centre inside every slab."""
+        count = len(boxes)
+        centre_x = boxes[:, 0] + boxes[:, 2]
+        centre_y = boxes[:, 1] + boxes[:, 3]
+        leaves = -(-count // self.fanout)
+        slab_size = max(int(np.ceil(np.sqrt(leaves))), 1) * self.fanout
+        by_x = np.argsort(centre_x, kind='stable')
+        slab = np.arange(count) // slab_size
+        return by_x[np.lexsort((centre_y[by_x], slab))]
+
+    def containing(self, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds every stored box that holds a query box.
+        Returns: (query, item) arrays of matching pairs, as positions into `boxes` and the stored boxes.
+        """
+        if not self.levels:
+            top_boxes = self.item_boxes
+        else:
+            top_boxes = self.levels[-1][0]
+        query = np.repeat(np.arange(len(boxes)), len(top_boxes))
+        entry = np.tile(np.arange(len(top_boxes)), len(boxes))
+
+        for level in range(len(self.levels) - 1, -1, -1):
+            node_boxes, child_start, child_stop = self.levels[level]
+            keep = self._holds(node_boxes[entry], boxes[query])
+            query, entry = query[keep], entry[keep]
+            counts = child_stop[entry] - child_start[entry]
+            base = np.repeat(child_start[entry] - (np.cumsum(counts) - counts), counts)
+            query = np.repeat(query, counts)
+            entry = base + np.arange(len(base))
+
+        keep = self._holds(self.item_boxes[entry], boxes[query])
+        return query[keep], self.item_order[entry[keep]]
+
+    @staticmethod
+    def _holds(outer: np.ndarray, inner: np.ndarray) -> np.ndarray:
+        return ((outer[:, 0] <= inner[:, 0] + BOX_EPSILON) & (outer[:, 1] <= inner[:, 1] + BOX_EPSILON)
+                & (outer[:, 2] >= inner[:, 2] - BOX_EPSILON) & (outer[:, 3] >= inner[:, 3] - BOX_EPSILON))
+
+
+@dataclass
+class ContainmentHierarchy:
+    """Which closed cut contour directly encloses each entity of a job."""
+    parents: np.ndarray  # Position of the innermost enclosing cut contour, -1 for top-level entities
+    depth: np.ndarray    # Number of contours around the entity
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def report(self, entity_ids: np.ndarray) -> Dict[str, Any]:
+        """Summary for the job report; `entity_ids` maps positions to the caller's entity numbers."""
+        nested = np.flatnonzero(self.parents >= 0)
+        return {
+            'nested_entities': int(len(nested)),
+            'max_depth': int(self.depth.max()) if len(self.depth) else 0,
+            'parents': [[int(entity_ids[i]), int(entity_ids[self.parents[i]])] for i in nested]
+        }
+
+
+def closed_cuts(store: GeometryStore, indices: np.ndarray) -> np.ndarray:
+    """Flags cut entities whose subpaths all end where they start, i.e. outlines that release a part."""
+    first = store.entity_offsets[indices]
+    counts = store.entity_offsets[indices + 1] - first
+    total = int(counts.sum())
+    closed = (store.process_codes[indices] == PROCESS_CODES['cut']) & (counts >= 3)
+    if total == 0:
+        return closed
+
+    vertex_entity = np.repeat(np.arange(len(indices)), counts)
+    entity_start = np.repeat(np.cumsum(counts) - counts, counts)
+    vertex_ids = first[vertex_entity] + np.arange(total) - entity_start
+    ring_start = (store.vertex_flags[vertex_ids] & VERTEX_MOVE) != 0
+    ring_start[np.arange(total) == entity_start] = True
+    ring_end = np.append(ring_start[1:], True)
+
+    heads, tails = vertex_ids[ring_start], vertex_ids[ring_end]
+    ring_closed = np.all(np.abs(store.vertices[heads] - store.vertices[tails]) <= BOX_EPSILON, axis=1)
+    ring_closed &= tails - heads >= 2
+    open_rings = np.bincount(vertex_entity[ring_start], weights=~ring_closed, minlength=len(indices))
+    return closed & (open_rings == 0)
+
+
+def points_in_polygons(points: np.ndarray,
+                       polygons: np.ndarray,
+                       edge_offsets: np.ndarray,
+                       starts: np.ndarray,
+                       ends: np.ndarray) -> np.ndarray:
+    """
+    Even-odd test of points[i] against the edges of polygon polygons[i]; polygon p owns the edges
+    edge_offsets[p]:edge_offsets[p + 1]. Processed in chunks of at most MAX_CROSSING_ROWS edges.
+    """
+    inside = np.zeros(len(points), dtype=bool)
+    counts = edge_offsets[polygons + 1] - edge_offsets[polygons]
+    bounds = np.r_[0, np.cumsum(counts)]
+    chunk_start = 0
+    while chunk_start < len(points):
+        chunk_stop = int(np.searchsorted(bounds, bounds[chunk_start] + MAX_CROSSING_ROWS, side='right')) - 1
+        chunk_stop = max(chunk_stop, chunk_start + 1)
+        chunk = slice(chunk_start, chunk_stop)
+
+        pair = np.repeat(np.arange(chunk_stop - chunk_start), counts[chunk])
+        local = np.arange(len(pair)) - np.repeat(bounds[chunk] - bounds[chunk_start], counts[chunk])
+        edge = edge_offsets[polygons[chunk]][pair] + local
+        px, py = points[chunk][pair, 0], points[chunk][pair, 1]
+        x0, y0 = starts[edge, 0], starts[edge, 1]
+        x1, y1 = ends[edge, 0], ends[edge, 1]
+
+        straddles = (y0 > py) != (y1 > py)
+        dy = np.where(straddles, y1 - y0, 1.0)
+        crossing = straddles & (px < x0 + (py - y0) * (x1 - x0) / dy)
+        hits = np.bincount(pair, weights=crossing, minlength=chunk_stop - chunk_start)
+        inside[chunk] = hits % 2 == 1
+        chunk_start = chunk_stop
+    return inside
+
+
+def build_containment(store: GeometryStore, indices: np.ndarray) -> ContainmentHierarchy:
+    """
+    Builds the containment hierarchy of the selected entities.
+    Closed cut contours are indexed in a `BoxTree`; an entity is inside a contour when the contour's
+    bbox holds its bbox and its first vertex passes the even-odd test against the contour's rings.
+    Its parent is the enclosing contour with the smallest bbox.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    count = len(indices)
+    parents = np.full(count, -1, dtype=np.int64)
+    _, _, valid = store.endpoints(indices)
+    containers = np.flatnonzero(closed_cuts(store, indices))
+    if len(containers) == 0 or count < 2:
+        return ContainmentHierarchy(parents=parents, depth=np.zeros(count, dtype=np.int64))
+
+    boxes = store.bboxes[indices]
+    candidates = np.flatnonzero(valid)
+    query, item = BoxTree(boxes[containers]).containing(boxes[candidates])
+    child, parent = candidates[query], containers[item]
+
+    # A contour never holds itself, and equal boxes only hold entities that cannot hold anything back
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    is_container = np.zeros(count, dtype=bool)
+    is_container[containers] = True
+    keep = (child != parent) & ((area[parent] > area[child]) | ~is_container[child])
+    child, parent = child[keep], parent[keep]
+
+    container_position = np.full(count, -1, dtype=np.int64)
+    container_position[containers] = np.arange(len(containers))
+    edge_entity, starts, ends = polygon_edges(store, indices[containers])
+    edge_offsets = np.r_[0, np.cumsum(np.bincount(edge_entity, minlength=len(containers)))]
+    points = store.vertices[store.entity_offsets[indices[child]]]
+    inside = points_in_polygons(points, container_position[parent], edge_offsets, starts, ends)
+    child, parent = child[inside], parent[inside]
+
+    # The innermost enclosing contour has the smallest bbox
+    order = np.lexsort((parent, area[parent], child))
+    child, parent = child[order], parent[order]
+    first = np.r_[True, child[1:] != child[:-1]] if len(child) else np.zeros(0, dtype=bool)
+    parents[child[first]] = parent[first]
+
+    depth = np.zeros(count, dtype=np.int64)
+    ancestor = parents.copy()
+    while (ancestor >= 0).any():
+        has = ancestor >= 0
+        depth[has] += 1
+        ancestor[has] = parents[ancestor[has]]
+    return ContainmentHierarchy(parents=parents, depth=depth)
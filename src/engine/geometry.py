@@ -0,0 +1,440 @@
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
+import numpy as np
+import svgelements
+from src.engine.options import DEFAULT_TOLERANCE, check_tolerance
+from src.utils.cache import LRUCache
+
+if TYPE_CHECKING:
+    from src.parsers.svg_parser import LaserEntity
+
+# Integer codes used for the process type in flattened arrays
+PROCESS_CODES = {'cut': 0, 'mark': 1, 'raster': 2}
+PROCESS_NAMES = ('cut', 'mark', 'raster')
+
+# Vertex flags
+VERTEX_MOVE = 1        # Reached by a transit move (first point of a subpath)
+VERTEX_JUNCTION = 2    # Ends an original SVG segment
+
+MAX_CURVE_PIECES = 4096
+
+# Gauss-Legendre rule used to integrate the arc length of every chord's curve piece
+GAUSS_NODES, GAUSS_WEIGHTS = np.polynomial.legendre.leggauss(8)
+
+# Flattened curves keyed by their shape relative to the start point, so repeated
+# glyphs and parts, and repeated runs in one process, are only integrated once
+CURVE_KEY_DECIMALS = 9
+CURVE_ENTRY_OVERHEAD = 300
+curve_cache = LRUCache(
+    max_bytes=32 * 2**20,
+    sizeof=lambda entry: entry[0].nbytes + entry[1].nbytes + CURVE_ENTRY_OVERHEAD
+)
+
+
+def _bezier_points(controls: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Evaluates a Bézier curve of any degree at the parameters `t` (Bernstein form)."""
+    degree = len(controls) - 1
+    t = t[:, None]
+    points = np.zeros((len(t), 2))
+    coefficient = 1
+    for i, control in enumerate(controls):
+        points += coefficient * (1 - t) ** (degree - i) * t ** i * control
+        coefficient = coefficient * (degree - i) // (i + 1)
+    return points
+
+
+def _bezier_speed(controls: np.ndarray, t: np.ndarray) -> np.ndarray:
+    derivative = (len(controls) - 1) * np.diff(controls, axis=0)
+    velocity = _bezier_points(derivative, t)
+    return np.hypot(velocity[:, 0], velocity[:, 1])
+
+
+def _bezier_pieces(controls: np.ndarray, tolerance: float) -> int:
+    """Chord count that keeps a Bézier within `tolerance` (Wang's formula)."""
+    degree = len(controls) - 1
+    second = np.diff(controls, n=2, axis=0)
+    bend = float(np.hypot(second[:, 0], second[:, 1]).max())
+    return int(np.ceil(np.sqrt(degree * (degree - 1) * bend / (8 * tolerance))))
+
+
+def _arc_pieces(radius: float, sweep: float, tolerance: float) -> int:
+    """Chord count that keeps the sagitta of every chord within `tolerance`."""
+    if tolerance >= radius:
+        return int(np.ceil(abs(sweep) / np.pi))
+    step = 2 * np.arccos(1 - tolerance / radius)
+    return int(np.ceil(abs(sweep) / step))
+
+
+def _piece_lengths(speed, edges: np.ndarray) -> np.ndarray:
+    """Integrates `speed(t)` over every [edges[i], edges[i + 1]] with the Gauss-Legendre rule."""
+    half = np.diff(edges)[:, None] / 2
+    nodes = (edges[:-1, None] + half) + half * GAUSS_NODES
+    return (speed(nodes.ravel()).reshape(nodes.shape) * GAUSS_WEIGHTS).sum(axis=1) * half[:, 0]
+
+
+def _flatten_bezier(controls: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    pieces = min(max(_bezier_pieces(controls, tolerance), 1), MAX_CURVE_PIECES)
+    edges = np.linspace(0.0, 1.0, pieces + 1)
+    points = _bezier_points(controls, edges[1:])
+    return points, _piece_lengths(lambda t: _bezier_speed(controls, t), edges)
+
+
+def _flatten_arc(shape: Sequence[float], tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Flattens an arc given as (rx, ry, rotation, sweep, center x, center y, start angle), relative to its start."""
+    rx, ry, rotation, sweep, center_x, center_y, start_t = shape
+    pieces = min(max(_arc_pieces(max(rx, ry), sweep, tolerance), 1), MAX_CURVE_PIECES)
+    cos_rot, sin_rot = np.cos(rotation), np.sin(rotation)
+    center = np.array([center_x, center_y])
+
+    edges = np.linspace(0.0, 1.0, pieces + 1)
+    theta = start_t + sweep * edges[1:]
+    x, y = rx * np.cos(theta), ry * np.sin(theta)
+    points = np.column_stack([x * cos_rot - y * sin_rot, x * sin_rot + y * cos_rot]) + center
+
+    def speed(t):
+        angle = start_t + sweep * t
+        return abs(sweep) * np.hypot(rx * np.sin(angle), ry * np.cos(angle))
+
+    return points, _piece_lengths(speed, edges)
+
+
+def flatten_curve(segment, tolerance: float = DEFAULT_TOLERANCE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Replaces a curved segment by chords that stay within `tolerance` of it.
+    Returns: (points, lengths) with the chord end points and the arc length of the curve
+    piece each chord stands for, integrated once and cached in `curve_cache`.
+    """
+    start = np.array([segment.start.x, segment.start.y])
+    end = np.array([segment.end.x, segment.end.y])
+    seg_type = type(segment).__name__
+
+    if seg_type == 'Arc':
+        if not segment.rx or not segment.ry or not segment.sweep:
+            return end[None, :], np.array([float(np.hypot(*(end - start)))])
+        shape = np.array([segment.rx, segment.ry, segment.get_rotation(), segment.sweep,
+                          segment.center.x - start[0], segment.center.y - start[1], segment.get_start_t()],
+                         dtype=np.float64)
+    else:
+        controls = np.array([[point.x, point.y] for point in segment]) - start
+        shape = controls[1:].ravel()
+
+    # Curves are flattened from the rounded shape in the key, so a cached entry is exactly what
+    # flattening this segment gives: results never depend on what was parsed before
+    shape = np.round(shape, CURVE_KEY_DECIMALS)
+    key = (seg_type, tolerance, *shape.tolist())
+    entry = curve_cache.get(key)
+    if entry is None:
+        if seg_type == 'Arc':
+            entry = _flatten_arc(shape.tolist(), tolerance)
+        else:
+            entry = _flatten_bezier(np.vstack([np.zeros((1, 2)), shape.reshape(-1, 2)]), tolerance)
+        curve_cache.put(key, entry)
+
+    relative, lengths = entry
+    points = relative + start
+    # Land exactly on the segment end so the next segment continues without drift
+    points[-1] = end
+    return points, lengths
+
+
+def flatten_path(path: svgelements.Path,
+                 tolerance: float = DEFAULT_TOLERANCE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Converts an svgelements Path into a polyline.
+    Returns: (vertices, flags, lengths) where `lengths[i]` is the burned length of the piece ending at vertex i.
+    Curves are split adaptively into chords within `tolerance` mm (see `flatten_curve`).
+    """
+    points: List[Tuple[float, float]] = []
+    flags: List[int] = []
+    lengths: List[float] = []
+
+    if not path:
+        return np.zeros((0, 2)), np.zeros(0, dtype=np.uint8), np.zeros(0)
+
+    for segment in path:
+        end = segment.end
+        if end is None:
+            continue
+        seg_type = type(segment).__name__
+
+        if seg_type == 'Move':
+            points.append((end.x, end.y))
+            flags.append(VERTEX_MOVE)
+            lengths.append(0.0)
+            continue
+
+        if not points:
+            # Path without a leading Move: the head is already at its start point
+            start = segment.start
+            points.append((start.x, start.y))
+            flags.append(0)
+            lengths.append(0.0)
+
+        if seg_type in ('Line', 'Close'):
+            points.append((end.x, end.y))
+            flags.append(VERTEX_JUNCTION)
+            lengths.append(segment.length())
+            continue
+
+        curve_points, curve_lengths = flatten_curve(segment, tolerance)
+        points.extend(curve_points.tolist())
+        flags.extend([0] * (len(curve_points) - 1) + [VERTEX_JUNCTION])
+        lengths.extend(curve_lengths.tolist())
+
+    return (np.asarray(points, dtype=np.float64).reshape(-1, 2),
+            np.asarray(flags, dtype=np.uint8),
+            np.asarray(lengths, dtype=np.float64))
+
+
+class GeometryStore:
+    """
+    Compact, array-backed geometry for a whole job.
+
+    All entities share one contiguous (V, 2) vertex array. Entity i owns the vertices
+    `entity_offsets[i]:entity_offsets[i + 1]`, together with their flags and piece lengths.
+    """
+
+    __slots__ = ('vertices', 'vertex_flags', 'segment_lengths',
+                 'entity_offsets', 'process_codes', 'bboxes')
+
+    def __init__(self,
+                 vertices: np.ndarray,
+                 vertex_flags: np.ndarray,
+                 segment_lengths: np.ndarray,
+                 entity_offsets: np.ndarray,
+                 process_codes: np.ndarray,
+                 bboxes: np.ndarray):
+        self.vertices = vertices
+        self.vertex_flags = vertex_flags
+        self.segment_lengths = segment_lengths
+        self.entity_offsets = entity_offsets
+        self.process_codes = process_codes
+        self.bboxes = bboxes
+
+    def __len__(self) -> int:
+        return len(self.process_codes)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays, in bytes."""
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def entity_slice(self, index: int) -> slice:
+        return slice(int(self.entity_offsets[index]), int(self.entity_offsets[index + 1]))
+
+    def entity_length(self, index: int) -> float:
+        """Total burned length of an entity."""
+        return float(self.segment_lengths[self.entity_slice(index)].sum())
+
+    def endpoints(self, indices: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the first and last vertex of the selected entities.
+        Returns: (starts, ends, valid) where `valid` flags entities that have geometry.
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        first = self.entity_offsets[indices]
+        last = self.entity_offsets[indices + 1]
+        valid = last > first
+
+        starts = np.zeros((len(indices), 2), dtype=np.float64)
+        ends = np.zeros((len(indices), 2), dtype=np.float64)
+        starts[valid] = self.vertices[first[valid]]
+        ends[valid] = self.vertices[last[valid] - 1]
+        return starts, ends, valid
+
+    def orientability(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns: (reversible, closed) flags of the selected entities.
+        Only single-subpath cut/mark entities can be burned backwards; closed ones can also start at any vertex.
+        """
+        first = self.entity_offsets[indices]
+        counts = self.entity_offsets[indices + 1] - first
+        move_count = np.r_[0, np.cumsum((self.vertex_flags & VERTEX_MOVE) != 0)]
+        moves = move_count[first + counts] - move_count[first]
+
+        has_geometry = counts >= 2
+        leading_move = np.zeros(len(indices), dtype=bool)
+        leading_move[has_geometry] = (self.vertex_flags[first[has_geometry]] & VERTEX_MOVE) != 0
+        single_run = has_geometry & leading_move & (moves == 1)
+        reversible = single_run & (self.process_codes[indices] != PROCESS_CODES['raster'])
+
+        closed = np.zeros(len(indices), dtype=bool)
+        last = first + counts - 1
+        closed[reversible] = np.all(
+            np.abs(self.vertices[first[reversible]] - self.vertices[last[reversible]]) <= 1e-9, axis=1
+        ) & (counts[reversible] >= 3)
+        return reversible, closed
+
+    def oriented(self, indices: np.ndarray, reverse: np.ndarray, start_vertex: np.ndarray) -> 'GeometryStore':
+        """
+        Packs the selected entities into a new store, entity i being `indices[i]` re-oriented.
+        Closed entities with `start_vertex[i] > 0` start (and end) at that local vertex; entities
+        with `reverse[i]` are burned backwards. Both only apply to entities flagged by `orientability`.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        first = self.entity_offsets[indices]
+        counts = self.entity_offsets[indices + 1] - first
+        total = int(counts.sum())
+
+        entity = np.repeat(np.arange(len(indices)), counts)
+        local = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        n = counts[entity]
+        shift = np.asarray(start_vertex, dtype=np.int64)[entity]
+        flip = np.asarray(reverse, dtype=bool)[entity]
+
+        # Position in the rotated sequence start, start + 1, ..., n - 1, 1, ..., start
+        position = np.where(flip, n - 1 - local, local)
+        rotated = shift + position
+        rotated = np.where(rotated > n - 1, rotated - (n - 1), rotated)
+        source = first[entity] + rotated
+
+        vertices = self.vertices[source]
+        lengths = np.zeros(total)
+        flags = np.zeros(total, dtype=np.uint8)
+
+        # Forward: the piece ending at a vertex keeps its length and flags
+        forward = ~flip & (local > 0)
+        lengths[forward] = self.segment_lengths[source[forward]]
+        flags[forward] = self.vertex_flags[source[forward]]
+
+        # Backward: the piece ending at a vertex is the one that started there, and the
+        # segment ends move to the original segment starts
+        backward = flip & (local > 0)
+        ahead = first[entity] + np.where(rotated + 1 > n - 1, rotated + 1 - (n - 1), rotated + 1)
+        lengths[backward] = self.segment_lengths[ahead[backward]]
+        ends_segment = (self.vertex_flags[source] & VERTEX_JUNCTION) != 0
+        segment_start = (position == 0) | (ends_segment & (position < n - 1))
+        flags[backward & segment_start] = VERTEX_JUNCTION
+
+        flags[local == 0] = self.vertex_flags[first[entity[local == 0]]]
+
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return GeometryStore(
+            vertices=vertices,
+            vertex_flags=flags,
+            segment_lengths=lengths,
+            entity_offsets=offsets,
+            process_codes=self.process_codes[indices],
+            bboxes=self.bboxes[indices]
+        )
+
+    @staticmethod
+    def concatenate(stores: Sequence['GeometryStore']) -> 'GeometryStore':
+        """Packs several stores into one, keeping their entities in order."""
+        counts = [np.diff(store.entity_offsets) for store in stores]
+        offsets = np.zeros(sum(len(c) for c in counts) + 1, dtype=np.int64)
+        if len(offsets) > 1:
+            np.cumsum(np.concatenate(counts), out=offsets[1:])
+        return GeometryStore(
+            vertices=np.concatenate([store.vertices for store in stores]).reshape(-1, 2),
+            vertex_flags=np.concatenate([store.vertex_flags for store in stores]).astype(np.uint8),
+            segment_lengths=np.concatenate([store.segment_lengths for store in stores]).astype(np.float64),
+            entity_offsets=offsets,
+            process_codes=np.concatenate([store.process_codes for store in stores]).astype(np.uint8),
+            bboxes=np.concatenate([store.bboxes for store in stores]).reshape(-1, 4)
+        )
+
+    @staticmethod
+    def for_entities(entities: Sequence['LaserEntity']) -> Tuple['GeometryStore', np.ndarray]:
+        """
+        Returns the store backing `entities` and the index of each entity in it.
+        Entities parsed together already share a store; anything else is flattened into a new one.
+        """
+        if entities and entities[0].store is not None:
+            store = entities[0].store
+            if all(entity.store is store for entity in entities):
+                return store, np.fromiter((entity.index for entity in entities), dtype=np.int64, count=len(entities))
+
+        builder = GeometryBuilder()
+        for entity in entities:
+            if entity.store is not None:
+                builder.add_from_store(entity.store, entity.index)
+            else:
+                builder.add_path(entity.path, entity.process_type)
+        return builder.build(), np.arange(len(entities), dtype=np.int64)
+
+
+class GeometryBuilder:
+    """
+    Accumulates flattened entities and packs them into a `GeometryStore`.
+    With a `scale`, geometry is added in source units (e.g. SVG pixels) and `build()` converts
+    all of it to mm in one array operation; curves are still flattened within `tolerance` mm.
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE, scale: float = 1.0):
+        self.tolerance = check_tolerance(tolerance)
+        self.scale = scale
+        self._vertices: List[np.ndarray] = []
+        self._flags: List[np.ndarray] = []
+        self._lengths: List[np.ndarray] = []
+        self._counts: List[int] = []
+        self._codes: List[int] = []
+        self._bboxes: List[Tuple[float, float, float, float]] = []
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def add_path(self, path: svgelements.Path, process_type: str) -> int:
+        """Flattens a path and appends it. Returns the entity index."""
+        vertices, flags, lengths = flatten_path(path, self.tolerance / self.scale)
+        if process_type == 'raster':
+            # Raster time scales with the area, so use the exact curve extents from svgelements
+            bbox = path.bbox() if path else None
+        elif len(vertices):
+            bbox = (*vertices.min(axis=0), *vertices.max(axis=0))
+        else:
+            bbox = None
+        return self.add_arrays(vertices, flags, lengths, process_type, bbox or (0.0, 0.0, 0.0, 0.0))
+
+    def add_from_store(self, store: GeometryStore, index: int) -> int:
+        """Copies one entity out of another store."""
+        span = store.entity_slice(index)
+        return self.add_arrays(
+            store.vertices[span],
+            store.vertex_flags[span],
+            store.segment_lengths[span],
+            PROCESS_NAMES[store.process_codes[index]],
+            tuple(store.bboxes[index])
+        )
+
+    def add_arrays(self,
+                   vertices: np.ndarray,
+                   flags: np.ndarray,
+                   lengths: np.ndarray,
+                   process_type: str,
+                   bbox: Tuple[float, float, float, float]) -> int:
+        self._vertices.append(vertices)
+        self._flags.append(flags)
+        self._lengths.append(lengths)
+        self._counts.append(len(vertices))
+        self._codes.append(PROCESS_CODES[process_type])
+        self._bboxes.append(bbox)
+        return len(self._codes) - 1
+
+    def build(self) -> GeometryStore:
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        if self._vertices:
+            vertices = np.concatenate(self._vertices).reshape(-1, 2)
+            flags = np.concatenate(self._flags).astype(np.uint8)
+            lengths = np.concatenate(self._lengths).astype(np.float64)
+        else:
+            vertices = np.zeros((0, 2), dtype=np.float64)
+            flags = np.zeros(0, dtype=np.uint8)
+            lengths = np.zeros(0, dtype=np.float64)
+        bboxes = np.asarray(self._bboxes, dtype=np.float64).reshape(-1, 4)
+        if self.scale != 1.0:
+            # A uniform scale maps chords, lengths and extents alike, so it is applied once here
+            vertices = vertices * self.scale
+            lengths *= self.scale
+            bboxes *= self.scale
+
+        return GeometryStore(
+            vertices=vertices,
+            vertex_flags=flags,
+            segment_lengths=lengths,
+            entity_offsets=offsets,
+            process_codes=np.asarray(self._codes, dtype=np.uint8),
+            bboxes=bboxes
+        )
@@ -0,0 +1,537 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from src.engine.geometry import (
+    GeometryStore, PROCESS_CODES, VERTEX_MOVE, VERTEX_JUNCTION
+)
+from src.engine.options import JUNCTION_MODELS, RASTER_MODELS
+from src.engine.raster import MergedRasterPlan, raster_bands, scan_lines
+from src.engine.timeline import MOVE, Timeline
+
+RASTER = PROCESS_CODES['raster']
+# Scan gaps whose scanline figures a job keeps; a cached plan re-costed from a scan-gap slider
+# would otherwise keep one set per value it was ever evaluated with
+RASTER_PLAN_SLOTS = 4
+
+# Kinds of timeline rows, in the order they are taken at the same job row
+EVENT_MOVE, EVENT_DWELL, EVENT_BURN, EVENT_RASTER = range(4)
+
+
+@dataclass
+class FlatJob:
+    """An ordered job flattened into parallel NumPy arrays, one row per operation."""
+    burn_lengths: np.ndarray      # Length of every burned polyline piece
+    burn_process: np.ndarray      # Process code of every burned piece
+    junction_process: np.ndarray  # Process code of every original segment end (one junction delay each)
+    move_distances: np.ndarray    # Distance of every transit move, including moves to raster blocks
+    dwell_process: np.ndarray     # Process code of every cut/mark entity (one burn dwell each)
+    raster_widths: np.ndarray     # Bounding box width of every raster block
+    raster_heights: np.ndarray    # Bounding box height of every raster block
+    raster_entities: np.ndarray   # Store index of every raster block, scanned per `scan_gap` when costed
+    store: GeometryStore
+    raster_bands: Optional[np.ndarray] = None  # Band of every raster block when blocks are merged into shared sweeps
+    # Burned pieces of non-zero length, in job order, for the look-ahead velocity planner
+    piece_lengths: Optional[np.ndarray] = None
+    piece_process: Optional[np.ndarray] = None
+    piece_directions: Optional[np.ndarray] = None   # Unit (dx, dy) of every piece's chord
+    piece_starts_run: Optional[np.ndarray] = None   # The head is at rest before this piece
+    # Timeline rows in job order, only kept by `flatten_job(..., timeline=True)` (see `KinematicsEngine.timeline`)
+    event_kind: Optional[np.ndarray] = None       # EVENT_* code
+    event_process: Optional[np.ndarray] = None    # Process code, MOVE for transit moves
+    event_positions: Optional[np.ndarray] = None  # Head position when the row starts
+    event_entity: Optional[np.ndarray] = None     # Position of the entity in the job order
+    event_lengths: Optional[np.ndarray] = None    # Distance of moves, burned length of pieces
+    event_junction: Optional[np.ndarray] = None   # The piece ends an original segment
+    event_ref: Optional[np.ndarray] = None        # Index of a piece in `piece_lengths` or of a raster block
+    # Speed-independent aggregates, computed on first use and reused by every evaluation
+    _cache: Dict[Any, Any] = field(default_factory=dict, repr=False, compare=False)
+    _raster_plans: 'OrderedDict[float, MergedRasterPlan]' = field(default_factory=OrderedDict, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def layer_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns: (burned distance, junction count, dwell count) of the cut and mark layers."""
+        if 'layers' not in self._cache:
+            self._cache['layers'] = (
+                np.bincount(self.burn_process, weights=self.burn_lengths, minlength=2)[:2],
+                np.bincount(self.junction_process, minlength=2)[:2],
+                np.bincount(self.dwell_process, minlength=2)[:2]
+            )
+        return self._cache['layers']
+
+    def move_sums(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns: (sorted move distances, prefix sums of the distances, prefix sums of their square roots),
+        which cost all transit moves for a speed and acceleration with one binary search.
+        """
+        if 'moves' not in self._cache:
+            distances = np.sort(self.move_distances)
+            self._cache['moves'] = (
+                distances,
+                np.r_[0.0, np.cumsum(distances)],
+                np.r_[0.0, np.cumsum(np.sqrt(distances))]
+            )
+        return self._cache['moves']
+
+    def raster_plan(self, scan_gap: float) -> MergedRasterPlan:
+        """
+        Scanline figures of the raster blocks for one scan gap, shared by every profile using it.
+        Only the RASTER_PLAN_SLOTS most recently used scan gaps are kept.
+        """
+        key = float(scan_gap)
+        with self._lock:
+            plan = self._raster_plans.get(key)
+            if plan is not None:
+                self._raster_plans.move_to_end(key)
+                return plan
+        lines = scan_lines(self.store, self.raster_entities, scan_gap, self.raster_bands)
+        band_count = int(self.raster_bands.max(initial=-1)) + 1 if self.raster_bands is not None else 0
+        plan = MergedRasterPlan(lines, band_count, len(self.raster_entities))
+        with self._lock:
+            self._raster_plans[key] = plan
+            while len(self._raster_plans) > RASTER_PLAN_SLOTS:
+                self._raster_plans.popitem(last=False)
+        return plan
+
+
+def flatten_job(store: GeometryStore, order: np.ndarray, merge_raster: bool = False, timeline: bool = False) -> FlatJob:
+    """
+    Gathers the vertices of the ordered entities into one job-wide sequence of head positions.
+    Cut/mark entities contribute their polylines; raster entities contribute their
+    bounding box corners, entering at (min_x, min_y) and leaving at (max_x, max_y).
+    With `merge_raster` raster blocks whose y-ranges overlap form one band, engraved in a single
+    pass when its first block comes up; the band's later blocks cost no transit.
+    With `timeline` the job also keeps its timeline rows, taken from the same arrays.
+    """
+    order = np.asarray(order, dtype=np.int64)
+    codes = store.process_codes[order].astype(np.int64)
+    is_raster = codes == RASTER
+
+    bboxes = store.bboxes[order]
+    widths = bboxes[:, 2] - bboxes[:, 0]
+    heights = bboxes[:, 3] - bboxes[:, 1]
+    # Degenerate raster areas are skipped entirely
+    active_raster = is_raster & (widths > 0) & (heights > 0)
+
+    first = store.entity_offsets[order]
+    counts = store.entity_offsets[order + 1] - first
+    counts = np.where(is_raster, np.where(active_raster, 2, 0), counts)
+
+    bands = None
+    if merge_raster:
+        raster_positions = np.flatnonzero(active_raster)
+        bands = raster_bands(bboxes[raster_positions])
+        band_boxes = np.empty((len(np.unique(bands)), 4))
+        band_boxes[:, :2], band_boxes[:, 2:] = np.inf, -np.inf
+        np.minimum.at(band_boxes[:, :2], bands, bboxes[raster_positions, :2])
+        np.maximum.at(band_boxes[:, 2:], bands, bboxes[raster_positions, 2:])
+
+        # The first block of a band stands for the whole band
+        _, leaders = np.unique(bands, return_index=True)
+        counts[raster_positions] = 0
+        counts[raster_positions[leaders]] = 2
+        bboxes = bboxes.copy()
+        bboxes[raster_positions[leaders]] = band_boxes
+
+    total = int(counts.sum())
+    row_entity = np.repeat(np.arange(len(order)), counts)
+    row_local = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    row_raster = is_raster[row_entity]
+    row_vector = ~row_raster
+
+    positions = np.empty((total, 2), dtype=np.float64)
+    flags = np.zeros(total, dtype=np.uint8)
+    lengths = np.zeros(total, dtype=np.float64)
+
+    vertex_ids = first[row_entity[row_vector]] + row_local[row_vector]
+    positions[row_vector] = store.vertices[vertex_ids]
+    flags[row_vector] = store.vertex_flags[vertex_ids]
+    lengths[row_vector] = store.segment_lengths[vertex_ids]
+
+    raster_rows = np.flatnonzero(row_raster)
+    raster_boxes = bboxes[row_entity[raster_rows]]
+    corner = row_local[raster_rows]
+    positions[raster_rows, 0] = np.where(corner == 0, raster_boxes[:, 0], raster_boxes[:, 2])
+    positions[raster_rows, 1] = np.where(corner == 0, raster_boxes[:, 1], raster_boxes[:, 3])
+    flags[raster_rows[corner == 0]] = VERTEX_MOVE
+
+    # Every move starts where the previous row left the head, the job starts at (0, 0)
+    previous = np.vstack([np.zeros((1, 2)), positions[:-1]])
+    is_move = (flags & VERTEX_MOVE) != 0
+    step = positions[is_move] - previous[is_move]
+    move_distances = np.hypot(step[:, 0], step[:, 1])
+
+    row_codes = codes[row_entity]
+    is_junction = row_vector & ((flags & VERTEX_JUNCTION) != 0)
+
+    # A continuous burn runs from a Move (or the first vertex of an entity) to the next one
+    run_start = row_vector & (is_move | (row_local == 0))
+    run_id = np.cumsum(run_start)
+    piece_rows = np.flatnonzero(row_vector & ~run_start & (lengths > 0))
+    chords = positions[piece_rows] - positions[piece_rows - 1]
+    chord_lengths = np.hypot(chords[:, 0], chords[:, 1])
+    piece_directions = chords / np.where(chord_lengths > 0, chord_lengths, 1.0)[:, None]
+    piece_runs = run_id[piece_rows]
+
+    events = {}
+    if timeline:
+        events = _timeline_events(codes, counts, active_raster, row_entity, row_local, row_vector, positions,
+                                  lengths, is_move, is_junction, move_distances, piece_rows)
+    return FlatJob(
+        burn_lengths=lengths[row_vector],
+        burn_process=row_codes[row_vector],
+        junction_process=row_codes[is_junction],
+        move_distances=move_distances,
+        dwell_process=codes[~is_raster],
+        raster_widths=widths[active_raster],
+        raster_heights=heights[active_raster],
+        raster_entities=order[active_raster],
+        store=store,
+        raster_bands=bands,
+        piece_lengths=lengths[piece_rows],
+        piece_process=row_codes[piece_rows],
+        piece_directions=piece_directions,
+        piece_starts_run=np.r_[True, piece_runs[1:] != piece_runs[:-1]][:len(piece_rows)],
+        **events
+    )
+
+
+def _timeline_events(codes, counts, active_raster, row_entity, row_local, row_vector, positions,
+                     lengths, is_move, is_junction, move_distances, piece_rows) -> Dict[str, np.ndarray]:
+    """
+    The `event_*` arrays of `flatten_job`: a move for every Move row, a dwell where every cut/mark
+    entity starts, a burn for every vector row that takes time and a raster row per scanned block.
+    """
+    total = len(positions)
+    first_row = np.cumsum(counts) - counts
+    vector_entities = np.flatnonzero(codes != RASTER)
+    piece_index = np.full(total, -1, dtype=np.int64)
+    piece_index[piece_rows] = np.arange(len(piece_rows))
+    raster_index = np.cumsum(active_raster) - 1
+
+    move_rows = np.flatnonzero(is_move)
+    burn_rows = np.flatnonzero(row_vector & ((lengths > 0) | is_junction))
+    raster_rows = np.flatnonzero(~row_vector & (row_local == 1))
+    dwell_rows = first_row[vector_entities]
+    parts = (move_rows, dwell_rows, burn_rows, raster_rows)
+
+    # Where the head is before every row (and after the last one); a dwell happens at its first vertex
+    head = np.vstack([np.zeros((1, 2)), positions])
+    dwell_at = dwell_rows + (counts[vector_entities] > 0)
+    kind = np.concatenate([np.full(len(rows), code, dtype=np.uint8) for code, rows in enumerate(parts)])
+    anchor = np.concatenate(parts)
+    entity = np.concatenate([row_entity[move_rows], vector_entities, row_entity[burn_rows], row_entity[raster_rows]])
+    sequence = np.lexsort((kind, entity, anchor))
+    return {
+        'event_kind': kind[sequence],
+        'event_process': np.concatenate([
+            np.full(len(move_rows), MOVE), codes[vector_entities], codes[row_entity[burn_rows]],
+            np.full(len(raster_rows), RASTER)
+        ]).astype(np.uint8)[sequence],
+        'event_positions': head[np.concatenate([move_rows, dwell_at, burn_rows, raster_rows])][sequence],
+        'event_entity': entity[sequence],
+        'event_lengths': np.concatenate([
+            move_distances, np.zeros(len(dwell_rows)), lengths[burn_rows], np.zeros(len(raster_rows))
+        ])[sequence],
+        'event_junction': np.concatenate([
+            np.zeros(len(move_rows) + len(dwell_rows), dtype=bool), is_junction[burn_rows],
+            np.zeros(len(raster_rows), dtype=bool)
+        ])[sequence],
+        'event_ref': np.concatenate([
+            np.full(len(move_rows) + len(dwell_rows), -1, dtype=np.int64), piece_index[burn_rows],
+            raster_index[row_entity[raster_rows]]
+        ])[sequence],
+    }
+
+
+class KinematicsEngine:
+    """Batched motion-time calculations over flattened jobs."""
+
+    # Machine parameters a profile must provide, in `LaserTimeCalculator` naming
+    PROFILE_FIELDS = (
+        'cut_speed', 'vector_engrave_speed', 'raster_engrave_speed', 'transit_speed',
+        'acceleration', 'junction_delay', 'burn_dwell', 'scan_gap', 'overscan_factor',
+        'junction_deviation'
+    )
+
+    @staticmethod
+    def trapezoidal_times(distances: np.ndarray, target_speed, acceleration) -> np.ndarray:
+        """
+        Vectorized counterpart of `LaserTimeCalculator._calculate_travel_time`.
+        Moves long enough to reach `target_speed` follow a trapezoidal profile, shorter ones a triangular one.
+        Speeds and accelerations may be (P, 1) arrays to cost the moves for P profiles at once.
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        target_speed = np.asarray(target_speed, dtype=np.float64)
+        acceleration = np.asarray(acceleration, dtype=np.float64)
+        accel_dist = (target_speed ** 2) / (2 * acceleration)
+
+        trapezoidal = (2 * target_speed / acceleration) + (distances - 2 * accel_dist) / target_speed
+        triangular = 2 * np.sqrt(np.maximum(distances, 0.0) * acceleration) / acceleration
+
+        times = np.where(distances >= 2 * accel_dist, trapezoidal, triangular)
+        return np.where(distances > 0, times, 0.0)
+
+    @staticmethod
+    def transit_times(job: FlatJob, target_speed: np.ndarray, acceleration: np.ndarray) -> np.ndarray:
+        """
+        Total time of all transit moves for P profiles, equal to summing `trapezoidal_times`.
+        Long moves take d / v + v / a and short ones 2 * sqrt(d / a), so the totals follow from the
+        prefix sums of `FlatJob.move_sums` split where the move just reaches the target speed.
+        """
+        distances, distance_sums, root_sums = job.move_sums()
+        target_speed = np.asarray(target_speed, dtype=np.float64)
+        acceleration = np.asarray(acceleration, dtype=np.float64)
+        split = np.searchsorted(distances, target_speed ** 2 / acceleration, side='left')
+        long_moves = len(distances) - split
+        long_time = (distance_sums[-1] - distance_sums[split]) / target_speed + long_moves * target_speed / acceleration
+        short_time = 2 * root_sums[split] / np.sqrt(acceleration)
+        return long_time + short_time
+
+    @staticmethod
+    def junction_limits(directions: np.ndarray,
+                        starts_run: np.ndarray,
+                        acceleration: np.ndarray,
+                        deviation: np.ndarray) -> np.ndarray:
+        """
+        Squared speed allowed when entering every piece, as (P, N) for (P, 1) parameters.
+        Uses the junction deviation model of Grbl-style firmware: v^2 = a * d * sin(t/2) / (1 - sin(t/2)),
+        with t the angle between the reversed incoming and the outgoing direction.
+        A run starts at rest; straight continuations are unlimited.
+        """
+        cos_theta = -(directions[1:] * directions[:-1]).sum(axis=1)
+        sin_half = np.sqrt(np.clip(0.5 * (1.0 - cos_theta), 0.0, 1.0))
+        with np.errstate(divide='ignore'):
+            limit = np.where(sin_half < 1.0, sin_half / (1.0 - sin_half), np.inf)
+
+        limits = np.empty((len(acceleration), len(directions)))
+        limits[:, 0] = 0.0
+        limits[:, 1:] = acceleration * deviation * limit
+        limits[:, starts_run] = 0.0
+        return limits
+
+    @staticmethod
+    def planned_piece_times(job: FlatJob,
+                            speeds: np.ndarray,
+                            acceleration: np.ndarray,
+                            deviation: np.ndarray) -> np.ndarray:
+        """
+        Look-ahead velocity planning over every burned piece, vectorized across pieces and profiles.
+        `speeds` is (P, N) nominal speed per piece, `acceleration` and `deviation` (P, 1).
+
+        The forward and backward acceleration passes of a firmware planner are prefix minima over
+        the cumulative 2 * a * length: entry^2 <= min_k(limit_k + 2a * distance from k). Runs reset
+        on their own because they start and end at rest. Each piece then gets its exact
+        trapezoidal (or triangular) time between the planned entry and exit speeds.
+        """
+        lengths = job.piece_lengths
+        if len(lengths) == 0:
+            return np.zeros((len(speeds), 0))
+
+        entry_limit = np.minimum(KinematicsEngine.junction_limits(
+            job.piece_directions, job.piece_starts_run, acceleration, deviation
+        ), speeds ** 2)
+        # A piece must stop at its end when the next one starts a new run (or the job ends)
+        exit_limit = np.zeros_like(entry_limit)
+        exit_limit[:, :-1] = entry_limit[:, 1:]
+
+        gain = 2 * acceleration * lengths
+        before = np.cumsum(gain, axis=1) - gain            # sum of 2aL over earlier pieces
+        after = gain.sum(axis=1, keepdims=True) - before - gain  # sum over later pieces
+
+        forward = before + np.minimum.accumulate(entry_limit - before, axis=1)
+        backward = after + np.minimum.accumulate((exit_limit - after)[:, ::-1], axis=1)[:, ::-1]
+
+        # Clamped because the prefix sums of long jobs leave rounding noise around zero
+        entry = forward.copy()
+        entry[:, 1:] = np.minimum(entry[:, 1:], backward[:, :-1])
+        entry = np.maximum(entry, 0.0)
+        exit_ = np.maximum(np.minimum(forward + gain, backward), 0.0)
+
+        peak_sq = np.minimum(speeds ** 2, acceleration * lengths + (entry + exit_) / 2)
+        peak = np.sqrt(peak_sq)
+        v_entry, v_exit = np.sqrt(entry), np.sqrt(exit_)
+        ramp_distance = (2 * peak_sq - entry - exit_) / (2 * acceleration)
+        cruise = np.maximum(lengths - ramp_distance, 0.0)
+        return (2 * peak - v_entry - v_exit) / acceleration + cruise / peak
+
+    @staticmethod
+    def raster_times(job: FlatJob,
+                     profiles: List[Dict[str, Any]],
+                     params: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Raster time of every profile.
+        'bbox': (width / speed) * (height / scan_gap) plus `overscan_factor`.
+        'scanline': every non-empty line is swept over its filled extent, plus an overscan of
+        speed^2 / (2 * acceleration) on each side to ramp up to and down from the engrave speed.
+        For merged jobs the scanline figures also hold the per-entity time, the sweep and band counts.
+        """
+        speed = params['raster_engrave_speed']
+        raster_area = float((job.raster_widths * job.raster_heights).sum())
+        times = raster_area / (speed * params['scan_gap']) * (1 + params['overscan_factor'])
+        figures = {'time': times}
+        if job.raster_bands is not None:
+            figures['per_entity_time'] = times.copy()
+            figures['sweeps'] = np.zeros(len(profiles), dtype=np.int64)
+
+        # Profiles sharing a scan gap share the rasterization
+        scanline_gaps = {}
+        for p, profile in enumerate(profiles):
+            model = profile.get('raster_model', 'scanline')
+            if model not in RASTER_MODELS:
+                raise ValueError(f"Unknown raster model: {model}")
+            if model == 'scanline':
+                scanline_gaps.setdefault(float(profile['scan_gap']), []).append(p)
+
+        for gap, members in scanline_gaps.items():
+            members = np.asarray(members)
+            sweep = job.raster_plan(gap).sweep_figures(speed[members], params['acceleration'][members],
+                                                      params['transit_speed'][members])
+            if job.raster_bands is not None:
+                times[members] = sweep['merged_time']
+                figures['per_entity_time'][members] = sweep['per_entity_time']
+                figures['sweeps'][members] = sweep['sweeps']
+            else:
+                times[members] = sweep['per_entity_time']
+        return figures
+
+    @staticmethod
+    def raster_block_times(job: FlatJob, profile: Dict[str, Any], total: float) -> np.ndarray:
+        """
+        Time of every raster block for one profile, scaled to add up to its evaluated raster `total`.
+        In merged jobs the first block of a band carries the whole band, as it does in the transit.
+        """
+        speed = profile['raster_engrave_speed']
+        if profile.get('raster_model', 'scanline') == 'bbox':
+            times = (job.raster_widths * job.raster_heights / (speed * profile['scan_gap'])
+                     * (1 + profile['overscan_factor']))
+        else:
+            plan = job.raster_plan(profile['scan_gap'])
+            times = plan.entity_extents / speed + plan.entity_spans * 2 * speed / profile['acceleration']
+        if job.raster_bands is not None and len(times):
+            band_times = np.bincount(job.raster_bands, weights=times)
+            _, leaders = np.unique(job.raster_bands, return_index=True)
+            times = np.zeros(len(times))
+            times[leaders] = band_times[job.raster_bands[leaders]]
+        weight = times.sum()
+        return times * (total / weight) if weight > 0 else times
+
+    @staticmethod
+    def timeline(job: FlatJob,
+                 profile: Dict[str, Any],
+                 piece_times: Optional[np.ndarray],
+                 raster_time: float) -> Timeline:
+        """
+        Times the job's timeline rows for one profile from the figures of its evaluation:
+        `piece_times` of the look-ahead planner (None for the constant junction model) and the
+        raster total. The durations add up to the evaluated total time.
+        """
+        if job.event_kind is None:
+            raise ValueError("The job was flattened without timeline rows")
+        kind = job.event_kind
+        duration = np.zeros(len(kind))
+        moves = kind == EVENT_MOVE
+        duration[moves] = KinematicsEngine.trapezoidal_times(
+            job.event_lengths[moves], profile['transit_speed'], profile['acceleration']
+        )
+        duration[kind == EVENT_DWELL] = profile['burn_dwell']
+
+        burns = np.flatnonzero(kind == EVENT_BURN)
+        if piece_times is not None:
+            pieces = job.event_ref[burns]
+            duration[burns[pieces >= 0]] = piece_times[pieces[pieces >= 0]]
+        else:
+            speeds = np.array([profile['cut_speed'], profile['vector_engrave_speed']], dtype=np.float64)
+            duration[burns] = (job.event_lengths[burns] / speeds[job.event_process[burns]]
+                               + profile['junction_delay'] * job.event_junction[burns])
+
+        rasters = np.flatnonzero(kind == EVENT_RASTER)
+        if len(rasters):
+            block_times = KinematicsEngine.raster_block_times(job, profile, raster_time)
+            duration[rasters] = block_times[job.event_ref[rasters]]
+        return Timeline.from_durations(duration, job.event_positions, job.event_process, job.event_entity)
+
+    @staticmethod
+    def evaluate(job: FlatJob, **profile: float) -> Dict[str, Any]:
+        """Computes per-layer times and distances for a flattened job and one parameter set."""
+        return KinematicsEngine.evaluate_profiles(job, [profile])[0]
+
+    @staticmethod
+    def evaluate_profiles(job: FlatJob, profiles: List[Dict[str, Any]], timeline: bool = False) -> List[Dict[str, Any]]:
+        """
+        Costs one flattened job for several parameter sets at once.
+        Every speed-dependent quantity is computed as a (P, ...) array over the profiles.
+        Besides PROFILE_FIELDS a profile may name its `raster_model` (default 'scanline')
+        and `junction_model` (default 'lookahead').
+        With `timeline` every result also holds its `Timeline`, timed from the same figures
+        (the job must be flattened with `timeline=True`).
+        """
+        params = {
+            name: np.array([profile[name] for profile in profiles], dtype=np.float64)
+            for name in KinematicsEngine.PROFILE_FIELDS
+        }
+
+        # Burned segments run at constant speed, so only the per-layer lengths matter
+        vector_distance, junctions, dwells = job.layer_totals()
+        vector_speeds = np.column_stack([params['cut_speed'], params['vector_engrave_speed']])
+        vector_time = (vector_distance / vector_speeds
+                       + junctions * params['junction_delay'][:, None]
+                       + dwells * params['burn_dwell'][:, None])
+
+        models = [profile.get('junction_model', 'lookahead') for profile in profiles]
+        unknown = set(models) - set(JUNCTION_MODELS)
+        if unknown:
+            raise ValueError(f"Unknown junction model: {unknown.pop()}")
+        lookahead = np.flatnonzero(np.array(models) == 'lookahead')
+        piece_times = None
+        if len(lookahead):
+            piece_times = KinematicsEngine.planned_piece_times(
+                job,
+                vector_speeds[lookahead][:, job.piece_process],
+                params['acceleration'][lookahead, None],
+                params['junction_deviation'][lookahead, None]
+            )
+            layer_times = np.stack([
+                piece_times[:, job.piece_process == code].sum(axis=1) for code in (0, 1)
+            ], axis=1)
+            vector_time[lookahead] = layer_times + dwells * params['burn_dwell'][lookahead, None]
+
+        # Transit moves
+        transit_time = KinematicsEngine.transit_times(job, params['transit_speed'], params['acceleration'])
+
+        # Raster blocks
+        raster_area = float((job.raster_widths * job.raster_heights).sum())
+        raster = KinematicsEngine.raster_times(job, profiles, params)
+        raster_time = raster['time']
+        raster_bands = int(job.raster_bands.max(initial=-1)) + 1 if job.raster_bands is not None else None
+
+        total_time = vector_time.sum(axis=1) + transit_time + raster_time
+        distance_burned = float(job.burn_lengths.sum())
+        distance_transit = float(job.move_distances.sum())
+
+        results = []
+        for p in range(len(profiles)):
+            raster_breakdown = {'time': float(raster_time[p]), 'area': raster_area}
+            if raster_bands is not None:
+                raster_breakdown.update(
+                    per_entity_time=float(raster['per_entity_time'][p]),
+                    bands=raster_bands,
+                    sweeps=int(raster['sweeps'][p])
+                )
+            result = {
+                'total_time': float(total_time[p]),
+                'transit_time': float(transit_time[p]),
+                'distance_burned': distance_burned,
+                'distance_transit': distance_transit,
+                'layer_breakdown': {
+                    'cut': {'time': float(vector_time[p, 0]), 'distance': float(vector_distance[0])},
+                    'mark': {'time': float(vector_time[p, 1]), 'distance': float(vector_distance[1])},
+                    'raster': raster_breakdown
+                }
+            }
+            if timeline:
+                planned = piece_times[np.searchsorted(lookahead, p)] if p in lookahead else None
+                result['timeline'] = KinematicsEngine.timeline(job, profiles[p], planned, float(raster_time[p]))
+            results.append(result)
+        return results
@@ -0,0 +1,188 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+from src.parsers.svg_parser import LaserEntity
+from src.engine.containment import build_containment
+from src.engine.geometry import GeometryStore
+from src.utils.progress import PROGRESS_INTERVAL, ProgressCallback
+
+
+def entity_endpoints(entities: Sequence[LaserEntity]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collects the start and end points of every entity into (N, 2) arrays.
+    Returns: (starts, ends, valid) where `valid` flags entities that have geometry.
+    """
+    store, indices = GeometryStore.for_entities(entities)
+    return store.endpoints(indices)
+
+
+def nearest_neighbour_reference(starts: np.ndarray,
+                                ends: np.ndarray,
+                                valid: np.ndarray,
+                                origin: Tuple[float, float] = (0.0, 0.0),
+                                parents: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Plain nearest-neighbour loop, O(N^2). Kept as the reference ordering that
+    `TransitOptimizer` must reproduce, and as the baseline for benchmarks.
+    With `parents`, an entity is only visited once every entity whose parent it is was visited.
+    """
+    # Entities without geometry cost nothing to reach, so they are consumed first
+    order = [i for i in range(len(valid)) if not valid[i]]
+    unvisited = [i for i in range(len(valid)) if valid[i]]
+    pending = [0] * len(valid)
+    if parents is not None:
+        for parent in parents:
+            if parent >= 0:
+                pending[parent] += 1
+    current_x, current_y = origin
+
+    while unvisited:
+        nearest = None
+        min_dist = float('inf')
+
+        for i in unvisited:
+            if pending[i]:
+                continue
+            dist = math.sqrt((starts[i, 0] - current_x) ** 2 + (starts[i, 1] - current_y) ** 2)
+            if dist < min_dist:
+                min_dist = dist
+                nearest = i
+
+        unvisited.remove(nearest)
+        order.append(nearest)
+        if parents is not None and parents[nearest] >= 0:
+            pending[parents[nearest]] -= 1
+        current_x, current_y = ends[nearest]
+
+    return order
+
+
+class TransitOptimizer:
+    """
+    Nearest-neighbour transit ordering backed by a KD-tree over entity start points.
+
+    scipy's KD-tree is static, so visited entities are masked out and the tree is
+    rebuilt over the remaining points once half of its points have been consumed.
+    Each step therefore costs O(log N) amortised, O(N log N) for the whole tour.
+
+    Precedence constraints (`parents`, see `build_containment`) hold a contour back until
+    every entity inside it was visited; held entities are masked out like visited ones.
+    """
+
+    # Relative slack used to collect every candidate that may tie with the nearest one
+    TIE_TOLERANCE = 1e-9
+
+    def __init__(self, initial_k: int = 8, min_rebuild_size: int = 64):
+        self.initial_k = initial_k
+        self.min_rebuild_size = min_rebuild_size
+
+    def order(self,
+              starts: np.ndarray,
+              ends: np.ndarray,
+              valid: np.ndarray,
+              origin: Tuple[float, float] = (0.0, 0.0),
+              progress: ProgressCallback = None,
+              parents: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the visiting order as an array of entity indices.
+        Ties are broken by the lowest index, matching `nearest_neighbour_reference`.
+        """
+        count = len(valid)
+        order = np.empty(count, dtype=np.int64)
+        invalid_ids = np.flatnonzero(~valid)
+        order[:len(invalid_ids)] = invalid_ids
+        position = len(invalid_ids)
+
+        visited = ~valid.copy()
+        # Entities still waiting for the ones inside them count as unavailable
+        pending = np.zeros(count, dtype=np.int64)
+        if parents is not None:
+            np.add.at(pending, parents[parents >= 0], 1)
+        remaining = count - position
+        if remaining == 0:
+            return order
+
+        tree_ids = np.flatnonzero(valid)
+        tree = cKDTree(starts[tree_ids])
+        consumed_in_tree = 0
+        current = np.asarray(origin, dtype=np.float64)
+
+        while remaining:
+            if consumed_in_tree * 2 >= len(tree_ids) and remaining >= self.min_rebuild_size:
+                tree_ids = np.flatnonzero(~visited)
+                tree = cKDTree(starts[tree_ids])
+                consumed_in_tree = 0
+
+            nearest = self._query_nearest(tree, tree_ids, visited, pending, starts, current)
+            visited[nearest] = True
+            if parents is not None and parents[nearest] >= 0:
+                pending[parents[nearest]] -= 1
+            order[position] = nearest
+            position += 1
+            remaining -= 1
+            consumed_in_tree += 1
+            current = ends[nearest]
+            if progress and position % PROGRESS_INTERVAL == 0:
+                progress('entities_ordered', position)
+
+        if progress:
+            progress('entities_ordered', count)
+        return order
+
+    def _query_nearest(self,
+                       tree: cKDTree,
+                       tree_ids: np.ndarray,
+                       visited: np.ndarray,
+                       pending: np.ndarray,
+                       starts: np.ndarray,
+                       current: np.ndarray) -> int:
+        """Finds the closest available start point, widening the query until it is found."""
+        size = len(tree_ids)
+        k = min(self.initial_k, size)
+
+        while True:
+            kd_dists, positions = tree.query(current, k=k)
+            kd_dists = np.atleast_1d(kd_dists)
+            positions = np.atleast_1d(positions)
+            found = positions < size
+            candidates = tree_ids[positions[found]]
+            unvisited = ~visited[candidates] & (pending[candidates] == 0)
+
+            if unvisited.any():
+                candidates = candidates[unvisited]
+                # Recompute with the same formula as the reference loop so ties resolve identically
+                delta = starts[candidates] - current
+                exact = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+                best = exact.min()
+                radius = best * (1.0 + self.TIE_TOLERANCE) + 1e-12
+
+                # Every point inside the tie radius was returned, so the answer is final
+                if k >= size or kd_dists[-1] > radius:
+                    return int(candidates[exact == best].min())
+
+            if k >= size:
+                raise RuntimeError("TransitOptimizer ran out of unvisited entities")
+            k = min(k * 2, size)
+
+
+def transit_order(store: GeometryStore,
+                  indices: np.ndarray,
+                  progress: ProgressCallback = None,
+                  parents: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Returns positions into `indices` in nearest-neighbour visiting order, cutting inner contours
+    before the ones around them. `parents` reuses a hierarchy from `build_containment`.
+    """
+    starts, ends, valid = store.endpoints(indices)
+    if parents is None:
+        parents = build_containment(store, indices).parents
+    return TransitOptimizer().order(starts, ends, valid, progress=progress, parents=parents)
+
+
+def order_entities(entities: Sequence[LaserEntity], progress: ProgressCallback = None) -> List[LaserEntity]:
+    """Sorts entities for minimal transit. Speed independent, so results can be reused."""
+    if not entities:
+        return []
+    store, indices = GeometryStore.for_entities(entities)
+    return [entities[i] for i in transit_order(store, indices, progress)]
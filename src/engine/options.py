@@ -0,0 +1,22 @@
+"""
+Option values shared by the engine and the command line. Kept free of NumPy and svgelements,
+so the CLI can build its argument parser without importing the engine.
+"""
+
+# Maximum distance, in mm, between a curve and the chords that replace it
+DEFAULT_TOLERANCE = 0.01
+
+# 'scanline' costs the filled extent of every scanline, 'bbox' every line as a full-width pass
+RASTER_MODELS = ('scanline', 'bbox')
+# Share of a 'bbox' raster time added for the acceleration at both ends of each pass; the
+# 'scanline' model charges those ramps from the speed and acceleration instead
+DEFAULT_OVERSCAN_FACTOR = 0.1
+# 'lookahead' plans the speed through every vertex, 'constant' adds `junction_delay` per segment end
+JUNCTION_MODELS = ('lookahead', 'constant')
+
+
+def check_tolerance(tolerance: float) -> float:
+    """Returns `tolerance` if it can flatten curves: zero would need infinitely many chords."""
+    if not tolerance > 0:
+        raise ValueError(f"tolerance must be greater than 0, got {tolerance}")
+    return tolerance
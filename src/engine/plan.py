@@ -0,0 +1,77 @@
+import json
+from dataclasses import dataclass, fields
+from typing import Any, BinaryIO, Dict, List, Union
+import numpy as np
+from src.engine.geometry import GeometryStore
+from src.engine.kinematics import FlatJob, KinematicsEngine
+
+# Bumped whenever the saved layout changes; older files are rejected rather than misread
+PLAN_FORMAT_VERSION = 1
+
+
+@dataclass
+class JobPlan:
+    """
+    Speed-independent part of an estimate: the ordered, flattened job and the ordering sections
+    of the report. Built once by `LaserTimeCalculator.plan_job`; `evaluate` then costs any set of
+    machine parameters without touching the geometry again.
+    """
+    job: FlatJob
+    order: np.ndarray          # Visiting order, as positions into the planned entities
+    merge_raster: bool
+    sections: Dict[str, Any]   # Report sections fixed by the ordering (containment, transit_refinement)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [getattr(self.job, f.name) for f in fields(FlatJob) if not f.name.startswith('_')]
+        return self.order.nbytes + sum(a.nbytes for a in arrays if isinstance(a, np.ndarray)) + self.job.store.nbytes
+
+    @property
+    def has_timeline(self) -> bool:
+        return self.job.event_kind is not None
+
+    def evaluate(self, profiles: List[Dict[str, Any]], timeline: bool = False) -> List[Dict[str, Any]]:
+        """
+        Costs the plan for several parameter sets (see `KinematicsEngine.evaluate_profiles`).
+        With `timeline` each result holds its `Timeline`, with entity indices into the planned entities.
+        """
+        results = KinematicsEngine.evaluate_profiles(self.job, profiles, timeline)
+        for result in results if timeline else ():
+            result['timeline'].entity = self.order[result['timeline'].entity]
+        return results
+
+    def save(self, file: Union[str, BinaryIO]) -> None:
+        """Writes the plan as an uncompressed .npz archive; no pickled objects are stored."""
+        arrays = {
+            'version': np.array(PLAN_FORMAT_VERSION),
+            'order': self.order,
+            'merge_raster': np.array(self.merge_raster),
+            'sections': np.array(json.dumps(self.sections)),
+        }
+        for f in fields(FlatJob):
+            value = getattr(self.job, f.name)
+            if isinstance(value, np.ndarray):
+                arrays[f'job.{f.name}'] = value
+        for name in GeometryStore.__slots__:
+            arrays[f'store.{name}'] = getattr(self.job.store, name)
+        np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> 'JobPlan':
+        with np.load(file, allow_pickle=False) as archive:
+            version = int(archive['version'])
+            if version != PLAN_FORMAT_VERSION:
+                raise ValueError(f"Unsupported job plan version {version}, expected {PLAN_FORMAT_VERSION}")
+            store = GeometryStore(**{name: archive[f'store.{name}'] for name in GeometryStore.__slots__})
+            job_arrays = {
+                f.name: archive[f'job.{f.name}'] for f in fields(FlatJob) if f'job.{f.name}' in archive.files
+            }
+            return cls(
+                job=FlatJob(store=store, **job_arrays),
+                order=archive['order'],
+                merge_raster=bool(archive['merge_raster']),
+                sections=json.loads(str(archive['sections']))
+            )
@@ -0,0 +1,206 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+import numpy as np
+from src.engine.geometry import GeometryStore, VERTEX_MOVE
+
+
+@dataclass
+class RasterLines:
+    """The filled spans of a set of raster entities, one row per (scanline, entity), ordered by line."""
+    entity: np.ndarray   # Position of the owning entity in the scanned `indices`
+    line: np.ndarray     # Scanline id, shared by every entity of a band
+    y: np.ndarray        # Height of the scanline
+    x_start: np.ndarray  # First filled x on the line
+    x_end: np.ndarray    # Last filled x on the line
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    @property
+    def extents(self) -> np.ndarray:
+        return self.x_end - self.x_start
+
+
+def polygon_edges(store: GeometryStore, indices: np.ndarray):
+    """
+    Returns the filled outline of the selected entities as edges.
+    Returns: (edge_entity, starts, ends) where `edge_entity` is the position of the owning entity in `indices`.
+    Every subpath is closed back to its first vertex, as the SVG fill rules do.
+    """
+    first = store.entity_offsets[indices]
+    counts = store.entity_offsets[indices + 1] - first
+    total = int(counts.sum())
+
+    vertex_entity = np.repeat(np.arange(len(indices)), counts)
+    entity_start = np.repeat(np.cumsum(counts) - counts, counts)
+    vertex_ids = first[vertex_entity] + np.arange(total) - entity_start
+    points = store.vertices[vertex_ids]
+
+    # A ring starts at every Move and at the first vertex of every entity
+    ring_start = (store.vertex_flags[vertex_ids] & VERTEX_MOVE) != 0
+    ring_start[np.arange(total) == entity_start] = True
+
+    # Each vertex connects to the next one of its ring; the last one wraps to the ring's first vertex
+    ring_first = np.maximum.accumulate(np.where(ring_start, np.arange(total), 0))
+    following = np.arange(1, total + 1)
+    ring_end = np.append(ring_start[1:], True)[:total]
+    following[ring_end] = ring_first[ring_end]
+    return vertex_entity, points, points[following]
+
+
+def raster_bands(bboxes: np.ndarray) -> np.ndarray:
+    """
+    Groups raster blocks whose y-ranges overlap or touch into bands that share their scanlines.
+    Returns the band id of every bbox; bands are numbered from the bottom up.
+    """
+    count = len(bboxes)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Interval index: sorted by min_y, a new band starts above the highest max_y seen so far
+    by_start = np.argsort(bboxes[:, 1], kind='stable')
+    low = bboxes[by_start, 1]
+    high = np.maximum.accumulate(bboxes[by_start, 3])
+    new_band = np.r_[True, low[1:] > high[:-1]]
+
+    bands = np.empty(count, dtype=np.int64)
+    bands[by_start] = np.cumsum(new_band) - 1
+    return bands
+
+
+def scan_lines(store: GeometryStore,
+               indices: np.ndarray,
+               scan_gap: float,
+               bands: Optional[np.ndarray] = None) -> RasterLines:
+    """
+    Intersects the selected raster entities with horizontal scanlines `scan_gap` apart.
+    Each band is scanned from its bottom at y = min_y + (k + 0.5) * scan_gap and every entity keeps
+    the span between its first and last crossing on each line. Lines that miss the fill are dropped.
+    Without `bands` every entity is scanned on its own. All edges and lines are processed as flat
+    arrays, without a per-line Python loop.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if bands is None:
+        bands = np.arange(len(indices))
+    edge_entity, starts, ends = polygon_edges(store, indices)
+
+    band_count = int(bands.max()) + 1 if len(bands) else 0
+    band_base = np.full(band_count, np.inf)
+    band_top = np.full(band_count, -np.inf)
+    np.minimum.at(band_base, bands, store.bboxes[indices, 1])
+    np.maximum.at(band_top, bands, store.bboxes[indices, 3])
+    line_counts = np.ceil((band_top - band_base) / scan_gap).astype(np.int64)
+    line_offsets = np.cumsum(line_counts) - line_counts
+
+    # Edges own the lines in [low_y, high_y), so a shared vertex is only counted once
+    edge_band = bands[edge_entity]
+    y0, y1 = starts[:, 1], ends[:, 1]
+    low_y = np.minimum(y0, y1) - band_base[edge_band]
+    high_y = np.maximum(y0, y1) - band_base[edge_band]
+    first_line = np.clip(np.ceil(low_y / scan_gap - 0.5), 0, None).astype(np.int64)
+    stop_line = np.minimum(np.ceil(high_y / scan_gap - 0.5).astype(np.int64), line_counts[edge_band])
+    crossings_per_edge = np.where(y0 != y1, np.maximum(stop_line - first_line, 0), 0)
+
+    total = int(crossings_per_edge.sum())
+    edge = np.repeat(np.arange(len(starts)), crossings_per_edge)
+    line = np.repeat(first_line, crossings_per_edge) + (
+        np.arange(total) - np.repeat(np.cumsum(crossings_per_edge) - crossings_per_edge, crossings_per_edge)
+    )
+    entity = edge_entity[edge]
+    band = bands[entity]
+    y = band_base[band] + (line + 0.5) * scan_gap
+
+    x0, x1 = starts[edge, 0], ends[edge, 0]
+    t = (y - y0[edge]) / (y1[edge] - y0[edge])
+    x = x0 + t * (x1 - x0)
+
+    line = line_offsets[band] + line
+    key = line * max(len(indices), 1) + entity
+    order = np.argsort(key, kind='stable')
+    key, x, entity, line, y = key[order], x[order], entity[order], line[order], y[order]
+    heads = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if total else np.zeros(0, dtype=np.int64)
+
+    return RasterLines(
+        entity=entity[heads],
+        line=line[heads],
+        y=y[heads],
+        x_start=np.minimum.reduceat(x, heads) if total else np.zeros(0),
+        x_end=np.maximum.reduceat(x, heads) if total else np.zeros(0),
+    )
+
+
+class MergedRasterPlan:
+    """
+    Raster entities grouped into bands that are swept together, line by line.
+
+    On every shared scanline the head sweeps from the leftmost to the rightmost span and
+    only stops between two spans when the gap is wider than the overscan both would need.
+    `sweep_figures` costs that plan for any speed/acceleration without rescanning.
+    """
+
+    def __init__(self, lines: RasterLines, band_count: int, entity_count: int = 0):
+        self.band_count = band_count
+        self.span_count = len(lines)
+        self.span_total = float(lines.extents.sum())
+        # Per scanned entity, for the timeline's per-block times
+        self.entity_spans = np.bincount(lines.entity, minlength=entity_count)
+        self.entity_extents = np.bincount(lines.entity, weights=lines.extents, minlength=entity_count)
+
+        # Spans of a line sorted left to right; the gap before a span is measured from
+        # the furthest end reached so far on the same line, so overlapping spans have none
+        order = np.lexsort((lines.x_start, lines.line))
+        line, x_start, x_end = lines.line[order], lines.x_start[order], lines.x_end[order]
+        line_head = np.r_[True, line[1:] != line[:-1]] if len(line) else np.zeros(0, dtype=bool)
+        self.line_count = int(line_head.sum())
+
+        line_rank = np.cumsum(line_head) - 1
+        line_start = np.minimum.reduceat(x_start, np.flatnonzero(line_head)) if len(line) else np.zeros(0)
+        # Segmented running maximum: lift every line above the previous ones
+        lift = (float(x_end.max() - line_start.min()) + 1.0) * line_rank if len(line) else np.zeros(0)
+        reach = np.maximum.accumulate(x_end - line_start[line_rank] + lift) - lift + line_start[line_rank]
+        gaps = x_start[1:] - reach[:-1]
+        gaps = gaps[~line_head[1:] & (gaps > 0)]
+
+        line_last = np.r_[line_head[1:], True] if len(line) else np.zeros(0, dtype=bool)
+        self.swept_total = float((reach[line_last] - line_start).sum())
+        self.gaps = np.sort(gaps)
+        self._gap_suffix = np.r_[np.cumsum(self.gaps[::-1])[::-1], 0.0]
+
+    def sweep_figures(self,
+                      speed: np.ndarray,
+                      acceleration: np.ndarray,
+                      transit_speed: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Merged and per-entity raster times for arrays of speeds, accelerations and transit speeds.
+        Every sweep ramps up and down over speed^2 / (2 * acceleration) of overscan on each side.
+        Where a gap splits a sweep, the head stops at the end of one overscan and moves to the start
+        of the next at `transit_speed`; that move is part of the merged time.
+        """
+        speed = np.asarray(speed, dtype=np.float64)
+        acceleration = np.asarray(acceleration, dtype=np.float64)
+        transit_speed = np.asarray(transit_speed, dtype=np.float64)
+        ramp_time = 2 * speed / acceleration
+        overscan = speed ** 2 / (2 * acceleration)
+
+        # Gaps narrower than the two overscans they would need are swept through
+        split = np.searchsorted(self.gaps, 2 * overscan, side='right')
+        sweeps = self.line_count + (len(self.gaps) - split)
+        distance = self.swept_total - self._gap_suffix[split]
+        gap_time = np.array([
+            _travel_times(self.gaps[first:] - 2 * reach, v, a).sum()
+            for first, reach, v, a in zip(split, overscan, transit_speed, acceleration)
+        ])
+
+        return {
+            'merged_time': distance / speed + sweeps * ramp_time + gap_time,
+            'per_entity_time': self.span_total / speed + self.span_count * ramp_time,
+            'sweeps': sweeps,
+        }
+
+
+def _travel_times(distances: np.ndarray, target_speed: float, acceleration: float) -> np.ndarray:
+    """Trapezoidal (or, for short moves, triangular) move times from standstill to standstill."""
+    accel_dist = target_speed ** 2 / (2 * acceleration)
+    trapezoidal = 2 * target_speed / acceleration + (distances - 2 * accel_dist) / target_speed
+    triangular = 2 * np.sqrt(np.maximum(distances, 0.0) / acceleration)
+    return np.where(distances >= 2 * accel_dist, trapezoidal, triangular)
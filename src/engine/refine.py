@@ -0,0 +1,322 @@
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+from src.engine.geometry import GeometryStore, PROCESS_CODES
+
+
+@dataclass
+class RefinedTour:
+    """A refined visiting order with the orientation chosen for every entity."""
+    positions: np.ndarray     # Positions into the refined `indices`, in visiting order
+    reverse: np.ndarray       # Per visited entity: burn it backwards
+    start_vertex: np.ndarray  # Per visited entity: local vertex a closed contour starts at (0 = unchanged)
+    distance_before: float
+    distance_after: float
+    moves: Dict[str, int] = field(default_factory=dict)
+    elapsed: float = 0.0
+    steps: int = 0
+    timed_out: bool = False   # Stopped by the wall-clock bound: the tour depends on machine load
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'distance_before_mm': round(self.distance_before, 2),
+            'distance_after_mm': round(self.distance_after, 2),
+            'moves': dict(self.moves),
+            'steps': self.steps,
+            'timed_out': self.timed_out,
+            'elapsed_seconds': round(self.elapsed, 3)
+        }
+
+
+class TourRefiner:
+    """
+    Local search that improves a transit tour after the nearest-neighbour pass.
+
+    Moves: 2-opt (reverse a run of entities, burning each of them backwards), Or-opt (move a run
+    of up to `max_segment` entities elsewhere, optionally reversed) and start rotation of closed
+    contours. Only single-subpath cut/mark entities are reversed (see `GeometryStore.orientability`).
+    Candidate moves are restricted to the `neighbours` nearest entities of every endpoint. Moves
+    that would cut a contour before an entity inside it (`parents`, see `build_containment`) are
+    rejected.
+
+    The search stops after `max_steps` entities were examined (Default = STEPS_PER_SECOND per second
+    of `time_budget`), so the same input always gives the same tour. `time_budget` seconds of wall
+    clock are only an upper bound; a tour stopped by it is marked `timed_out`.
+    """
+
+    # Smallest gain, in mm, that counts as an improvement
+    MIN_GAIN = 1e-9
+    # Steps granted per second of budget, about half the rate of a typical machine, so the step
+    # count rather than the clock normally ends the search
+    STEPS_PER_SECOND = 2000
+
+    def __init__(self,
+                 time_budget: float = 1.0,
+                 neighbours: int = 8,
+                 max_segment: int = 3,
+                 max_steps: Optional[int] = None):
+        self.time_budget = time_budget
+        self.neighbours = neighbours
+        self.max_segment = max_segment
+        self.max_steps = max_steps if max_steps is not None else int(time_budget * self.STEPS_PER_SECOND)
+
+    def refine(self,
+               store: GeometryStore,
+               indices: np.ndarray,
+               origin: Tuple[float, float] = (0.0, 0.0),
+               parents: Optional[np.ndarray] = None) -> RefinedTour:
+        """
+        Refines the tour that visits `indices` in the given order.
+        `parents` holds, per position in `indices`, the position of the contour that must follow it (-1 for none).
+        """
+        started = time.perf_counter()
+        self._deadline = started + self.time_budget
+        self._steps = 0
+        self._timed_out = False
+        indices = np.asarray(indices, dtype=np.int64)
+        count = len(indices)
+
+        starts, ends, valid = store.endpoints(indices)
+        # Raster blocks are entered and left at opposite corners of their bbox, as `flatten_job` costs them
+        raster = valid & (store.process_codes[indices] == PROCESS_CODES['raster'])
+        starts[raster] = store.bboxes[indices[raster], :2]
+        ends[raster] = store.bboxes[indices[raster], 2:]
+        reversible, closed = store.orientability(indices)
+        self._store, self._indices = store, indices
+        self._reversible, self._closed = reversible, closed
+        self._origin = tuple(float(v) for v in origin)
+        self._moves = {'two_opt': 0, 'or_opt': 0, 'rotation': 0}
+        self._parent = np.full(count, -1, dtype=np.int64) if parents is None else np.asarray(parents)
+        self._children: Dict[int, list] = {}
+        for child in np.flatnonzero(self._parent >= 0):
+            self._children.setdefault(int(self._parent[child]), []).append(int(child))
+
+        # Entities without geometry stay in front, where the nearest-neighbour pass put them
+        fixed = np.flatnonzero(~valid)
+        self._tour = [int(i) for i in np.flatnonzero(valid)]
+        self._flip = np.zeros(count, dtype=bool)
+        self._start_vertex = np.zeros(count, dtype=np.int64)
+        self._entry = starts.tolist()
+        self._exit = ends.tolist()
+
+        before = self._tour_length()
+        if len(self._tour) > 1:
+            self._neighbour_lists(starts, ends, valid)
+            self._rotate_closed()
+            self._local_search()
+            self._rotate_closed()
+        after = self._tour_length()
+
+        positions = np.concatenate([fixed, np.asarray(self._tour, dtype=np.int64)])
+        return RefinedTour(
+            positions=positions,
+            reverse=self._flip[positions],
+            start_vertex=self._start_vertex[positions],
+            distance_before=before,
+            distance_after=after,
+            moves=self._moves,
+            elapsed=time.perf_counter() - started,
+            steps=self._steps,
+            timed_out=self._timed_out
+        )
+
+    # Tour bookkeeping
+
+    def _tour_length(self) -> float:
+        total, current = 0.0, self._origin
+        for entity in self._tour:
+            total += math.dist(current, self._entry[entity])
+            current = self._exit[entity]
+        return total
+
+    def _exit_at(self, position: int):
+        return self._origin if position < 0 else self._exit[self._tour[position]]
+
+    def _link(self, position: int) -> float:
+        """Transit into the entity at `position`; the tour is open, so nothing follows the last one."""
+        if position >= len(self._tour):
+            return 0.0
+        return math.dist(self._exit_at(position - 1), self._entry[self._tour[position]])
+
+    def _link_between(self, exit_point, position: int) -> float:
+        if position >= len(self._tour):
+            return 0.0
+        return math.dist(exit_point, self._entry[self._tour[position]])
+
+    def _reverse_entity(self, entity: int) -> None:
+        self._flip[entity] = not self._flip[entity]
+        self._entry[entity], self._exit[entity] = self._exit[entity], self._entry[entity]
+
+    def _out_of_time(self) -> bool:
+        if time.perf_counter() > self._deadline:
+            self._timed_out = True
+        return self._timed_out
+
+    def _neighbour_lists(self, starts: np.ndarray, ends: np.ndarray, valid: np.ndarray) -> None:
+        ids = np.flatnonzero(valid)
+        points = np.vstack([starts[ids], ends[ids]])
+        k = min(self.neighbours + 1, len(points))
+        _, nearest = cKDTree(points).query(points, k=k)
+        nearest = ids[np.asarray(nearest).reshape(len(points), -1) % len(ids)]
+        half = len(ids)
+        self._neighbours = {}
+        for row, entity in enumerate(ids):
+            candidates = np.unique(np.concatenate([nearest[row], nearest[row + half]]))
+            self._neighbours[int(entity)] = [int(c) for c in candidates if c != entity]
+
+    # Moves
+
+    def _rotate_closed(self) -> None:
+        """Starts every closed contour at the vertex closest to its neighbours in the tour."""
+        store, tour = self._store, self._tour
+        for position, entity in enumerate(tour):
+            if not self._closed[entity]:
+                continue
+            if self._out_of_time():
+                return
+            span = store.entity_slice(int(self._indices[entity]))
+            vertices = store.vertices[span][:-1]
+            previous = np.asarray(self._exit_at(position - 1))
+            cost = np.hypot(*(vertices - previous).T)
+            if position + 1 < len(tour):
+                following = np.asarray(self._entry[tour[position + 1]])
+                cost = cost + np.hypot(*(vertices - following).T)
+
+            best = int(np.argmin(cost))
+            current = self._start_vertex[entity]
+            if best != current and cost[best] < cost[current] - self.MIN_GAIN:
+                self._start_vertex[entity] = best
+                point = vertices[best].tolist()
+                self._entry[entity] = self._exit[entity] = point
+                self._moves['rotation'] += 1
+
+    def _local_search(self) -> None:
+        self._position = {entity: p for p, entity in enumerate(self._tour)}
+        queue = deque(self._tour)
+        queued = set(self._tour)
+
+        while queue and self._steps < self.max_steps and not self._out_of_time():
+            self._steps += 1
+            entity = queue.popleft()
+            queued.discard(entity)
+            touched = self._improve(entity)
+            for other in touched:
+                if other not in queued:
+                    queued.add(other)
+                    queue.append(other)
+
+    def _improve(self, entity: int):
+        """Applies the first improving move around `entity`. Returns the entities to revisit."""
+        for candidate in self._neighbours.get(entity, ()):
+            touched = self._try_two_opt(entity, candidate)
+            if touched:
+                return touched
+        for length in range(1, self.max_segment + 1):
+            for candidate in self._neighbours.get(entity, ()):
+                # Insert the run right after or right before the candidate
+                for target in (self._position[candidate], self._position[candidate] - 1):
+                    touched = self._try_or_opt(entity, target, length)
+                    if touched:
+                        return touched
+        return ()
+
+    def _try_two_opt(self, entity: int, candidate: int):
+        i, j = self._position[entity], self._position[candidate]
+        # Either make `candidate` follow `entity` (reverse i+1..j) or precede it (reverse j..i-1)
+        first, last = (i + 1, j) if j > i else (j, i - 1)
+        if first > last:
+            return ()
+
+        tour = self._tour
+        old = self._link(first) + self._link(last + 1)
+        new = (math.dist(self._exit_at(first - 1), self._exit[tour[last]])
+               + self._link_between(self._entry[tour[first]], last + 1))
+        if new >= old - self.MIN_GAIN:
+            return ()
+        segment = tour[first:last + 1]
+        if not self._reversible[segment].all() or self._nested_within(segment, first, last):
+            return ()
+
+        for other in segment:
+            self._reverse_entity(other)
+        tour[first:last + 1] = segment[::-1]
+        for p in range(first, last + 1):
+            self._position[tour[p]] = p
+        self._moves['two_opt'] += 1
+        return self._around(first - 1, first, last, last + 1)
+
+    def _try_or_opt(self, entity: int, target: int, length: int):
+        tour = self._tour
+        first = self._position[entity]
+        last = first + length - 1
+        if last >= len(tour):
+            return ()
+        segment = tour[first:last + 1]
+        if first - 1 <= target <= last:
+            return ()
+
+        # Removing the segment joins its neighbours directly
+        removed = (self._link_between(self._exit_at(first - 1), last + 1)
+                   - self._link(first) - self._link(last + 1))
+
+        # Insert after `target`, forwards or reversed
+        exit_point = self._exit_at(target)
+        closing = self._link(target + 1)
+        head, tail = self._entry[segment[0]], self._exit[segment[-1]]
+        forward = math.dist(exit_point, head) + self._link_between(tail, target + 1) - closing
+        backward = math.inf
+        if self._reversible[segment].all() and not self._nested_within(segment, first, last):
+            backward = (math.dist(exit_point, self._exit[segment[-1]])
+                        + self._link_between(self._entry[segment[0]], target + 1) - closing)
+
+        gain = -(removed + min(forward, backward))
+        if gain <= self.MIN_GAIN or self._jumps_constraint(segment, first, last, target):
+            return ()
+
+        if backward < forward:
+            for other in segment:
+                self._reverse_entity(other)
+            segment = segment[::-1]
+        del tour[first:last + 1]
+        insert_at = target + 1 if target < first else target + 1 - length
+        tour[insert_at:insert_at] = segment
+        low, high = min(first, insert_at), max(last, insert_at + length - 1)
+        for p in range(low, high + 1):
+            self._position[tour[p]] = p
+        self._moves['or_opt'] += 1
+        return self._around(first - 1, first, insert_at - 1, insert_at + length)
+
+    def _nested_within(self, segment, first: int, last: int) -> bool:
+        """True when the run holds a contour together with an entity inside it, so it cannot be reversed."""
+        if not self._children:
+            return False
+        for entity in segment:
+            parent = self._parent[entity]
+            if parent >= 0 and first <= self._position[int(parent)] <= last:
+                return True
+        return False
+
+    def _jumps_constraint(self, segment, first: int, last: int, target: int) -> bool:
+        """True when moving the run behind `target` would put a contour before an entity inside it."""
+        if not self._children:
+            return False
+        if target > last:
+            # Entities last+1..target move in front of the run: none of them may contain it
+            for entity in segment:
+                parent = self._parent[entity]
+                if parent >= 0 and last < self._position[int(parent)] <= target:
+                    return True
+        else:
+            # Entities target+1..first-1 move behind the run: none of them may lie inside it
+            for entity in segment:
+                for child in self._children.get(entity, ()):
+                    if target < self._position[child] < first:
+                        return True
+        return False
+
+    def _around(self, *positions: int):
+        return [self._tour[p] for p in positions if 0 <= p < len(self._tour)]
@@ -0,0 +1,126 @@
+import io
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterator, Union
+import numpy as np
+
+# Process type codes of timeline rows: the burn processes of PROCESS_CODES, then transit moves
+TIMELINE_PROCESSES = ('cut', 'mark', 'raster', 'move')
+MOVE = 3
+
+# Binary layout: header, then the columns back to back, little-endian
+TIMELINE_MAGIC = b'LTTL'
+TIMELINE_VERSION = 1
+_HEADER = struct.Struct('<4sIQd')  # magic, version, row count, total time in seconds
+_COLUMNS = (('t_start', '<f4'), ('duration', '<f4'), ('x', '<f4'), ('y', '<f4'),
+            ('process', 'u1'), ('entity', '<i4'))
+# Bytes per row of the binary format
+ROW_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in _COLUMNS)
+
+
+@dataclass
+class Timeline:
+    """
+    Time-resolved toolpath of an evaluated job, one row per transit move, burned piece, burn
+    dwell and raster block, in job order. `x`, `y` is where the head is when the row starts;
+    `entity` is the index of the entity in the estimated list (-1 for none).
+    """
+    t_start: np.ndarray
+    duration: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    process: np.ndarray  # Code into TIMELINE_PROCESSES
+    entity: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.t_start)
+
+    @classmethod
+    def from_durations(cls, duration: np.ndarray, positions: np.ndarray, process: np.ndarray,
+                       entity: np.ndarray) -> 'Timeline':
+        duration = np.asarray(duration, dtype=np.float64)
+        return cls(t_start=np.cumsum(duration) - duration, duration=duration, x=positions[:, 0],
+                   y=positions[:, 1], process=np.asarray(process, dtype=np.uint8),
+                   entity=np.asarray(entity, dtype=np.int64))
+
+    @property
+    def total_time(self) -> float:
+        return float(self.t_start[-1] + self.duration[-1]) if len(self) else 0.0
+
+    def downsample(self, max_points: int) -> 'Timeline':
+        """
+        At most `max_points` rows over equal slices of the job's time. A merged row starts where
+        its first row starts, lasts until its last row ends and takes the process that used most
+        of its time; the position and entity are those of its first row.
+        """
+        count = len(self)
+        if count <= max_points:
+            return self
+        if max_points < 1:
+            raise ValueError("max_points must be at least 1")
+        total = self.total_time
+        if total > 0:
+            slot = np.minimum((self.t_start / total * max_points).astype(np.int64), max_points - 1)
+        else:
+            slot = np.arange(count) * max_points // count
+        heads = np.flatnonzero(np.r_[True, slot[1:] != slot[:-1]])
+        lasts = np.r_[heads[1:], count] - 1
+        group = np.repeat(np.arange(len(heads)), np.diff(np.r_[heads, count]))
+        shares = np.bincount(group * len(TIMELINE_PROCESSES) + self.process, weights=self.duration,
+                             minlength=len(heads) * len(TIMELINE_PROCESSES))
+        t_start = self.t_start[heads]
+        return Timeline(
+            t_start=t_start,
+            duration=self.t_start[lasts] + self.duration[lasts] - t_start,
+            x=self.x[heads],
+            y=self.y[heads],
+            process=shares.reshape(len(heads), -1).argmax(axis=1).astype(np.uint8),
+            entity=self.entity[heads]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Columnar JSON-ready form, as the `timeline` block of an API report."""
+        return {
+            'processes': list(TIMELINE_PROCESSES),
+            't_start': np.round(self.t_start, 4).tolist(),
+            'duration': np.round(self.duration, 4).tolist(),
+            'x': np.round(self.x, 3).tolist(),
+            'y': np.round(self.y, 3).tolist(),
+            'process': self.process.tolist(),
+            'entity': self.entity.tolist()
+        }
+
+    def write(self, file: BinaryIO) -> None:
+        """Compact binary form: ROW_BYTES per row, single precision times and positions."""
+        file.write(_HEADER.pack(TIMELINE_MAGIC, TIMELINE_VERSION, len(self), self.total_time))
+        for name, dtype in _COLUMNS:
+            file.write(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, memoryview]) -> 'Timeline':
+        magic, version, count, _ = _HEADER.unpack_from(data)
+        if magic != TIMELINE_MAGIC:
+            raise ValueError("Not a timeline file")
+        if version != TIMELINE_VERSION:
+            raise ValueError(f"Unsupported timeline version {version}, expected {TIMELINE_VERSION}")
+        columns, offset = {}, _HEADER.size
+        for name, dtype in _COLUMNS:
+            columns[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += columns[name].nbytes
+        return cls(**columns)
+
+    def iter_ndjson(self) -> Iterator[str]:
+        """One JSON line per row, for streaming."""
+        for t_start, duration, x, y, process, entity in zip(
+            self.t_start.tolist(), self.duration.tolist(), self.x.tolist(), self.y.tolist(),
+            self.process.tolist(), self.entity.tolist()
+        ):
+            yield json.dumps({'t_start': round(t_start, 4), 'duration': round(duration, 4),
+                              'x': round(x, 3), 'y': round(y, 3),
+                              'process_type': TIMELINE_PROCESSES[process], 'entity_index': entity}) + '\n'
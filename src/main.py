@@ -2,16 +2,25 @@ import argparse
 import json
 import sys
 import os
+import time
 
 # Agregamos la raíz del proyecto al sys.path para que pueda encontrar el módulo 'src'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.parsers.svg_parser import SVGParser
-from src.engine.calculator import LaserTimeCalculator
+# The engine (NumPy, SciPy, svgelements) is imported in `run`, once the arguments are valid,
+# so --help and argument errors return immediately
+from src.engine.options import DEFAULT_TOLERANCE, JUNCTION_MODELS, RASTER_MODELS
 
-def main():
+def positive_float(value: str) -> float:
+    """argparse type of lengths that must be greater than zero."""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Estimate laser execution time from SVG files.")
-    parser.add_argument("file", help="Path to the input SVG file")
+    parser.add_argument("files", nargs="+", metavar="file", help="Path to the input SVG file, or a .ltg geometry file written by --save_geometry. Several files, directories or glob patterns run in batch mode")
     
     # Required calculation parameters (Speeds in mm/s)
     parser.add_argument("--cut_speed", type=float, required=True, help="Speed for cutting paths in mm/s (Red hex #FF0000)")
@@ -20,49 +29,137 @@ def main():
     parser.add_argument("--transit_speed", type=float, required=True, help="Transit speed between entities in mm/s (G0 moves)")
     
     # Optional calculation parameters
-    parser.add_argument("--scan_gap", type=float, default=0.1, help="Advance in Y axis per line for Raster (Default = 0.1mm)")
+    parser.add_argument("--scan_gap", type=positive_float, default=0.1, help="Advance in Y axis per line for Raster (Default = 0.1mm)")
     parser.add_argument("--ppi", type=float, default=25.4, help="Pixels Per Inch of the SVG. If 1 unit in SVG should be 1mm, use 25.4 (Default). If using 100 DPI, use 100.")
     parser.add_argument("--accel", type=float, default=500.0, help="Machine acceleration in mm/s² (Default = 500)")
-    parser.add_argument("--junction_delay", type=float, default=0.05, help="Time loss at each path vertex in seconds (Default = 0.05)")
+    parser.add_argument("--junction_delay", type=float, default=0.05, help="Time loss at each path vertex in seconds; only used with --junction_model constant, the default lookahead model ignores it (Default = 0.05)")
+    parser.add_argument("--junction_model", choices=JUNCTION_MODELS, default="lookahead", help="Corner costing: 'lookahead' plans the speed through every vertex, 'constant' adds junction_delay per segment (Default = lookahead)")
+    parser.add_argument("--junction_deviation", type=float, default=0.01, help="Junction deviation in mm used by the lookahead model to limit cornering speed (Default = 0.01)")
     parser.add_argument("--burn_dwell", type=float, default=0.1, help="Time loss at each cut start in seconds (Default = 0.1)")
+    parser.add_argument("--raster_model", choices=RASTER_MODELS, default="scanline", help="Raster costing: 'scanline' sweeps the filled extent of each line and ramps up to and down from the engrave speed around it, 2 * speed / accel seconds per line however short (1.2 s at 300 mm/s and 500 mm/s²), which dominates small raster areas; 'bbox' full-width passes plus a fixed 10%% overscan (Default = scanline)")
+    parser.add_argument("--tolerance", type=positive_float, default=DEFAULT_TOLERANCE, help=f"Max distance in mm between a curve and its flattened chords; lower is more accurate, higher is faster (Default = {DEFAULT_TOLERANCE})")
+    parser.add_argument("--merge_raster", action="store_true", help="Engrave raster areas that share scanlines in combined sweeps; the report keeps the per-entity time too")
+    parser.add_argument("--refine", type=float, default=0.0, metavar="SECONDS", help="Budget for 2-opt/Or-opt refinement of the transit order, reversing open paths and rotating closed ones: a fixed number of search steps that takes about this long on a typical machine, so results are reproducible, with SECONDS as a hard upper bound; the report shows transit distance before and after (Default = 0, off)")
+    parser.add_argument("--cluster", type=int, default=0, metavar="SIZE", help="Order the transit path cluster by cluster, about SIZE entities each, for jobs with 100k+ entities such as stipple or perforation dots; the report shows the cluster count and transit distance (Default = 0, flat nearest-neighbour)")
+    parser.add_argument("--cluster_workers", type=int, default=1, help="Processes that order the clusters of --cluster; the order does not depend on it. Single-file mode only (Default = 1)")
+    parser.add_argument("--cluster_compare", action="store_true", help="With --cluster, also run the flat solver and report how much longer the clustered transit path is")
+    parser.add_argument("--timeline", metavar="PATH", help="Write the time-resolved toolpath (t_start, duration, x, y, process_type, entity_index per move, burn, dwell and raster block) to PATH: NDJSON for .ndjson/.jsonl, compact binary otherwise. Single-file mode only")
+    parser.add_argument("--timeline_points", type=int, default=0, help="Downsample the --timeline output to at most this many rows over equal time slices (Default = 0, every row)")
+    parser.add_argument("--save_geometry", action="store_true", help="Also write each parsed SVG's flattened geometry next to it as a .ltg file, which later runs load without parsing")
+    parser.add_argument("--diagnostics", action="store_true", help="Add a 'diagnostics' block to the report with the wall time and call count of every parse and estimate stage, plus entity and segment counts")
+    parser.add_argument("--parse_workers", type=int, default=1, help="Processes used to parse a large SVG in parallel shards; the result is identical to the serial parse. Single-file mode only, batch mode already parses files in parallel (Default = 1)")
+    parser.add_argument("--streaming", action="store_true", help="Read the SVG incrementally, skipping non-laser colours early. Does not resolve <use> or <style> stylesheets")
+
+    # Batch mode
+    parser.add_argument("--batch", action="store_true", help="Force batch mode (JSON Lines output) even for a single file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for batch mode (Default = CPU count)")
+
+    # Warm start
+    parser.add_argument("--server", default=os.environ.get("LASER_SERVER"), metavar="SOCKET", help="Forward the run to a warm server started with 'python src/server.py SOCKET', which skips the start-up imports and reuses parsed files. Runs locally when the server is not reachable (Default = $LASER_SERVER)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.server:
+        from src.server import forward
+        exit_code = forward(args.server, sys.argv[1:] if argv is None else argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+    sys.exit(run(args))
+
+def run(args, out=None) -> int:
+    """Runs the parsed command line, writing the JSON output to `out` (Default = stdout). Returns the exit code."""
+    from src.engine.calculator import LaserTimeCalculator
+    from src.batch import expand_inputs, load_file_entities
+    from src.utils.diagnostics import Diagnostics
+
+    out = out or sys.stdout
+    calculator_kwargs = dict(
+        cut_speed=args.cut_speed,
+        vector_engrave_speed=args.vector_engrave_speed,
+        raster_engrave_speed=args.raster_engrave_speed,
+        transit_speed=args.transit_speed,
+        acceleration=args.accel,
+        junction_delay=args.junction_delay,
+        burn_dwell=args.burn_dwell,
+        scan_gap=args.scan_gap,
+        raster_model=args.raster_model,
+        merge_raster=args.merge_raster,
+        junction_model=args.junction_model,
+        junction_deviation=args.junction_deviation,
+        refine_seconds=args.refine,
+        cluster_size=args.cluster,
+        cluster_workers=args.cluster_workers,
+        cluster_compare=args.cluster_compare
+    )
+
+    files = expand_inputs(args.files)
+    if args.batch or len(files) != 1 or files != args.files:
+        # Batch workers already run in parallel, one file each
+        return batch_main(files, args, dict(calculator_kwargs, cluster_workers=1), out)
+
+    args.file = files[0]
     
-    args = parser.parse_args()
-    
+    diagnostics = Diagnostics() if args.diagnostics else None
     try:
-        # 1. Parse original SVG
-        svg_parser = SVGParser(args.file, ppi=args.ppi)
-        entities = svg_parser.parse()
+        # 1. Parse original SVG (or map a saved geometry file)
+        entities = load_file_entities(args.file, args.ppi, args.streaming, args.tolerance, args.save_geometry,
+                                      diagnostics, args.parse_workers)
         
         if not entities:
             print(json.dumps({
                 "error": "No valid laser operation paths found in the provided SVG."
-            }, indent=2))
-            sys.exit(1)
+            }, indent=2), file=out)
+            return 1
             
         # 2. Configure mathematical estimator
-        calculator = LaserTimeCalculator(
-            cut_speed=args.cut_speed,
-            vector_engrave_speed=args.vector_engrave_speed,
-            raster_engrave_speed=args.raster_engrave_speed,
-            transit_speed=args.transit_speed,
-            acceleration=args.accel,
-            junction_delay=args.junction_delay,
-            burn_dwell=args.burn_dwell,
-            scan_gap=args.scan_gap
-        )
+        calculator = LaserTimeCalculator(**calculator_kwargs)
         
         # 3. Compute times and distances
-        report = calculator.calculate_total_job(entities)
+        report = calculator.calculate_total_job(entities, diagnostics=diagnostics, timeline=bool(args.timeline))
+        if args.timeline:
+            report['timeline'] = write_timeline(report['timeline'], args.timeline, args.timeline_points)
         
         # Output clean JSON to stdout
-        print(json.dumps(report, indent=4))
+        print(json.dumps(report, indent=4), file=out)
+        return 0
         
     except FileNotFoundError:
-        print(json.dumps({"error": f"File not found: {args.file}"}, indent=2))
-        sys.exit(1)
+        print(json.dumps({"error": f"File not found: {args.file}"}, indent=2), file=out)
+        return 1
     except Exception as e:
-        print(json.dumps({"error": f"An error occurred while processing the SVG: {str(e)}"}, indent=2))
-        sys.exit(1)
+        print(json.dumps({"error": f"An error occurred while processing the SVG: {str(e)}"}, indent=2), file=out)
+        return 1
+
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+def write_timeline(timeline, path: str, max_points: int):
+    """Writes a report's timeline to `path` and returns the summary that replaces it in the report."""
+    rows = len(timeline)
+    if max_points > 0:
+        timeline = timeline.downsample(max_points)
+    ndjson = path.lower().endswith(NDJSON_SUFFIXES)
+    if ndjson:
+        with open(path, 'w') as f:
+            f.writelines(timeline.iter_ndjson())
+    else:
+        with open(path, 'wb') as f:
+            timeline.write(f)
+    return {"file": path, "format": "ndjson" if ndjson else "binary", "rows": len(timeline), "source_rows": rows}
+
+def batch_main(files, args, calculator_kwargs, out) -> int:
+    """Streams one JSON line per file as each finishes, then an aggregate summary line."""
+    from src.batch import run_batch, summarize
+
+    started = time.perf_counter()
+    results = []
+    for result in run_batch(files, args.ppi, args.streaming, calculator_kwargs, args.workers, args.tolerance,
+                            args.save_geometry, args.diagnostics):
+        results.append(result)
+        print(json.dumps(result), file=out, flush=True)
+
+    print(json.dumps({"summary": summarize(results, time.perf_counter() - started)}), file=out, flush=True)
+    return 0 if results and all("report" in r for r in results) else 1
 
 if __name__ == "__main__":
     main()
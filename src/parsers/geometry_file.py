@@ -0,0 +1,171 @@
+"""
+Binary geometry file (.ltg): the flattened `GeometryStore` of a parsed SVG, opened without parsing.
+
+Layout, little-endian:
+    header (HEADER_SIZE bytes): magic, format version, header size, entity count, vertex count,
+                                ppi and chord tolerance the SVG was parsed with, SHA-256 of the payload
+    payload: vertices (V, 2) f8 | vertex_flags (V,) u1 | segment_lengths (V,) f8 |
+             entity_offsets (N + 1,) i8 | process_codes (N,) u1 | bboxes (N, 4) f8
+Every payload section starts on a SECTION_ALIGNMENT boundary, so the arrays can be mapped in place.
+"""
+import hashlib
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, List, Tuple, Union
+import numpy as np
+from src.engine.geometry import PROCESS_NAMES, GeometryStore
+from src.parsers.svg_parser import LaserEntity, SVGParser
+
+GEOMETRY_FILE_SUFFIX = '.ltg'
+MAGIC = b'LTCGEOM\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIQQdd32s')
+HEADER_SIZE = 128
+SECTION_ALIGNMENT = 64
+
+# (store attribute, dtype, shape from (entity count, vertex count))
+SECTIONS = (
+    ('vertices', '<f8', lambda n, v: (v, 2)),
+    ('vertex_flags', 'u1', lambda n, v: (v,)),
+    ('segment_lengths', '<f8', lambda n, v: (v,)),
+    ('entity_offsets', '<i8', lambda n, v: (n + 1,)),
+    ('process_codes', 'u1', lambda n, v: (n,)),
+    ('bboxes', '<f8', lambda n, v: (n, 4)),
+)
+
+# Entities loaded from a file carry the canonical colour of their process
+PROCESS_COLORS = {process: color for color, process in SVGParser.COLOR_MAP.items()}
+
+
+class GeometryFileError(ValueError):
+    """Raised for files that are not geometry files, use another version, fail the checksum or are malformed."""
+
+
+@dataclass
+class GeometryFile:
+    """A loaded geometry file; `store` arrays are read-only views into the file's memory map."""
+    store: GeometryStore
+    ppi: float
+    tolerance: float
+
+
+def is_geometry_file(head: bytes) -> bool:
+    """True when `head` (the first bytes of a file) starts like a geometry file."""
+    return head[:len(MAGIC)] == MAGIC
+
+
+def _section_layout(entity_count: int, vertex_count: int) -> Tuple[List[Tuple[str, np.dtype, tuple, int]], int]:
+    """Returns the (name, dtype, shape, offset) of every section and the total file size."""
+    layout = []
+    offset = HEADER_SIZE
+    for name, dtype, shape in SECTIONS:
+        dtype = np.dtype(dtype)
+        shape = shape(entity_count, vertex_count)
+        layout.append((name, dtype, shape, offset))
+        size = int(np.prod(shape)) * dtype.itemsize
+        offset += -(-size // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+    return layout, offset
+
+
+def geometry_file_size(store: GeometryStore) -> int:
+    """Bytes `write_geometry` writes for `store`."""
+    return _section_layout(len(store), len(store.vertices))[1]
+
+
+def write_geometry(store: GeometryStore,
+                   target: Union[str, os.PathLike, BinaryIO],
+                   ppi: float,
+                   tolerance: float) -> None:
+    """Writes `store` to a path or binary file object."""
+    layout, _ = _section_layout(len(store), len(store.vertices))
+    chunks = []
+    for name, dtype, shape, _ in layout:
+        data = np.ascontiguousarray(getattr(store, name), dtype=dtype).reshape(shape)
+        chunks.append(memoryview(data).cast('B'))
+        chunks.append(bytes(-data.nbytes % SECTION_ALIGNMENT))
+
+    checksum = hashlib.sha256()
+    for chunk in chunks:
+        checksum.update(chunk)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, HEADER_SIZE, len(store), len(store.vertices),
+                         float(ppi), float(tolerance), checksum.digest())
+
+    if hasattr(target, 'write'):
+        _write_chunks(target, header, chunks)
+    else:
+        with open(target, 'wb') as handle:
+            _write_chunks(handle, header, chunks)
+
+
+def _write_chunks(handle: BinaryIO, header: bytes, chunks: List[memoryview]) -> None:
+    handle.write(header.ljust(HEADER_SIZE, b'\0'))
+    for chunk in chunks:
+        handle.write(chunk)
+
+
+def read_geometry(source: Union[str, os.PathLike, bytes, bytearray, memoryview], verify: bool = True) -> GeometryFile:
+    """
+    Opens a geometry file without copying its arrays: paths are memory-mapped with `numpy.memmap`,
+    in-memory buffers are wrapped with `numpy.frombuffer`. `verify` checks the payload checksum,
+    which reads the whole file once.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        raw = np.frombuffer(source, dtype=np.uint8)
+    else:
+        raw = np.memmap(source, dtype=np.uint8, mode='r')
+
+    if len(raw) < HEADER_SIZE or not is_geometry_file(raw[:len(MAGIC)].tobytes()):
+        raise GeometryFileError("Not a geometry file")
+    _, version, header_size, entity_count, vertex_count, ppi, tolerance, checksum = HEADER.unpack(
+        raw[:HEADER.size].tobytes()
+    )
+    if version != FORMAT_VERSION or header_size != HEADER_SIZE:
+        raise GeometryFileError(f"Unsupported geometry file version {version}, expected {FORMAT_VERSION}")
+    layout, size = _section_layout(entity_count, vertex_count)
+    if len(raw) != size:
+        raise GeometryFileError(f"Truncated geometry file: {len(raw)} bytes, expected {size}")
+    if verify and hashlib.sha256(raw[HEADER_SIZE:]).digest() != checksum:
+        raise GeometryFileError("Geometry file checksum mismatch")
+
+    arrays = {}
+    for name, dtype, shape, offset in layout:
+        count = int(np.prod(shape))
+        arrays[name] = raw[offset:offset + count * dtype.itemsize].view(dtype).reshape(shape)
+    _check_structure(arrays, vertex_count)
+    return GeometryFile(store=GeometryStore(**arrays), ppi=ppi, tolerance=tolerance)
+
+
+def _check_structure(arrays: dict, vertex_count: int) -> None:
+    """
+    Rejects payloads that index out of range. The checksum only guards against corruption, anyone
+    can compute it for a crafted file.
+    """
+    offsets = arrays['entity_offsets']
+    if offsets[0] != 0 or offsets[-1] != vertex_count:
+        raise GeometryFileError(f"Malformed geometry file: entity offsets must run from 0 to {vertex_count}")
+    if np.any(offsets[1:] < offsets[:-1]):
+        raise GeometryFileError("Malformed geometry file: entity offsets decrease")
+    if np.any(arrays['process_codes'] >= len(PROCESS_NAMES)):
+        raise GeometryFileError("Malformed geometry file: unknown process code")
+    if not np.isfinite(arrays['bboxes']).all():
+        raise GeometryFileError("Malformed geometry file: bounding boxes are not finite")
+
+
+def load_entities(source: Union[str, os.PathLike, bytes, bytearray, memoryview], verify: bool = True) -> List[LaserEntity]:
+    """Entities of a geometry file in stored order, backed by the mapped store like parsed ones."""
+    return store_entities(read_geometry(source, verify).store)
+
+
+def store_entities(store: GeometryStore) -> List[LaserEntity]:
+    """One path-less entity per stored entity, as `SVGParser.parse` returns them."""
+    return [
+        LaserEntity(
+            path=None,
+            color_hex=PROCESS_COLORS[PROCESS_NAMES[code]],
+            process_type=PROCESS_NAMES[code],
+            store=store,
+            index=index
+        )
+        for index, code in enumerate(store.process_codes.tolist())
+    ]
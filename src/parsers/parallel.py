@@ -0,0 +1,183 @@
+"""
+Parallel SVG parsing: the document is split into shards of consecutive elements, each shard is
+parsed by `SVGParser` in a worker process, and the flattened geometry comes back through shared
+memory in the geometry file layout (see `src.parsers.geometry_file`) instead of as pickled objects.
+
+A shard is a standalone SVG with the root <svg> attributes, every top-level resource container
+(<defs>, <style>, ...) and a run of the document's elements, wrapped in copies of the groups
+they sit in, so inherited styles and transforms resolve as in the whole document. Shards are
+merged in document order, which makes the result the same as the serial parse.
+"""
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+from xml.etree.ElementTree import Element, SubElement, fromstring, tostring
+import numpy as np
+from src.engine.geometry import DEFAULT_TOLERANCE, GeometryStore
+from src.parsers.geometry_file import geometry_file_size, read_geometry, store_entities, write_geometry
+from src.parsers.svg_parser import LaserEntity, SVGParser
+from src.utils.concurrency import process_pool
+from src.utils.diagnostics import DISABLED, Diagnostics
+from src.utils.progress import ProgressCallback
+
+# Top-level elements copied into every shard: never drawn themselves, but referenced or applied
+SHARED_TAGS = {'defs', 'style', 'symbol', 'marker', 'pattern', 'clipPath', 'mask'}
+# Groups are opened into their children until there are this many units per shard to balance
+UNITS_PER_SHARD = 8
+GROUP_TAGS = {'g', 'a'}
+# Documents with fewer elements per worker than this are parsed serially
+MIN_SHARD_ELEMENTS = 256
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+
+def _local_name(elem: Element) -> Optional[str]:
+    # Comments and processing instructions have a function as tag
+    return elem.tag.rsplit('}', 1)[-1] if isinstance(elem.tag, str) else None
+
+
+def split_document(data: bytes, shards: int) -> Optional[List[bytes]]:
+    """
+    Splits an SVG into at most `shards` standalone documents of consecutive elements.
+    Returns None when the document is too small to split or a <use> points at an element that
+    would not be in every shard.
+    """
+    root = fromstring(data)
+    shared, units = [], []
+    for child in root:
+        name = _local_name(child)
+        if name in SHARED_TAGS:
+            shared.append(child)
+        elif name is not None:
+            units.append(((), child))
+
+    shared_ids = {elem.get('id') for container in shared for elem in container.iter() if elem.get('id')}
+    for elem in root.iter():
+        if _local_name(elem) == 'use':
+            href = elem.get('href') or elem.get(XLINK_HREF) or ''
+            if href.lstrip('#') not in shared_ids:
+                return None
+
+    while len(units) < shards * UNITS_PER_SHARD:
+        opened = []
+        for ancestors, elem in units:
+            if _local_name(elem) in GROUP_TAGS and len(elem):
+                opened.extend((ancestors + (elem,), child) for child in elem if _local_name(child) is not None)
+            else:
+                opened.append((ancestors, elem))
+        if len(opened) == len(units):
+            break
+        units = opened
+
+    weights = np.array([sum(1 for _ in elem.iter()) for _, elem in units], dtype=np.int64)
+    shards = min(shards, len(units), int(weights.sum()) // MIN_SHARD_ELEMENTS)
+    if shards < 2:
+        return None
+    # Contiguous runs of units with about the same number of elements each
+    cumulative = np.cumsum(weights)
+    bounds = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, shards) / shards, side='right')
+    bounds = np.unique(np.r_[0, bounds, len(units)])
+    return [_shard_document(root, shared, units[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _shard_document(root: Element, shared: List[Element], units) -> bytes:
+    shard = Element(root.tag, root.attrib)
+    shard.extend(shared)
+    clones: Dict[int, Element] = {}
+    for ancestors, elem in units:
+        parent = shard
+        for ancestor in ancestors:
+            clone = clones.get(id(ancestor))
+            if clone is None:
+                clone = clones[id(ancestor)] = SubElement(parent, ancestor.tag, ancestor.attrib)
+            parent = clone
+        parent.append(elem)
+    return tostring(shard)
+
+
+class _BufferWriter:
+    """Minimal binary file object writing into a shared memory buffer."""
+
+    def __init__(self, buffer: memoryview):
+        self.buffer = buffer
+        self.position = 0
+
+    def write(self, data) -> None:
+        data = memoryview(data).cast('B')
+        self.buffer[self.position:self.position + data.nbytes] = data
+        self.position += data.nbytes
+
+
+def parse_shard(data: bytes,
+                ppi: float,
+                tolerance: float = DEFAULT_TOLERANCE,
+                streaming: bool = False) -> Tuple[str, int, Dict]:
+    """
+    Worker side: parses one shard and leaves its geometry in a new shared memory block.
+    Returns: (block name, geometry size in bytes, diagnostics report); the caller unlinks the block.
+    """
+    diagnostics = Diagnostics()
+    parser = SVGParser(data, ppi=ppi, tolerance=tolerance)
+    parser.parse(streaming=streaming, diagnostics=diagnostics)
+    size = geometry_file_size(parser.store)
+    block = SharedMemory(create=True, size=size)
+    try:
+        write_geometry(parser.store, _BufferWriter(block.buf), ppi, tolerance)
+    finally:
+        block.close()
+    return block.name, size, diagnostics.report()
+
+
+def _collect(name: str, size: int) -> GeometryStore:
+    """Copies a shard's geometry out of its shared memory block and frees the block."""
+    block = SharedMemory(name=name)
+    try:
+        mapped = read_geometry(block.buf[:size], verify=False).store
+        store = GeometryStore(**{key: np.array(getattr(mapped, key)) for key in GeometryStore.__slots__})
+        del mapped
+    finally:
+        block.close()
+        block.unlink()
+    return store
+
+
+def parse_shards(data: bytes,
+                 ppi: float,
+                 tolerance: float,
+                 streaming: bool,
+                 workers: int,
+                 progress: ProgressCallback = None,
+                 diagnostics: Diagnostics = DISABLED) -> Optional[Tuple[List[LaserEntity], GeometryStore]]:
+    """
+    Parses an SVG on `workers` processes. Returns: (entities, store) like `SVGParser.parse`,
+    or None when the document is not worth or not safe to split.
+    Worker stage times are summed into `diagnostics`, so they can exceed the wall time.
+    """
+    with diagnostics.stage('parse.split'):
+        shards = split_document(data, workers)
+    if shards is None:
+        return None
+
+    futures = [process_pool(workers).submit(parse_shard, shard, ppi, tolerance, streaming) for shard in shards]
+    stores = []
+    taken = 0
+    try:
+        for future in futures:
+            taken += 1
+            name, size, report = future.result()
+            stores.append(_collect(name, size))
+            for stage, entry in report['stages'].items():
+                diagnostics.add_time(stage, entry['seconds'], entry['calls'])
+            for counter, value in report['counters'].items():
+                diagnostics.count(counter, value)
+            if progress:
+                progress('entities_parsed', sum(len(store) for store in stores))
+    finally:
+        # Blocks of shards that finished after a failure are still freed
+        for future in futures[taken:]:
+            if not future.cancel() and future.exception() is None:
+                _collect(*future.result()[:2])
+
+    with diagnostics.stage('parse.merge'):
+        store = GeometryStore.concatenate(stores)
+    diagnostics.count('parse.shards', len(shards))
+    if progress:
+        progress('entities_total', len(store))
+    return store_entities(store), store
@@ -1,78 +1,437 @@
+import io
 import svgelements
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import fromstring, iterparse, tostring
 from svgelements import Matrix
+from src.engine.geometry import GeometryBuilder, GeometryStore
+from src.engine.options import DEFAULT_TOLERANCE, check_tolerance
+from src.utils.diagnostics import DISABLED, Diagnostics
+from src.utils.progress import PROGRESS_INTERVAL, ProgressCallback
 
 @dataclass
 class LaserEntity:
-    """Represents a discrete path or shape to be processed by the laser."""
-    path: svgelements.Path
+    """
+    Represents a discrete path or shape to be processed by the laser.
+    Parsed entities reference their flattened geometry in a shared `GeometryStore`
+    and only keep the svgelements `path` when the parser is asked to.
+    """
+    path: Optional[svgelements.Path]
     color_hex: str
     process_type: str  # 'cut', 'mark', 'raster'
+    store: Optional[GeometryStore] = field(default=None, repr=False, compare=False)
+    index: int = -1
 
 class SVGParser:
     """Parses SVG files and extracts geometric entities classified by their operation color."""
-    
+
     # Define mapping of colors to operations based on business rules
     COLOR_MAP = {
         '#FF0000': 'cut',      # Red
         '#00FF00': 'mark',     # Green
         '#0000FF': 'raster'    # Blue
     }
-    
-    def __init__(self, filepath: str, ppi: float = 96.0):
+    # Packed RGBA value of every COLOR_MAP colour, so classifying a colour is one dict lookup.
+    # Semi-transparent variants have another alpha byte and, as before, do not match.
+    COLOR_VALUES = {svgelements.Color(hex_val).value: hex_val for hex_val in COLOR_MAP}
+    # The same colours without their alpha byte: an opacity can change the alpha, never the colour
+    COLOR_RGB = {value >> 8 for value in COLOR_VALUES}
+
+    # Streaming mode: containers whose content is never drawn directly
+    NON_RENDERED_TAGS = {
+        'defs', 'clipPath', 'pattern', 'mask', 'symbol', 'marker',
+        'style', 'text', 'title', 'desc', 'metadata', 'image'
+    }
+    SHAPE_TAGS = {
+        'circle': svgelements.Circle,
+        'ellipse': svgelements.Ellipse,
+        'line': svgelements.SimpleLine,
+        'polyline': svgelements.Polyline,
+        'polygon': svgelements.Polygon,
+        'rect': svgelements.Rect,
+    }
+    # Values of stroke/fill that do not resolve to a colour of their own
+    NON_COLOR_PAINTS = ('currentcolor', 'inherit', 'url(')
+    # Attributes that apply to an element but are not inherited by its children
+    NON_INHERITED_ATTRIBUTES = ('preserveAspectRatio', 'viewBox', 'id', 'class', 'clip-path')
+
+    def __init__(self,
+                 filepath: Union[str, bytes, BinaryIO],
+                 ppi: float = 96.0,
+                 keep_paths: bool = False,
+                 tolerance: float = DEFAULT_TOLERANCE):
+        # A path, the raw SVG bytes or a binary file-like object (e.g. an upload buffer)
         self.filepath = filepath
         self.ppi = ppi
-        # Parse using default internal PPI (96) to keep units as pixels
-        self.svg = svgelements.SVG.parse(filepath)
+        self.keep_paths = keep_paths
+        # Chord tolerance in mm used to flatten curves, trading accuracy for speed
+        self.tolerance = check_tolerance(tolerance)
+        self._svg: Optional[svgelements.SVG] = None
         self.entities: List[LaserEntity] = []
+        self.store: Optional[GeometryStore] = None
+        self._diagnostics: Diagnostics = DISABLED
+        # Streaming mode: (stroke, stroke-opacity, fill, fill-opacity) strings -> COLOR_MAP key or None
+        self._color_cache: Dict[Tuple[Any, ...], Optional[str]] = {}
+        # False while `parse()` leaves the mm scale to the geometry builder
+        self._scale_paths = True
+
+    @property
+    def svg(self) -> svgelements.SVG:
+        """The svgelements document, parsed on first access and released after `parse()`."""
+        if self._svg is None:
+            # Parse using default internal PPI (96) to keep units as pixels
+            self._svg = svgelements.SVG.parse(self._open_source())
+        return self._svg
+
+    def _open_source(self) -> Union[str, BinaryIO]:
+        """Returns something the XML reader can consume, rewinding file-like sources for re-parsing."""
+        if isinstance(self.filepath, (bytes, bytearray, memoryview)):
+            return io.BytesIO(self.filepath)
+        if hasattr(self.filepath, 'read'):
+            if hasattr(self.filepath, 'seek'):
+                self.filepath.seek(0)
+            return self.filepath
+        return self.filepath
+
+    def read_source(self) -> bytes:
+        """The raw SVG document."""
+        source = self._open_source()
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return f.read()
+        return source.read()
 
-    def parse(self) -> List[LaserEntity]:
-        """Parses the SVG geometry and classifies valid entities."""
+    def parse(self,
+              streaming: bool = False,
+              progress: ProgressCallback = None,
+              diagnostics: Optional[Diagnostics] = None,
+              workers: int = 1) -> List[LaserEntity]:
+        """
+        Parses the SVG geometry and classifies valid entities.
+        The geometry is flattened into `self.store`; the svgelements document is released afterwards.
+        With `streaming=True` the file is read incrementally through `iter_entities()`.
+        `diagnostics` records the time and calls of every 'parse.*' stage and the element counts.
+        With `workers > 1` large documents are split into shards parsed in a process pool (see
+        `src.parsers.parallel`); the result is the same as the serial one. Kept paths need the serial parse.
+        """
         self.entities = []
-        
+        self._diagnostics = diagnostics or DISABLED
+        self._scale_paths = self.keep_paths
+        try:
+            with self._diagnostics.stage('parse'):
+                if not (workers > 1 and not self.keep_paths and self._parse_sharded(streaming, progress, workers)):
+                    self._parse(streaming, progress)
+        finally:
+            self._diagnostics = DISABLED
+            self._scale_paths = True
+        return self.entities
+
+    def _parse_sharded(self, streaming: bool, progress: ProgressCallback, workers: int) -> bool:
+        """Parses the document in parallel shards. Returns False if it cannot be sharded."""
+        from src.parsers.parallel import parse_shards
+        result = parse_shards(self.read_source(), self.ppi, self.tolerance, streaming, workers,
+                              progress, self._diagnostics)
+        if result is None:
+            return False
+        self.entities, self.store = result
+        return True
+
+    def _parse(self, streaming: bool, progress: ProgressCallback) -> None:
+        diagnostics = self._diagnostics
+        # Without kept paths, geometry stays in SVG pixels until the builder scales it to mm at once
+        builder = GeometryBuilder(self.tolerance, scale=1.0 if self._scale_paths else 25.4 / self.ppi)
+        source = self.iter_entities() if streaming else self._iter_document_entities()
+
+        for entity in source:
+            with diagnostics.stage('parse.flatten'):
+                entity.index = builder.add_path(entity.path, entity.process_type)
+            if not self.keep_paths:
+                entity.path = None
+            self.entities.append(entity)
+            if progress and len(self.entities) % PROGRESS_INTERVAL == 0:
+                progress('entities_parsed', len(self.entities))
+
+        if progress:
+            progress('entities_parsed', len(self.entities))
+            progress('entities_total', len(self.entities))
+        with diagnostics.stage('parse.build_store'):
+            self.store = builder.build()
+        for entity in self.entities:
+            entity.store = self.store
+        diagnostics.count('parse.entities', len(self.entities))
+        diagnostics.count('parse.vertices', len(self.store.vertices))
+
+        self._svg = None
+
+    def _prefiltered_source(self) -> BinaryIO:
+        """
+        The document without shapes that can never be laser operations, so svgelements does not build
+        them: shapes whose own stroke and fill are both explicit colours outside COLOR_MAP (or 'none').
+        Shapes that inherit either value are kept. Documents with a <style> sheet, which may override
+        presentation attributes, are passed through unchanged.
+        """
+        data = self.read_source()
+        with self._diagnostics.stage('parse.prefilter'):
+            root = fromstring(data)
+            removed = 0
+            for parent in root.iter():
+                if parent.tag.rsplit('}', 1)[-1] == 'style':
+                    return io.BytesIO(data)
+                kept = [child for child in parent if not self._never_laser(child)]
+                if len(kept) < len(parent):
+                    removed += len(parent) - len(kept)
+                    parent[:] = kept
+            self._diagnostics.count('parse.prefiltered', removed)
+        return io.BytesIO(tostring(root) if removed else data)
+
+    def _never_laser(self, elem) -> bool:
+        """True for a shape element whose explicit stroke and fill both rule out every COLOR_MAP colour."""
+        if not isinstance(elem.tag, str):
+            # Comments and processing instructions
+            return False
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if tag != 'path' and tag not in self.SHAPE_TAGS:
+            return False
+        paints = {key: elem.get(key) for key in ('stroke', 'fill')}
+        style = elem.get('style')
+        if style:
+            for declaration in style.split(';'):
+                parts = declaration.split(':')
+                if len(parts) == 2 and parts[0].strip() in paints:
+                    paints[parts[0].strip()] = parts[1].strip()
+        return all(self._never_laser_paint(paint) for paint in paints.values())
+
+    def _never_laser_paint(self, paint: Optional[str]) -> bool:
+        if paint is None:
+            return False
+        paint = paint.strip().lower()
+        if paint == 'none':
+            return True
+        if paint.startswith(self.NON_COLOR_PAINTS):
+            return False
+        key = ('paint', paint)
+        if key not in self._color_cache:
+            value = svgelements.Color(paint).value
+            # Unparsable colours are left for svgelements to resolve
+            self._color_cache[key] = value is not None and value >> 8 not in self.COLOR_RGB
+        return self._color_cache[key]
+
+    def _iter_document_entities(self) -> Iterator[LaserEntity]:
+        """Classifies the elements of the fully parsed svgelements document."""
+        diagnostics = self._diagnostics
+        with diagnostics.stage('parse.load'):
+            if self._svg is None:
+                self._svg = svgelements.SVG.parse(self._prefiltered_source())
+            svg = self._svg
         # Iterating through parsed SVG elements
-        for element in self.svg.elements():
+        for element in svg.elements():
             # We are only interested in shapes/paths
             if not isinstance(element, (svgelements.Path, svgelements.Shape)):
                 continue
 
-            # Convert explicit shapes to paths for unified processing
-            if isinstance(element, svgelements.Shape):
-                path = svgelements.Path(element)
-            else:
-                path = element
-            
             # Find the defining color (check stroke first, then fill)
-            process_color = None
-            
-            # Check stroke color
-            if hasattr(element, 'stroke') and isinstance(element.stroke, svgelements.Color) and element.stroke.value is not None:
-                # svgelements Color hex property returns e.g. '#ff0000'
-                hex_val = element.stroke.hex.upper()
-                if hex_val in self.COLOR_MAP:
-                    process_color = hex_val
-            
-            # Check fill color if stroke is not a defined operation color
-            if process_color is None and hasattr(element, 'fill') and isinstance(element.fill, svgelements.Color) and element.fill.value is not None:
-                hex_val = element.fill.hex.upper()
-                if hex_val in self.COLOR_MAP:
-                    process_color = hex_val
-                    
-            # If a valid process color was found, append the entity
+            with diagnostics.stage('parse.classify'):
+                process_color = self._classify(getattr(element, 'stroke', None), getattr(element, 'fill', None))
+            diagnostics.count('parse.elements')
+
+            # If a valid process color was found, emit the entity
+            if process_color:
+                yield self._to_entity(element, process_color)
+            else:
+                diagnostics.count('parse.skipped')
+
+    def iter_entities(self) -> Iterator[LaserEntity]:
+        """
+        Streams the SVG with an incremental XML reader and yields entities as they are classified.
+        Elements whose colour is not in COLOR_MAP are skipped before any path conversion, and
+        finished XML elements are discarded so memory stays flat on very large files.
+
+        Supports inherited presentation attributes, `style` attributes, transforms and the root
+        viewBox. `<use>` references and `<style>` stylesheets need the full document; use `parse()`.
+        """
+        # Same initial values svgelements uses for a document
+        values: Dict[str, Any] = {'color': 'black', 'fill': 'black', 'stroke': 'none'}
+        diagnostics = self._diagnostics
+        stack: List[Dict[str, Any]] = []
+        open_elements = []
+        skip_depth = 0
+        width = height = None
+
+        for event, elem in iterparse(self._open_source(), events=('start', 'end')):
+            if event == 'end':
+                values = stack.pop()
+                if skip_depth:
+                    skip_depth -= 1
+                open_elements.pop()
+                elem.clear()
+                if open_elements:
+                    open_elements[-1].remove(elem)
+                continue
+
+            stack.append(values)
+            open_elements.append(elem)
+            tag = elem.tag.rsplit('}', 1)[-1]
+
+            if skip_depth or tag in self.NON_RENDERED_TAGS:
+                skip_depth += 1
+                continue
+
+            values = self._inherit_values(values, elem.attrib)
+            if values.get('display', '').lower() == 'none':
+                skip_depth += 1
+                continue
+
+            if tag == 'svg':
+                viewport = self._enter_viewport(values, width, height)
+                if viewport is None:
+                    # A zero-sized viewport disables rendering of the whole document
+                    return
+                width, height = viewport
+            elif tag == 'path' or tag in self.SHAPE_TAGS:
+                with diagnostics.stage('parse.classify'):
+                    process_color = self._classify_values(values)
+                diagnostics.count('parse.elements')
+                if not process_color:
+                    diagnostics.count('parse.skipped')
+                    continue
+
+                with diagnostics.stage('parse.shape'):
+                    shape = self._build_shape(tag, values, width, height)
+                if shape is not None:
+                    yield self._to_entity(shape, process_color)
+
+    def _classify(self, stroke: Optional[svgelements.Color], fill: Optional[svgelements.Color]) -> Optional[str]:
+        """Returns the COLOR_MAP key for the stroke, or else the fill, or None."""
+        # Check stroke color, then the fill if the stroke is not a defined operation color
+        if isinstance(stroke, svgelements.Color):
+            process_color = self.COLOR_VALUES.get(stroke.value)
             if process_color:
+                return process_color
+        if isinstance(fill, svgelements.Color):
+            return self.COLOR_VALUES.get(fill.value)
+        return None
+
+    def _classify_values(self, values: Dict[str, Any]) -> Optional[str]:
+        """Classifies resolved presentation values; each distinct colour combination is parsed once."""
+        key = (values.get('stroke'), values.get('stroke-opacity'), values.get('fill'), values.get('fill-opacity'))
+        if key not in self._color_cache:
+            stroke = self._color_from_values(values, 'stroke', 'stroke-opacity')
+            fill = self._color_from_values(values, 'fill', 'fill-opacity')
+            self._color_cache[key] = self._classify(stroke, fill)
+        return self._color_cache[key]
+
+    def _to_entity(self, element: svgelements.Shape, process_color: str) -> LaserEntity:
+        """
+        Converts a classified element into a path in mm units. Inside `parse()` without
+        `keep_paths` the path stays in pixels and the flattened geometry is scaled instead.
+        """
+        with self._diagnostics.stage('parse.convert'):
+            # Convert explicit shapes to paths for unified processing
+            if isinstance(element, svgelements.Path):
+                path = element
+            else:
+                path = svgelements.Path(element)
+
+            if self._scale_paths:
                 # Scale the path to mm units: (pixel_unit * 25.4 / ppi) = mm
                 scale_factor = 25.4 / self.ppi
                 path *= Matrix.scale(scale_factor)
-                
-                # Bake the transformation into the path so length() calculation is accurate
+
+        # Bake the transformation into the path so length() calculation is accurate
+        if not path.transform.is_identity():
+            with self._diagnostics.stage('parse.reify'):
                 path.reify()
-                
-                entity = LaserEntity(
-                    path=path,
-                    color_hex=process_color,
-                    process_type=self.COLOR_MAP[process_color]
-                )
-                self.entities.append(entity)
-                
-        return self.entities
+
+        return LaserEntity(
+            path=path,
+            color_hex=process_color,
+            process_type=self.COLOR_MAP[process_color]
+        )
+
+    def _inherit_values(self, parent: Dict[str, Any], attrib: Dict[str, str]) -> Dict[str, Any]:
+        """Resolves the presentation values of an element the same way svgelements does."""
+        values = dict(parent)
+        for key in self.NON_INHERITED_ATTRIBUTES:
+            values.pop(key, None)
+
+        attributes = dict(attrib)
+        # Inline style declarations take priority over presentation attributes
+        for declaration in attributes.get('style', '').split(';'):
+            parts = declaration.split(':')
+            if len(parts) == 2:
+                attributes[parts[0].strip()] = parts[1].strip()
+
+        for key in ('fill', 'stroke'):
+            if attributes.get(key) == 'currentColor':
+                attributes[key] = attributes.get('color', parent.get('color'))
+
+        if 'transform' in attributes and 'transform' in parent:
+            attributes['transform'] = parent['transform'] + " " + attributes['transform']
+
+        values.update(attributes)
+        values[svgelements.SVG_STRUCT_ATTRIB] = attributes
+        return values
+
+    @staticmethod
+    def _enter_viewport(values: Dict[str, Any], width: Optional[float], height: Optional[float]):
+        """
+        Appends the viewBox transform of an <svg> element to `values`.
+        Returns the (width, height) used for relative lengths, or None if the viewport is empty.
+        """
+        viewport = svgelements.SVG(values)
+        if width is None:
+            width = viewport.viewbox.width if viewport.viewbox is not None else 1000
+        if height is None:
+            height = viewport.viewbox.height if viewport.viewbox is not None else 1000
+
+        viewport.render(ppi=svgelements.DEFAULT_PPI, width=width, height=height, viewbox=viewport.viewbox)
+        width, height = viewport.width, viewport.height
+        if viewport.viewbox is None:
+            return width, height
+
+        if viewport.width == 0 or viewport.height == 0:
+            return None
+        try:
+            transform = viewport.viewbox_transform
+        except ZeroDivisionError:
+            return None
+
+        if 'transform' in values:
+            values['transform'] += " " + transform
+        else:
+            values['transform'] = transform
+        return viewport.viewbox.width, viewport.viewbox.height
+
+    @staticmethod
+    def _color_from_values(values: Dict[str, Any], key: str, opacity_key: str) -> Optional[svgelements.Color]:
+        value = values.get(key)
+        if value is None:
+            return None
+        color = svgelements.Color(value)
+        opacity = values.get(opacity_key)
+        if opacity is not None and color.value is not None:
+            try:
+                color.opacity = float(opacity)
+            except ValueError:
+                pass
+        return color
+
+    def _build_shape(self, tag: str, values: Dict[str, Any], width: float, height: float) -> Optional[svgelements.Shape]:
+        """Builds and renders a single svgelements shape. Returns None for degenerate shapes."""
+        shape = None
+        try:
+            if tag == 'path':
+                # Delayed path parsing keeps the valid prefix of a malformed path
+                shape = svgelements.Path(values, pathd_loaded=True)
+                shape.parse(values.get('d'))
+            else:
+                shape = self.SHAPE_TAGS[tag](values)
+        except ValueError:
+            if shape is None:
+                return None
+
+        shape.render(ppi=svgelements.DEFAULT_PPI, width=width, height=height)
+        shape.reify()
+        if shape.is_degenerate():
+            return None
+        return shape
@@ -0,0 +1,150 @@
+"""
+Warm-start server for the command line: a long-lived local process on a Unix socket that runs
+`src/main.py` requests with the engine already imported and recently parsed files cached, so
+scripts calling the CLI thousands of times do not pay the start-up imports on every call.
+
+    python src/server.py /tmp/laser.sock &
+    python src/main.py drawing.svg --cut_speed 20 ... --server /tmp/laser.sock
+
+The CLI sends its arguments and working directory as one JSON line; the server answers with
+{"out": text} lines as the run writes its output, then {"exit": code}. Requests run one at a
+time, in the caller's working directory, so the output is the same as a local run.
+"""
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from typing import List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+DEFAULT_CACHE_MB = 512
+# Imported before the first request, so no request pays for them
+WARM_MODULES = ('src.main', 'src.batch', 'src.engine.calculator', 'src.parsers.parallel')
+
+
+def forward(socket_path: str, argv: List[str]) -> Optional[int]:
+    """
+    Client side: runs `argv` on the server at `socket_path`, copying its output to stdout.
+    Returns the exit code, or None when no server is listening there.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+
+    with client, client.makefile('rwb') as stream:
+        stream.write(json.dumps({'argv': list(argv), 'cwd': os.getcwd()}).encode() + b'\n')
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if 'exit' in message:
+                return message['exit']
+            sys.stdout.write(message['out'])
+            sys.stdout.flush()
+    print(f"Warm server at {socket_path} closed the connection", file=sys.stderr)
+    return 1
+
+
+class _MessageWriter:
+    """Text stream that forwards every write to the client as an {"out": text} line."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        if text:
+            self.stream.write(json.dumps({'out': text}).encode() + b'\n')
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        from src.main import build_parser, run
+
+        line = self.rfile.readline()
+        if not line:
+            # A connection probe, see `_listening`
+            return
+        request = json.loads(line)
+        out = _MessageWriter(self.wfile)
+        try:
+            os.chdir(request['cwd'])
+            exit_code = run(build_parser().parse_args(request['argv']), out)
+        except SystemExit as e:
+            # The client parsed the same arguments already, so this is not expected
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except BrokenPipeError:
+            return
+        except Exception as e:
+            out.write(json.dumps({"error": f"Warm server failed: {str(e)}"}, indent=2) + '\n')
+            exit_code = 1
+        try:
+            self.wfile.write(json.dumps({'exit': exit_code}).encode() + b'\n')
+        except BrokenPipeError:
+            pass
+
+
+def serve(socket_path: str, cache_bytes: int) -> None:
+    """Imports the engine, enables the parsed-file cache and handles requests until interrupted."""
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+    from src.batch import enable_entity_cache
+
+    enable_entity_cache(cache_bytes)
+    if _listening(socket_path):
+        raise SystemExit(f"A server is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        # Left behind by a server that was killed
+        os.unlink(socket_path)
+
+    # The socket is created owner-only: a chmod after bind would leave it open to other users meanwhile
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(umask)
+    with server:
+        print(f"Listening on {socket_path}", file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+
+def _listening(socket_path: str) -> bool:
+    """Whether a server accepts connections on `socket_path`."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve CLI runs from a warm process on a Unix socket.")
+    parser.add_argument("socket", help="Path of the Unix socket to listen on")
+    parser.add_argument("--cache_mb", type=int, default=DEFAULT_CACHE_MB, help=f"Memory for parsed files kept between runs, in MB (Default = {DEFAULT_CACHE_MB})")
+    args = parser.parse_args()
+    # SIGTERM exits through the socket cleanup of `serve` too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    serve(args.socket, args.cache_mb << 20)
+
+
+if __name__ == "__main__":
+    main()
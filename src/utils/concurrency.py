@@ -0,0 +1,86 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the waiting queue is full."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking work off the event loop on a fixed pool of threads.
+    At most `max_workers` calls run at once and `max_queue` more may wait;
+    anything beyond that is rejected immediately with `ExecutorSaturated`.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="laser-worker")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated()
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(self._call, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _call(self, call: Callable[[], Any]) -> Any:
+        """Runs one call on a worker thread; its slot stays taken until the work itself finishes."""
+        try:
+            return call()
+        finally:
+            self._release()
+
+    def _release_if_cancelled(self, future: Future) -> None:
+        """A call cancelled while still queued never runs, so `_call` cannot free its slot."""
+        if future.cancelled():
+            self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': min(self._in_flight, self.max_workers),
+                'queued': max(self._in_flight - self.max_workers, 0),
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+_process_pools_lock = threading.Lock()
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """One long-lived pool per worker count; spawned workers are safe to start from threaded servers."""
+    with _process_pools_lock:
+        if workers not in _process_pools:
+            _process_pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                          mp_context=multiprocessing.get_context('spawn'))
+        return _process_pools[workers]
@@ -0,0 +1,131 @@
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List
+
+
+class _StageTimer:
+    """Context manager adding its wall time and one call to a stage of `Diagnostics`."""
+    __slots__ = ('diagnostics', 'name', 'started')
+
+    def __init__(self, diagnostics: 'Diagnostics', name: str):
+        self.diagnostics = diagnostics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.diagnostics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Diagnostics:
+    """
+    Opt-in instrumentation of one request: wall time and call count per stage, plus counters
+    such as entity and segment counts. Stage names are dotted by component ('parse.reify',
+    'calculate.order'). Code that is not handed an instance uses `DISABLED`, whose methods do nothing.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}  # name -> [seconds, calls]
+        self.counters: Dict[str, int] = {}
+
+    def stage(self, name: str):
+        """`with diagnostics.stage('parse.load'):` times the block as one call of the stage."""
+        return _StageTimer(self, name)
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def report(self) -> Dict[str, Any]:
+        """JSON-ready `diagnostics` block of a report."""
+        return {
+            'stages': {
+                name: {'seconds': round(seconds, 6), 'calls': int(calls)}
+                for name, (seconds, calls) in self.stages.items()
+            },
+            'counters': dict(self.counters)
+        }
+
+
+class _DisabledDiagnostics(Diagnostics):
+    """Shared no-op instance: one attribute lookup and call per instrumented block."""
+    enabled = False
+    _NO_OP = nullcontext()
+
+    def stage(self, name: str):
+        return self._NO_OP
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        pass
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+
+DISABLED = _DisabledDiagnostics()
+
+
+class MetricsRegistry:
+    """
+    Thread-safe running totals of many `Diagnostics`, rendered in the Prometheus text format.
+    Stages become `<prefix>_stage_seconds_total` and `<prefix>_stage_calls_total` counters labelled
+    by stage; counters become `<prefix>_<name>_total` with dots replaced by underscores.
+    """
+
+    def __init__(self, prefix: str = 'laser'):
+        self.prefix = prefix
+        self._stages: Dict[str, List[float]] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, diagnostics: Diagnostics) -> None:
+        with self._lock:
+            for name, (seconds, calls) in diagnostics.stages.items():
+                entry = self._stages.setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += calls
+            for name, value in diagnostics.counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def render(self, gauges: Dict[str, float] = None, totals: Dict[str, float] = None) -> str:
+        """
+        Prometheus exposition text. `gauges` adds point-in-time values such as cache sizes, `totals`
+        running totals kept elsewhere, such as cache hits, as `<prefix>_<name>_total` counters.
+        """
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        for metric, column, help_text in (
+            ('stage_seconds_total', 0, 'Wall time spent per pipeline stage'),
+            ('stage_calls_total', 1, 'Calls per pipeline stage'),
+        ):
+            name = f"{self.prefix}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{stage="{stage}"}} {_number(entry[column])}' for stage, entry in stages]
+        for counter, value in counters:
+            name = f"{self.prefix}_{counter.replace('.', '_')}_total"
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        for total, value in sorted((totals or {}).items()):
+            name = f"{self.prefix}_{total}_total"
+            lines += [f"# TYPE {name} counter", f"{name} {_number(value)}"]
+        for gauge, value in sorted((gauges or {}).items()):
+            name = f"{self.prefix}_{gauge}"
+            lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,146 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when the client cancelled it."""
+
+
+class JobStoreFull(Exception):
+    """Raised when the store only holds unfinished jobs and cannot accept a new one."""
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    """State of one background estimate, updated by the worker thread."""
+    id: str
+    status: str = QUEUED
+    progress: Dict[str, int] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def report_progress(self, counter: str, value: int) -> None:
+        """`ProgressCallback` handed to the calculation; aborts it once cancellation is requested."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.progress[counter] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == DONE:
+            data['result'] = self.result
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs long estimates on an in-process thread pool and keeps their state for polling.
+
+    The submitted function receives a `progress` keyword argument (see `src.utils.progress`).
+    At most `max_jobs` jobs are stored; finished jobs expire `ttl_seconds` after completion
+    and the oldest finished ones are evicted first when the store is full.
+    """
+
+    def __init__(self, max_workers: int, max_jobs: int, ttl_seconds: float):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="laser-job")
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+        job = Job(id=uuid.uuid4().hex)
+        with self._lock:
+            self._evict_expired()
+            if len(self._jobs) >= self.max_jobs and not self._evict_oldest_finished():
+                raise JobStoreFull()
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Requests cancellation. Queued jobs never start, running ones stop at their next progress report."""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts['max_jobs'] = self.max_jobs
+        return counts
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        try:
+            job.result = fn(*args, progress=job.report_progress, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(getattr(e, 'detail', None) or e)
+            self._finish(job, FAILED)
+        else:
+            self._finish(job, DONE)
+
+    @staticmethod
+    def _finish(job: Job, status: str) -> None:
+        job.finished_at = time.time()
+        job.status = status
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _evict_oldest_finished(self) -> bool:
+        for job_id, job in self._jobs.items():
+            if job.status in FINISHED_STATES:
+                del self._jobs[job_id]
+                return True
+        return False
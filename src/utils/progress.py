@@ -0,0 +1,8 @@
+from typing import Callable, Optional
+
+# Receives a counter name ('entities_parsed', 'entities_total', 'entities_ordered',
+# 'segments_costed') and its current value. It may raise to abort the calculation.
+ProgressCallback = Optional[Callable[[str, int], None]]
+
+# How many items long-running loops process between two progress reports
+PROGRESS_INTERVAL = 1024
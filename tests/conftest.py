@@ -0,0 +1,37 @@
+import pytest
+from svgelements import Path
+from src.parsers.svg_parser import LaserEntity
+from src.engine.calculator import LaserTimeCalculator
+from src.engine.geometry import GeometryBuilder
+
+@pytest.fixture
+def build_store():
+    """Factory of GeometryStores: each path is its SVG data, using `process`, or a (data, process) pair."""
+    def build(*paths, process='cut'):
+        builder = GeometryBuilder()
+        for path in paths:
+            d, path_process = (path, process) if isinstance(path, str) else path
+            builder.add_path(Path(d), path_process)
+        return builder.build()
+    return build
+
+@pytest.fixture
+def sample_entities():
+    """A nested cut, a curved and a tiny mark, and two raster blocks sharing scanlines."""
+    return [
+        LaserEntity(path=Path("M 0 0 H 40 V 40 H 0 Z"), color_hex='#FF0000', process_type='cut'),
+        LaserEntity(path=Path("M 10 10 H 20 V 20 H 10 Z"), color_hex='#FF0000', process_type='cut'),
+        LaserEntity(path=Path("M 50 5 C 60 20 70 -10 80 5"), color_hex='#00FF00', process_type='mark'),
+        LaserEntity(path=Path("M 60 30 L 60.05 30"), color_hex='#00FF00', process_type='mark'),
+        LaserEntity(path=Path("M 50 50 H 70 V 60 H 50 Z"), color_hex='#0000FF', process_type='raster'),
+        LaserEntity(path=Path("M 75 52 H 90 V 58 H 75 Z"), color_hex='#0000FF', process_type='raster'),
+    ]
+
+@pytest.fixture
+def make_calculator():
+    """Factory of calculators with fixed speeds; keyword arguments override any setting."""
+    def make(**overrides):
+        params = dict(cut_speed=10.0, vector_engrave_speed=50.0, raster_engrave_speed=100.0, transit_speed=200.0)
+        params.update(overrides)
+        return LaserTimeCalculator(**params)
+    return make
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from src import api
+from src.utils.concurrency import BoundedExecutor
+from src.engine.timeline import ROW_BYTES
+
+SVG = b"""<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="10" y="10" width="20" height="20" stroke="#FF0000" fill="none" />
+    <circle cx="60" cy="60" r="10" stroke="#00FF00" fill="none" />
+    <rect x="50" y="10" width="30" height="10" fill="#0000FF" />
+</svg>"""
+
+MACHINE = dict(cut_speed=10, vector_engrave_speed=50, raster_engrave_speed=100, transit_speed=200)
+
+@pytest.fixture
+def client():
+    for cache in (api.geometry_cache, api.plan_cache, api.report_cache):
+        cache.clear()
+    return TestClient(api.app)
+
+def upload(content=SVG, name='job.svg'):
+    return {'file': (name, content, 'application/octet-stream')}
+
+def estimate(client, content=SVG, name='job.svg', **fields):
+    return client.post('/api/calculate', files=upload(content, name), data=dict(MACHINE, **fields))
+
+def test_calculate_rejects_bad_uploads_and_parameters(client):
+    assert estimate(client).status_code == 200
+    assert estimate(client, name='job.png').status_code == 400
+    empty = b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"></svg>'
+    assert 'No valid laser operation paths' in estimate(client, content=empty).json()['detail']
+
+    response = estimate(client, cut_speed=0)
+    assert response.status_code == 400
+    assert 'cut_speed' in response.json()['detail']
+    assert 'raster_model' in estimate(client, raster_model='x').json()['detail']
+    assert estimate(client, refine_seconds=api.MAX_REFINE_SECONDS + 1).status_code == 400
+    assert client.post('/api/calculate', files=upload(), data={'cut_speed': 10}).status_code == 422
+
+def test_cache_stats_count_repeated_estimates(client):
+    first = estimate(client).json()
+    stats = client.get('/api/cache/stats').json()
+    assert set(stats) == {'geometry', 'plans', 'reports'}
+    assert stats['reports']['entries'] == 1
+    hits = stats['reports']['hits']
+
+    assert estimate(client).json() == first
+    assert client.get('/api/cache/stats').json()['reports']['hits'] == hits + 1
+
+def test_batch_estimates_every_profile(client):
+    profiles = [dict(MACHINE, name='slow'), dict(MACHINE, cut_speed=20)]
+    response = client.post('/api/calculate/batch', files=upload(), data={'profiles': json.dumps(profiles)})
+    assert response.status_code == 200
+    reports = response.json()['profiles']
+    assert [profile['name'] for profile in reports] == ['slow', 'profile_2']
+    slow, fast = (profile['report']['estimated_total_time_seconds'] for profile in reports)
+    assert fast < slow
+    assert slow == pytest.approx(estimate(client).json()['estimated_total_time_seconds'], abs=0.01)
+
+@pytest.mark.parametrize("profiles, message", [
+    ('not json', 'JSON list'),
+    ('[]', 'non-empty'),
+    (json.dumps([{'cut_speed': 10}]), 'Profile is missing'),
+    (json.dumps([dict(MACHINE, laser_power=1)]), 'Unknown profile fields: laser_power'),
+    (json.dumps([dict(MACHINE, cut_speed='fast')]), 'Invalid profile value for cut_speed'),
+    (json.dumps([dict(MACHINE, transit_speed=-1)]), 'transit_speed'),
+    (json.dumps([dict(MACHINE, merge_raster=True), MACHINE]), 'same merge_raster'),
+])
+def test_batch_rejects_invalid_profiles(client, profiles, message):
+    response = client.post('/api/calculate/batch', files=upload(), data={'profiles': profiles})
+    assert response.status_code == 400
+    assert message in response.json()['detail']
+
+def test_saturated_pool_answers_503(client, monkeypatch):
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    monkeypatch.setattr(api, 'executor', executor)
+    release = threading.Event()
+    busy = threading.Thread(target=asyncio.run, args=(executor.run(release.wait),))
+    busy.start()
+    try:
+        while executor.stats()['running'] == 0:
+            time.sleep(0.01)
+        response = estimate(client)
+    finally:
+        release.set()
+        busy.join()
+        executor.shutdown()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(api.RETRY_AFTER_SECONDS)
+    assert executor.stats()['rejected'] == 1
+
+def test_job_runs_to_a_report(client):
+    response = client.post('/api/jobs', files=upload(), data=MACHINE)
+    assert response.status_code == 202
+    job_id = response.json()['id']
+
+    deadline = time.monotonic() + 30
+    while (state := client.get(f'/api/jobs/{job_id}').json())['status'] not in api.FINISHED_STATES:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert state['status'] == 'done'
+    assert state['result']['estimated_total_time_seconds'] == estimate(client).json()['estimated_total_time_seconds']
+    assert 'max_jobs' in client.get('/api/jobs').json()
+
+    assert client.get('/api/jobs/missing').status_code == 404
+    assert client.delete('/api/jobs/missing').status_code == 404
+    assert client.post('/api/jobs', files=upload(), data=dict(MACHINE, cut_speed=0)).status_code == 400
+
+def test_plan_is_recosted_for_new_speeds(client):
+    response = client.post('/api/plans', files=upload())
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan['entities'] == 3 and not plan['timeline']
+
+    recosted = client.post(f"/api/plans/{plan['plan_id']}/calculate", data=MACHINE)
+    assert recosted.status_code == 200
+    expected = estimate(client).json()['estimated_total_time_seconds']
+    assert recosted.json()['estimated_total_time_seconds'] == expected
+
+    assert client.post('/api/plans/missing/calculate', data=MACHINE).status_code == 404
+    assert client.post(f"/api/plans/{plan['plan_id']}/calculate", data=dict(MACHINE, scan_gap=0)).status_code == 400
+    assert client.post('/api/plans', files=upload(), data={'refine_seconds': -1}).status_code == 400
+
+def test_plan_timeline_formats_and_limits(client):
+    plan_id = client.post('/api/plans', files=upload(), data={'timeline': 'true'}).json()['plan_id']
+    url = f'/api/plans/{plan_id}/timeline'
+
+    binary = client.post(url, data=dict(MACHINE, points=50))
+    assert binary.status_code == 200
+    assert binary.headers['content-type'] == 'application/octet-stream'
+    rows = (len(binary.content) - 24) // ROW_BYTES
+    assert 0 < rows <= 50
+    lines = client.post(url, data=dict(MACHINE, points=50, format='ndjson')).text.splitlines()
+    assert len(lines) == rows
+    assert 'process_type' in json.loads(lines[0])
+
+    assert client.post(url, data=dict(MACHINE, points=0)).status_code == 400
+    assert client.post(url, data=dict(MACHINE, format='csv')).status_code == 400
+    assert client.post('/api/plans/missing/timeline', data=MACHINE).status_code == 404
+    without = client.post('/api/plans', files=upload()).json()['plan_id']
+    assert client.post(f'/api/plans/{without}/timeline', data=MACHINE).status_code == 400
+
+def test_geometry_file_upload_skips_parsing(client):
+    exported = client.post('/api/geometry', files=upload())
+    assert exported.status_code == 200
+    assert 'job.ltg' in exported.headers['content-disposition']
+
+    response = client.post('/api/calculate?diagnostics=true', files=upload(exported.content, 'job.ltg'), data=MACHINE)
+    assert response.status_code == 200
+    report = response.json()
+    assert 'parse.geometry_file' in report['diagnostics']['stages']
+    assert report['estimated_total_time_seconds'] == estimate(client).json()['estimated_total_time_seconds']
+
+    broken = estimate(client, content=exported.content[:len(exported.content) // 2], name='job.ltg')
+    assert broken.status_code == 400
+    assert 'geometry file' in broken.json()['detail']
+
+def test_diagnostics_reach_report_and_metrics(client):
+    report = client.post('/api/calculate?diagnostics=true', files=upload(), data=MACHINE).json()
+    assert 'request' in report['diagnostics']['stages']
+    assert 'diagnostics' not in estimate(client).json()
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    text = response.text
+    assert 'laser_stage_calls_total{stage="request"}' in text
+    assert '# TYPE laser_cache_reports_lookup_hits_total counter' in text
+    assert '# TYPE laser_executor_running gauge' in text
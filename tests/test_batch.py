@@ -0,0 +1,89 @@
+import os
+from src.batch import estimate_file, expand_inputs, run_batch, summarize
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="10" y="10" width="20" height="20" stroke="#FF0000" fill="none" />
+</svg>"""
+
+CALCULATOR_KWARGS = dict(cut_speed=10.0, vector_engrave_speed=50.0, raster_engrave_speed=100.0, transit_speed=200.0)
+
+def write_files(directory, names):
+    for name in names:
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(SVG if name.endswith('.svg') else "not svg")
+
+def test_expand_inputs_handles_globs_and_directories(tmp_path):
+    write_files(tmp_path, ['a.svg', 'b.svg', 'notes.txt'])
+    pattern = os.path.join(tmp_path, '*.svg')
+
+    files = expand_inputs([pattern, str(tmp_path), 'missing.svg'])
+    assert files == [os.path.join(tmp_path, 'a.svg'), os.path.join(tmp_path, 'b.svg'), 'missing.svg']
+
+def test_expand_inputs_keeps_literal_paths_and_geometry_files(tmp_path):
+    write_files(tmp_path, ['part[1].svg', 'b.svg', 'b.ltg', 'c.ltg'])
+    literal = os.path.join(tmp_path, 'part[1].svg')
+
+    assert expand_inputs([literal]) == [literal]
+    assert expand_inputs([str(tmp_path)]) == [os.path.join(tmp_path, name) for name in ('b.svg', 'c.ltg', 'part[1].svg')]
+
+def test_run_batch_reports_failures_inline(tmp_path):
+    write_files(tmp_path, ['a.svg', 'b.svg'])
+    files = [os.path.join(tmp_path, 'a.svg'), os.path.join(tmp_path, 'missing.svg'), os.path.join(tmp_path, 'b.svg')]
+
+    results = list(run_batch(files, 25.4, False, CALCULATOR_KWARGS, workers=2))
+
+    assert sorted(r['file'] for r in results) == sorted(files)
+    failed = [r for r in results if 'error' in r]
+    assert [r['file'] for r in failed] == [files[1]]
+
+    summary = summarize(results, elapsed=1.0)
+    assert summary['files'] == 3
+    assert summary['succeeded'] == 2
+    assert summary['failed'] == 1
+    single = next(r for r in results if 'report' in r)['report']['estimated_total_time_seconds']
+    assert summary['estimated_total_time_seconds'] == round(2 * single, 2)
+
+def crash_on_bad_file(filepath, *arguments):
+    if os.path.basename(filepath) == 'bad.svg':
+        os._exit(9)
+    return estimate_file(filepath, *arguments)
+
+def test_run_batch_survives_a_crashing_worker(tmp_path, monkeypatch):
+    from src import batch
+    monkeypatch.setattr(batch, 'estimate_file', crash_on_bad_file)
+    names = ['a.svg', 'bad.svg', 'b.svg', 'c.svg']
+    write_files(tmp_path, names)
+    files = [os.path.join(tmp_path, name) for name in names]
+
+    results = list(run_batch(files, 25.4, False, CALCULATOR_KWARGS, workers=2))
+
+    assert sorted(r['file'] for r in results) == sorted(files)
+    failed = [r for r in results if 'error' in r]
+    assert [r['file'] for r in failed] == [files[1]]
+    assert 'exited unexpectedly' in failed[0]['error']
+
+def test_save_geometry_then_estimate_from_it(tmp_path):
+    write_files(tmp_path, ["part.svg"])
+    from_svg = estimate_file(str(tmp_path / "part.svg"), 25.4, False, CALCULATOR_KWARGS, save_geometry=True)
+    from_geometry = estimate_file(str(tmp_path / "part.ltg"), 25.4, False, CALCULATOR_KWARGS)
+    assert from_geometry["report"] == from_svg["report"]
+
+def test_entity_cache_reuses_unchanged_files(tmp_path, monkeypatch):
+    from src import batch
+    from src.batch import enable_entity_cache, load_file_entities
+    from src.utils.diagnostics import Diagnostics
+    monkeypatch.setattr(batch, '_entity_cache', None)
+    write_files(tmp_path, ['a.svg'])
+    filepath = os.path.join(tmp_path, 'a.svg')
+
+    cache = enable_entity_cache(1 << 20)
+    first = load_file_entities(filepath, 25.4, False)
+    diagnostics = Diagnostics()
+    assert load_file_entities(filepath, 25.4, False, diagnostics=diagnostics) is first
+    assert diagnostics.counters['cache.geometry_hits'] == 1
+    # Other parse settings and changed files are parsed again
+    assert load_file_entities(filepath, 96.0, False) is not first
+    with open(filepath, 'w') as f:
+        f.write(SVG.replace('</svg>', '<circle cx="50" cy="50" r="5" stroke="#FF0000" fill="none" /></svg>'))
+    assert len(load_file_entities(filepath, 25.4, False)) == 2
+    assert len(cache) == 3
@@ -0,0 +1,31 @@
+from src.utils.cache import LRUCache
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=30, sizeof=len)
+    cache.put('a', 'x' * 10)
+    cache.put('b', 'x' * 10)
+    cache.put('c', 'x' * 10)
+    assert cache.get('a') is not None   # 'a' becomes most recent
+    cache.put('d', 'x' * 10)            # evicts 'b'
+
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] == 30
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+def test_lru_cache_skips_oversized_values():
+    cache = LRUCache(max_bytes=5, sizeof=len)
+    cache.put('big', 'x' * 10)
+    assert cache.get('big') is None
+    assert len(cache) == 0
+
+def test_lru_cache_replaces_existing_key():
+    cache = LRUCache(max_bytes=100, sizeof=len)
+    cache.put('a', 'x' * 10)
+    cache.put('a', 'x' * 20)
+    assert cache.stats()['bytes'] == 20
+    assert len(cache) == 1
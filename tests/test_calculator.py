@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from svgelements import Path
 from src.parsers.svg_parser import LaserEntity
@@ -43,9 +44,25 @@ def test_calculate_raster_time(calculator):
     # base_time = 1 * 500 = 500s
     # overscan = 500 * 0.1 = 50s
     # total = 550s
+    calculator.raster_model = 'bbox'
     time = calculator.calculate_entity_time(entity)
     assert time == pytest.approx(550.0, 0.1)
 
+def test_calculate_scanline_raster_time(calculator):
+    path = Path("M 0 0 L 100 0 L 100 50 L 0 50 Z")
+    entity = LaserEntity(path=path, color_hex='#0000FF', process_type='raster')
+
+    # 500 lines of 100 mm at 100 mm/s, plus 2 * 100 / 500 = 0.4s of ramps per line
+    time = calculator.calculate_entity_time(entity)
+    assert time == pytest.approx(700.0, rel=1e-9)
+
+def test_scanline_raster_skips_empty_area(calculator):
+    # A triangle fills half of its bounding box
+    path = Path("M 0 0 L 100 0 L 0 50 Z")
+    entity = LaserEntity(path=path, color_hex='#0000FF', process_type='raster')
+    time = calculator.calculate_entity_time(entity)
+    assert time == pytest.approx(250.0 + 500 * 0.4, rel=1e-6)
+
 def test_calculate_total_job(calculator):
     # Mix of entities
     p1 = Path("M 0 0 L 10 0") # Length 10
@@ -61,3 +78,80 @@ def test_calculate_total_job(calculator):
     assert result['estimated_total_time_seconds'] == pytest.approx(1.2, 0.1)
     assert result['layer_breakdown']['cut']['time'] == pytest.approx(1.0, 0.1)
     assert result['layer_breakdown']['mark']['time'] == pytest.approx(0.2, 0.1)
+
+def test_calculate_batch_matches_individual_reports():
+    square = LaserEntity(path=Path("M 5 5 L 105 5 L 105 105 L 5 105 Z"), color_hex='#FF0000', process_type='cut')
+    line = LaserEntity(path=Path("M 200 0 L 250 0"), color_hex='#00FF00', process_type='mark')
+    block = LaserEntity(path=Path("M 0 200 L 40 200 L 40 220 L 0 220 Z"), color_hex='#0000FF', process_type='raster')
+    entities = [square, line, block]
+    parameter_sets = [
+        dict(cut_speed=10.0, vector_engrave_speed=50.0, raster_engrave_speed=100.0, transit_speed=200.0),
+        dict(cut_speed=25.0, vector_engrave_speed=80.0, raster_engrave_speed=300.0, transit_speed=400.0,
+             acceleration=1500.0, junction_delay=0.01, scan_gap=0.05),
+    ]
+
+    reports = LaserTimeCalculator.calculate_batch(entities, parameter_sets)
+
+    assert len(reports) == 2
+    for params, report in zip(parameter_sets, reports):
+        assert report == LaserTimeCalculator(**params).calculate_total_job(entities)
+
+def test_merge_raster_reports_merged_and_per_entity_time(calculator):
+    blocks = [
+        LaserEntity(path=Path("M 0 0 L 10 0 L 10 5 L 0 5 Z"), color_hex='#0000FF', process_type='raster'),
+        LaserEntity(path=Path("M 12 0 L 22 0 L 22 5 L 12 5 Z"), color_hex='#0000FF', process_type='raster'),
+    ]
+    separate = calculator.calculate_total_job(blocks)
+    calculator.merge_raster = True
+    merged = calculator.calculate_total_job(blocks)
+
+    raster = merged['layer_breakdown']['raster']
+    assert raster['bands'] == 1
+    assert raster['sweeps'] == 50
+    assert raster['per_entity_time'] == pytest.approx(separate['layer_breakdown']['raster']['time'])
+    assert raster['time'] < raster['per_entity_time']
+    # Only one transit, to the corner of the shared band
+    assert merged['total_distance_transit_mm'] == pytest.approx(0.0)
+
+def test_refine_seconds_reports_shorter_transit(calculator):
+    entities = [
+        LaserEntity(path=Path("M 0 0 L 10 0"), color_hex='#FF0000', process_type='cut'),
+        LaserEntity(path=Path("M 30 0 L 12 0"), color_hex='#FF0000', process_type='cut'),
+    ]
+    plain = calculator.calculate_total_job(entities)
+    assert 'transit_refinement' not in plain
+
+    calculator.refine_seconds = 1.0
+    refined = calculator.calculate_total_job(entities)
+    stats = refined['transit_refinement']
+    assert stats['distance_before_mm'] == pytest.approx(20.0)
+    assert stats['distance_after_mm'] == pytest.approx(2.0)
+    assert refined['total_distance_transit_mm'] == pytest.approx(2.0)
+    assert refined['total_distance_burned_mm'] == pytest.approx(plain['total_distance_burned_mm'])
+    assert refined['estimated_total_time_seconds'] < plain['estimated_total_time_seconds']
+
+def test_report_lists_containment_and_cuts_holes_first(calculator):
+    entities = [
+        LaserEntity(path=Path("M 0 0 H 40 V 40 H 0 Z"), color_hex='#FF0000', process_type='cut'),
+        LaserEntity(path=Path("M 30 30 H 35 V 35 H 30 Z"), color_hex='#FF0000', process_type='cut'),
+    ]
+    report = calculator.calculate_total_job(entities)
+    assert report['containment'] == {'nested_entities': 1, 'max_depth': 1, 'parents': [[1, 0]]}
+    # The hole is cut first: 0 -> (30, 30) -> back to the outline at (0, 0)
+    assert report['total_distance_transit_mm'] == pytest.approx(2 * 30 * np.sqrt(2), abs=0.01)
+
+@pytest.mark.parametrize("scan_gap", [0.0, -0.1, float('nan')])
+def test_rejects_non_positive_scan_gap(scan_gap):
+    with pytest.raises(ValueError, match="scan_gap"):
+        LaserTimeCalculator(10.0, 50.0, 100.0, 200.0, scan_gap=scan_gap)
+
+@pytest.mark.parametrize("overrides", [{'cut_speed': 0.0}, {'transit_speed': -1.0}, {'acceleration': 0.0}])
+def test_rejects_non_positive_speeds(overrides):
+    params = dict(cut_speed=10.0, vector_engrave_speed=50.0, raster_engrave_speed=100.0, transit_speed=200.0)
+    with pytest.raises(ValueError, match=next(iter(overrides))):
+        LaserTimeCalculator(**dict(params, **overrides))
+
+def test_overscan_factor_only_applies_to_bbox(make_calculator):
+    with pytest.raises(ValueError, match="overscan_factor"):
+        make_calculator(overscan_factor=0.3)
+    assert make_calculator(raster_model='bbox', overscan_factor=0.3).overscan_factor == 0.3
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from svgelements import Circle, Path
+from src.parsers.svg_parser import LaserEntity
+from src.engine.calculator import LaserTimeCalculator
+from src.engine.clustering import ClusteredOptimizer, _boundary_point, nearest_neighbour_dense, transit_distance
+from src.engine.optimizer import nearest_neighbour_reference
+
+def dot_field(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 500, size=(count, 2))
+    ends = starts + 0.1
+    return starts, ends, np.ones(count, dtype=bool)
+
+def test_dense_tour_matches_reference():
+    starts, ends, valid = dot_field(200, seed=3)
+    parents = np.full(200, -1)
+    parents[:50] = np.arange(150, 200)
+    expected = nearest_neighbour_reference(starts, ends, valid, parents=parents)
+    assert nearest_neighbour_dense(starts, ends, parents).tolist() == expected
+
+def test_clustered_tour_visits_everything_in_precedence_order():
+    starts, ends, valid = dot_field(3000)
+    valid[[7, 11]] = False
+    rng = np.random.default_rng(1)
+    # Parents anywhere on the sheet, often in another cluster than their children
+    parents = np.where(rng.random(3000) < 0.3, rng.integers(0, 3000, size=3000), -1)
+    parents = np.where((parents > np.arange(3000)) & valid & valid[parents], parents, -1)
+
+    tour = ClusteredOptimizer(cluster_size=100).order(starts, ends, valid, parents=parents)
+    assert sorted(tour.order.tolist()) == list(range(3000))
+    assert tour.order[:2].tolist() == [7, 11]
+    position = np.empty(3000, dtype=np.int64)
+    position[tour.order] = np.arange(3000)
+    nested = parents >= 0
+    assert (position[nested] < position[parents[nested]]).all()
+
+
+def test_clustered_tour_stays_close_to_flat_tour():
+    starts, ends, valid = dot_field(3000)
+    tour = ClusteredOptimizer(cluster_size=100, compare=True).order(starts, ends, valid)
+    assert tour.clusters > 10
+    assert tour.distance == pytest.approx(transit_distance(starts, ends, valid, tour.order))
+    stats = tour.stats()
+    assert stats['flat_distance_mm'] > 0
+    assert stats['distance_overhead_percent'] < 20
+
+def test_cells_are_entered_from_their_shared_boundary():
+    left = (np.array([0.0, 0.0]), np.array([10.0, 10.0]))
+    right = (np.array([10.0, 0.0]), np.array([20.0, 10.0]))
+    above_right = (np.array([30.0, 20.0]), np.array([40.0, 30.0]))
+    assert _boundary_point(left, right) == (10.0, 5.0)
+    assert _boundary_point(right, left) == (10.0, 5.0)
+    assert _boundary_point(left, above_right) == (30.0, 20.0)
+
+def test_clustered_order_does_not_depend_on_workers():
+    starts, ends, valid = dot_field(2000, seed=2)
+    serial = ClusteredOptimizer(cluster_size=100).order(starts, ends, valid)
+    parallel = ClusteredOptimizer(cluster_size=100, workers=2).order(starts, ends, valid)
+    assert parallel.order.tolist() == serial.order.tolist()
+
+def test_calculator_reports_clustering():
+    rng = np.random.default_rng(4)
+    entities = [LaserEntity(path=Path(Circle(x, y, 0.5)), color_hex='#FF0000', process_type='cut')
+                for x, y in rng.uniform(0, 200, size=(400, 2))]
+    flat = LaserTimeCalculator(10.0, 50.0, 100.0, 200.0).calculate_total_job(entities)
+    calculator = LaserTimeCalculator(10.0, 50.0, 100.0, 200.0, cluster_size=50, cluster_compare=True)
+    report = calculator.calculate_total_job(entities)
+
+    section = report['transit_clustering']
+    assert section['clusters'] >= 4
+    assert section['flat_distance_mm'] == pytest.approx(flat['total_distance_transit_mm'], abs=0.01)
+    assert section['distance_mm'] == pytest.approx(report['total_distance_transit_mm'], abs=0.01)
+    assert report['total_distance_burned_mm'] == pytest.approx(flat['total_distance_burned_mm'])
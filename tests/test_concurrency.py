@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import pytest
+from src.utils.concurrency import BoundedExecutor, ExecutorSaturated
+
+def test_bounded_executor_rejects_over_limit():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert executor.stats()['running'] == 1
+        assert executor.stats()['queued'] == 1
+
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(release.wait)
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return await executor.run(lambda x: x * 2, 21)
+
+    assert asyncio.run(scenario()) == 42
+    stats = executor.stats()
+    assert stats['rejected'] == 1
+    assert stats['completed'] == 3
+    executor.shutdown()
+
+def test_cancelled_request_keeps_slot_until_work_finishes():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        # The running call still occupies its worker; the queued one never starts
+        stats = executor.stats()
+        release.set()
+        for _ in range(100):
+            if executor.stats()['running'] == 0:
+                break
+            await asyncio.sleep(0.01)
+        return stats, executor.stats()
+
+    try:
+        cancelled, finished = asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+    assert (cancelled['running'], cancelled['queued']) == (1, 0)
+    assert finished['running'] == 0
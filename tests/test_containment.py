@@ -0,0 +1,54 @@
+import numpy as np
+from src.engine.containment import BoxTree, build_containment, closed_cuts
+
+def test_box_tree_matches_brute_force():
+    rng = np.random.default_rng(3)
+    low = rng.uniform(0, 100, size=(500, 2))
+    boxes = np.hstack([low, low + rng.uniform(0, 40, size=(500, 2))])
+    queries = boxes[:200]
+
+    query, item = BoxTree(boxes, fanout=4).containing(queries)
+    found = set(zip(query.tolist(), item.tolist()))
+    expected = {
+        (q, i) for q in range(len(queries)) for i in range(len(boxes))
+        if (boxes[i, :2] <= queries[q, :2]).all() and (boxes[i, 2:] >= queries[q, 2:]).all()
+    }
+    assert found == expected
+
+def test_closed_cuts_require_every_ring_closed(build_store):
+    store = build_store(
+        ("M 0 0 L 10 0 L 10 10 Z M 2 2 L 4 2 L 4 4 Z", 'cut'),
+        ("M 0 0 L 10 0 L 10 10 Z M 2 2 L 4 2", 'cut'),
+        ("M 0 0 L 10 0 L 10 10 Z", 'mark'),
+    )
+    assert closed_cuts(store, np.arange(3)).tolist() == [True, False, False]
+
+def test_hierarchy_picks_innermost_contour(build_store):
+    store = build_store(
+        ("M 0 0 H 100 V 100 H 0 Z", 'cut'),       # sheet
+        ("M 10 10 H 40 V 40 H 10 Z", 'cut'),      # part
+        ("M 20 20 H 25 V 25 H 20 Z", 'cut'),      # hole in the part
+        ("M 30 12 L 35 12", 'mark'),              # engraving on the part
+        ("M 60 60 H 70 V 70 H 60 Z", 'cut'),      # second part
+        ("M 200 0 H 210 V 10 H 200 Z", 'cut'),    # outside the sheet
+    )
+    hierarchy = build_containment(store, np.arange(6))
+    assert hierarchy.parents.tolist() == [-1, 0, 1, 1, 0, -1]
+    assert hierarchy.depth.tolist() == [0, 1, 2, 2, 1, 0]
+
+    report = hierarchy.report(np.array([10, 11, 12, 13, 14, 15]))
+    assert report['nested_entities'] == 4
+    assert report['max_depth'] == 2
+    assert report['parents'] == [[11, 10], [12, 11], [13, 11], [14, 10]]
+
+def test_hierarchy_uses_polygon_not_bbox(build_store):
+    # The square sits inside the L-shape's bbox but outside the shape; the hole of a
+    # compound outline is not part of it either
+    store = build_store(
+        ("M 0 0 H 30 V 10 H 10 V 30 H 0 Z", 'cut'),
+        ("M 20 20 H 25 V 25 H 20 Z", 'cut'),
+        ("M 100 0 H 150 V 50 H 100 Z M 110 10 H 140 V 40 H 110 Z", 'cut'),
+        ("M 120 20 H 125 V 25 H 120 Z", 'cut'),
+    )
+    hierarchy = build_containment(store, np.arange(4))
+    assert hierarchy.parents.tolist() == [-1, -1, -1, -1]
@@ -0,0 +1,68 @@
+import pytest
+from src.engine.calculator import LaserTimeCalculator
+from src.parsers.svg_parser import SVGParser
+from src.utils.diagnostics import DISABLED, Diagnostics, MetricsRegistry
+
+SVG = b"""<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="10" y="10" width="20" height="20" stroke="#FF0000" fill="none" />
+    <circle cx="50" cy="50" r="10" stroke="#00FF00" fill="none" />
+    <line x1="0" y1="0" x2="100" y2="100" stroke="#000000" />
+</svg>"""
+
+def test_diagnostics_accumulate_stages_and_counters():
+    diagnostics = Diagnostics()
+    for _ in range(3):
+        with diagnostics.stage('parse.reify'):
+            pass
+    diagnostics.count('parse.entities', 5)
+    diagnostics.count('parse.entities', 2)
+
+    report = diagnostics.report()
+    assert report['stages']['parse.reify']['calls'] == 3
+    assert report['stages']['parse.reify']['seconds'] >= 0
+    assert report['counters'] == {'parse.entities': 7}
+
+    # The shared disabled instance records nothing
+    with DISABLED.stage('parse'):
+        DISABLED.count('parse.entities')
+    assert not DISABLED.enabled
+    assert DISABLED.stages == {} and DISABLED.counters == {}
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_report_includes_parse_and_calculate_diagnostics(streaming):
+    diagnostics = Diagnostics()
+    entities = SVGParser(SVG, ppi=25.4).parse(streaming=streaming, diagnostics=diagnostics)
+    calculator = LaserTimeCalculator(cut_speed=10, vector_engrave_speed=50, raster_engrave_speed=100,
+                                     transit_speed=200)
+    report = calculator.calculate_total_job(entities, diagnostics=diagnostics)
+
+    block = report['diagnostics']
+    for stage in ('parse', 'parse.classify', 'parse.flatten', 'calculate', 'calculate.order', 'calculate.evaluate'):
+        assert stage in block['stages']
+    assert block['stages']['parse.classify']['calls'] == 3
+    assert block['counters']['parse.elements'] == 3
+    assert block['counters']['parse.skipped'] == 1
+    assert block['counters']['parse.entities'] == 2
+    assert block['counters']['calculate.segments'] > 0
+
+    # Without diagnostics the report is unchanged
+    plain = calculator.calculate_total_job(SVGParser(SVG, ppi=25.4).parse(streaming=streaming))
+    assert 'diagnostics' not in plain
+    assert plain['estimated_total_time_seconds'] == report['estimated_total_time_seconds']
+
+def test_metrics_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    for _ in range(2):
+        diagnostics = Diagnostics()
+        diagnostics.add_time('calculate.order', 0.5)
+        diagnostics.count('parse.entities', 10)
+        registry.observe(diagnostics)
+
+    text = registry.render({'cache_reports_entries': 3}, {'cache_reports_lookup_hits': 7})
+    assert '# TYPE laser_stage_seconds_total counter' in text
+    assert 'laser_stage_seconds_total{stage="calculate.order"} 1.0' in text
+    assert 'laser_stage_calls_total{stage="calculate.order"} 2' in text
+    assert 'laser_parse_entities_total 20' in text
+    assert 'laser_cache_reports_entries 3' in text
+    assert '# TYPE laser_cache_reports_lookup_hits_total counter' in text
+    assert 'laser_cache_reports_lookup_hits_total 7' in text
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from svgelements import Path
+from src.parsers.svg_parser import LaserEntity, SVGParser
+from src.engine.geometry import (
+    GeometryBuilder, GeometryStore, VERTEX_MOVE, VERTEX_JUNCTION, curve_cache, flatten_curve, flatten_path
+)
+
+def test_flatten_path_lines():
+    path = Path("M 0 0 L 100 0 L 100 100 L 0 100 Z")
+    vertices, flags, lengths = flatten_path(path)
+    assert vertices.shape == (5, 2)
+    assert flags[0] == VERTEX_MOVE
+    assert all(flags[1:] == VERTEX_JUNCTION)
+    assert lengths.sum() == pytest.approx(400.0)
+
+def test_flatten_path_curve_keeps_exact_length():
+    path = Path("M 0 0 C 10 20 30 20 40 0 A 15 10 30 0 1 70 10")
+    vertices, flags, lengths = flatten_path(path, tolerance=0.05)
+    assert (flags == VERTEX_JUNCTION).sum() == 2
+    assert lengths.sum() == pytest.approx(path.length(), rel=1e-9)
+    assert vertices[-1].tolist() == pytest.approx([70, 10])
+
+def test_flatten_curve_is_adaptive_within_tolerance():
+    curve = Path("M 0 0 C 10 20 30 20 40 0")[1]
+    coarse, _ = flatten_curve(curve, tolerance=0.1)
+    fine, _ = flatten_curve(curve, tolerance=0.001)
+    assert len(fine) > len(coarse)
+
+    # The true curve never strays further than the tolerance from the chords
+    polyline = np.vstack([[0.0, 0.0], coarse])
+    dense = np.array(curve.npoint(np.linspace(0, 1, 501)))
+    a, b = polyline[:-1], polyline[1:]
+    for point in dense:
+        t = np.clip(((point - a) * (b - a)).sum(axis=1) / ((b - a) ** 2).sum(axis=1), 0, 1)
+        assert np.hypot(*(a + t[:, None] * (b - a) - point).T).min() <= 0.1
+
+def test_flatten_curve_reuses_translated_copies():
+    curve_cache.clear()
+    # Hit counts survive clear(), so compare against the count before the lookups
+    hits = curve_cache.stats()['hits']
+    first, first_lengths = flatten_curve(Path("M 0 0 Q 5 10 10 0")[1])
+    moved, moved_lengths = flatten_curve(Path("M 100 50 Q 105 60 110 50")[1])
+    assert curve_cache.stats()['hits'] == hits + 1
+    assert np.allclose(moved - first, [100, 50])
+    assert np.array_equal(moved_lengths, first_lengths)
+
+def test_store_offsets_and_endpoints():
+    builder = GeometryBuilder()
+    builder.add_path(Path("M 0 0 L 10 0"), 'cut')
+    builder.add_path(Path("M 5 5 L 5 15 L 15 15"), 'mark')
+    builder.add_path(Path(""), 'raster')
+    store = builder.build()
+
+    assert len(store) == 3
+    assert list(store.entity_offsets) == [0, 2, 5, 5]
+    starts, ends, valid = store.endpoints()
+    assert starts.tolist() == [[0, 0], [5, 5], [0, 0]]
+    assert ends.tolist() == [[10, 0], [15, 15], [0, 0]]
+    assert valid.tolist() == [True, True, False]
+    assert store.entity_length(1) == pytest.approx(20.0)
+
+def test_for_entities_reuses_shared_store():
+    builder = GeometryBuilder()
+    builder.add_path(Path("M 0 0 L 10 0"), 'cut')
+    builder.add_path(Path("M 0 0 L 0 10"), 'cut')
+    store = builder.build()
+    entities = [LaserEntity(path=None, color_hex='#FF0000', process_type='cut', store=store, index=i)
+                for i in (1, 0)]
+
+    shared, indices = GeometryStore.for_entities(entities)
+    assert shared is store
+    assert list(indices) == [1, 0]
+
+    # Mixing in a path-only entity packs everything into a new store
+    extra = LaserEntity(path=Path("M 1 1 L 2 2"), color_hex='#FF0000', process_type='cut')
+    packed, indices = GeometryStore.for_entities(entities + [extra])
+    assert packed is not store
+    assert list(indices) == [0, 1, 2]
+    assert np.allclose(packed.endpoints()[1], [[0, 10], [10, 0], [2, 2]])
+
+def test_oriented_reverses_and_rotates_single_run_entities():
+    builder = GeometryBuilder()
+    builder.add_path(Path("M 0 0 L 10 0 L 10 5"), 'cut')
+    builder.add_path(Path("M 0 0 L 4 0 L 4 4 L 0 4 Z"), 'mark')
+    builder.add_path(Path("M 0 0 L 1 0 M 5 5 L 6 5"), 'cut')
+    store = builder.build()
+
+    reversible, closed = store.orientability(np.arange(3))
+    assert reversible.tolist() == [True, True, False]
+    assert closed.tolist() == [False, True, False]
+
+    oriented = store.oriented(np.arange(3), np.array([True, False, False]), np.array([0, 2, 0]))
+    starts, ends, _ = oriented.endpoints()
+    assert starts[:2].tolist() == [[10, 5], [4, 4]]
+    assert ends[:2].tolist() == [[0, 0], [4, 4]]
+    assert oriented.segment_lengths[:3].tolist() == [0, 5, 10]
+    assert oriented.entity_length(1) == pytest.approx(16.0)
+    assert np.array_equal(oriented.vertices[oriented.entity_slice(2)], store.vertices[store.entity_slice(2)])
+
+@pytest.mark.parametrize("tolerance", [0.0, -1.0, float('nan')])
+def test_builder_and_parser_reject_non_positive_tolerance(tolerance):
+    with pytest.raises(ValueError, match="tolerance"):
+        GeometryBuilder(tolerance)
+    with pytest.raises(ValueError, match="tolerance"):
+        SVGParser(b'<svg xmlns="http://www.w3.org/2000/svg"/>', tolerance=tolerance)
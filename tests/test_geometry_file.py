@@ -0,0 +1,88 @@
+import io
+import os
+import numpy as np
+import pytest
+from src.parsers.svg_parser import SVGParser
+from src.parsers.geometry_file import (
+    GeometryFileError, HEADER_SIZE, load_entities, read_geometry, write_geometry
+)
+from src.engine.calculator import LaserTimeCalculator
+from src.engine.geometry import GeometryStore
+
+SVG = """<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="10" y="10" width="60" height="60" stroke="#FF0000" fill="none" />
+    <circle cx="40" cy="40" r="10" stroke="#FF0000" fill="none" />
+    <path d="M 75 10 C 85 30 95 -10 99 10" stroke="#00FF00" fill="none" />
+    <polygon points="70,70 90,70 80,90" stroke="none" fill="#0000FF" />
+</svg>
+"""
+
+@pytest.fixture
+def parsed(tmp_path):
+    svg_file = os.path.join(tmp_path, "job.svg")
+    with open(svg_file, 'w') as f:
+        f.write(SVG)
+    parser = SVGParser(svg_file, ppi=25.4)
+    entities = parser.parse()
+    geometry_file = os.path.join(tmp_path, "job.ltg")
+    write_geometry(parser.store, geometry_file, parser.ppi, parser.tolerance)
+    return parser, entities, geometry_file
+
+def test_round_trip_matches_parser_output(parsed):
+    parser, entities, geometry_file = parsed
+    loaded = read_geometry(geometry_file)
+    assert isinstance(loaded.store.vertices, np.memmap)
+    assert (loaded.ppi, loaded.tolerance) == (parser.ppi, parser.tolerance)
+    for name in GeometryStore.__slots__:
+        assert np.array_equal(getattr(loaded.store, name), getattr(parser.store, name))
+
+    reloaded = load_entities(geometry_file)
+    assert [(e.color_hex, e.process_type, e.index) for e in reloaded] == \
+           [(e.color_hex, e.process_type, e.index) for e in entities]
+    calculator = LaserTimeCalculator(cut_speed=10.0, vector_engrave_speed=50.0,
+                                     raster_engrave_speed=100.0, transit_speed=200.0)
+    assert calculator.calculate_total_job(reloaded) == calculator.calculate_total_job(entities)
+
+def test_loads_from_memory_buffer(parsed):
+    parser, _, geometry_file = parsed
+    with open(geometry_file, 'rb') as f:
+        loaded = read_geometry(f.read())
+    assert np.array_equal(loaded.store.bboxes, parser.store.bboxes)
+
+def test_rejects_corrupt_truncated_and_foreign_files(parsed, tmp_path):
+    _, _, geometry_file = parsed
+    with open(geometry_file, 'rb') as f:
+        content = bytearray(f.read())
+
+    corrupt = bytearray(content)
+    corrupt[HEADER_SIZE] ^= 0xFF
+    with pytest.raises(GeometryFileError, match="checksum"):
+        read_geometry(bytes(corrupt))
+    # Skipping verification maps the file as it is
+    read_geometry(bytes(corrupt), verify=False)
+
+    with pytest.raises(GeometryFileError, match="Truncated"):
+        read_geometry(bytes(content[:-64]))
+    newer = bytearray(content)
+    newer[8] = 99
+    with pytest.raises(GeometryFileError, match="version"):
+        read_geometry(bytes(newer))
+    with pytest.raises(GeometryFileError):
+        read_geometry(SVG.encode())
+
+@pytest.mark.parametrize("name, tamper", [
+    ('process_codes', lambda a: a.__setitem__(0, 9)),
+    ('entity_offsets', lambda a: a.__setitem__(-1, a[-1] + 100)),
+    ('entity_offsets', lambda a: a.__setitem__(0, 1)),
+    ('entity_offsets', lambda a: a.__setitem__(2, a[1] - 1)),
+    ('bboxes', lambda a: a.__setitem__((0, 0), np.nan)),
+])
+def test_rejects_malformed_files_with_valid_checksum(parsed, name, tamper):
+    parser, _, _ = parsed
+    arrays = {slot: np.array(getattr(parser.store, slot)) for slot in GeometryStore.__slots__}
+    tamper(arrays[name])
+    buffer = io.BytesIO()
+    write_geometry(GeometryStore(**arrays), buffer, parser.ppi, parser.tolerance)
+    with pytest.raises(GeometryFileError, match="Malformed"):
+        read_geometry(buffer.getvalue())
@@ -0,0 +1,65 @@
+import threading
+import time
+from src.utils.jobs import JobManager, DONE, FAILED, CANCELLED
+
+def wait_finished(manager, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job.finished_at is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+def test_job_reports_progress_and_result():
+    manager = JobManager(max_workers=1, max_jobs=10, ttl_seconds=60)
+
+    def work(value, progress=None):
+        progress('entities_parsed', 3)
+        progress('entities_ordered', 3)
+        return value * 2
+
+    job = wait_finished(manager, manager.submit(work, 21).id)
+    assert job.status == DONE
+    assert job.result == 42
+    assert job.to_dict()['progress'] == {'entities_parsed': 3, 'entities_ordered': 3}
+    manager.shutdown()
+
+def test_running_job_stops_at_next_progress_report():
+    manager = JobManager(max_workers=1, max_jobs=10, ttl_seconds=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def work(progress=None):
+        started.set()
+        release.wait()
+        progress('entities_ordered', 1)
+        return 'finished'
+
+    job = manager.submit(work)
+    started.wait()
+    manager.cancel(job.id)
+    release.set()
+    assert wait_finished(manager, job.id).status == CANCELLED
+    manager.shutdown()
+
+def test_failed_job_keeps_error_message():
+    manager = JobManager(max_workers=1, max_jobs=10, ttl_seconds=60)
+
+    def work(progress=None):
+        raise ValueError("broken svg")
+
+    job = wait_finished(manager, manager.submit(work).id)
+    assert job.status == FAILED
+    assert job.to_dict()['error'] == "broken svg"
+    manager.shutdown()
+
+def test_finished_jobs_expire_and_are_evicted_when_full():
+    manager = JobManager(max_workers=1, max_jobs=1, ttl_seconds=0.05)
+    first = wait_finished(manager, manager.submit(lambda progress=None: 1).id)
+    # The store is full, but the finished job makes room for the new one
+    second = wait_finished(manager, manager.submit(lambda progress=None: 2).id)
+    assert manager.get(first.id) is None
+    time.sleep(0.1)
+    assert manager.get(second.id) is None
+    manager.shutdown()
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from svgelements import Path
+from src.parsers.svg_parser import LaserEntity
+from src.engine.calculator import LaserTimeCalculator
+from src.engine.geometry import GeometryStore
+from src.engine.kinematics import KinematicsEngine, flatten_job
+
+@pytest.fixture
+def calculator():
+    return LaserTimeCalculator(
+        cut_speed=10.0,
+        vector_engrave_speed=50.0,
+        raster_engrave_speed=100.0,
+        transit_speed=200.0,
+        acceleration=500.0,
+        junction_model='constant'
+    )
+
+def mixed_job(count: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    kinds = [('#FF0000', 'cut'), ('#00FF00', 'mark'), ('#0000FF', 'raster')]
+    entities = []
+    for _ in range(count):
+        x, y = rng.uniform(0, 300, size=2)
+        w, h = rng.uniform(0.5, 40, size=2)
+        color, process = kinds[rng.integers(len(kinds))]
+        d = (f"M {x} {y} L {x + w} {y} Q {x + w + 5} {y + h / 2} {x + w} {y + h} "
+             f"C {x + w / 2} {y + h + 3} {x} {y + h} {x} {y} Z M {x + 1} {y + 1} L {x + 2} {y + 2}")
+        entities.append(LaserEntity(path=Path(d), color_hex=color, process_type=process))
+    return entities
+
+def test_trapezoidal_times_match_scalar(calculator):
+    distances = np.array([0.0, 0.01, 1.0, 40.0, 80.0, 500.0])
+    expected = [calculator._calculate_travel_time(d, 200.0) for d in distances]
+    result = KinematicsEngine.trapezoidal_times(distances, 200.0, 500.0)
+    assert result == pytest.approx(expected, rel=1e-12)
+
+def test_transit_times_match_summed_trapezoids():
+    entities = mixed_job(300)
+    store, indices = GeometryStore.for_entities(entities)
+    job = flatten_job(store, indices)
+    speeds = np.array([50.0, 200.0, 2000.0])
+    accelerations = np.array([100.0, 500.0, 3000.0])
+    expected = KinematicsEngine.trapezoidal_times(job.move_distances, speeds[:, None], accelerations[:, None]).sum(axis=1)
+    assert KinematicsEngine.transit_times(job, speeds, accelerations) == pytest.approx(expected, rel=1e-12)
+
+def test_vectorized_total_job_matches_scalar(calculator):
+    entities = mixed_job(200)
+    vectorized = calculator.calculate_total_job(entities)
+    scalar = calculator.calculate_total_job_scalar(entities)
+
+    for key in ('estimated_total_time_seconds', 'transit_time_seconds',
+                'total_distance_burned_mm', 'total_distance_transit_mm'):
+        assert vectorized[key] == pytest.approx(scalar[key], rel=1e-6)
+    for layer, values in scalar['layer_breakdown'].items():
+        for metric, value in values.items():
+            assert vectorized['layer_breakdown'][layer][metric] == pytest.approx(value, rel=1e-6)
+
+def test_flatten_job_counts_segments():
+    entity = LaserEntity(path=Path("M 0 0 L 10 0 L 10 10 Z"), color_hex='#FF0000', process_type='cut')
+    store, indices = GeometryStore.for_entities([entity])
+    job = flatten_job(store, indices)
+    assert len(job.junction_process) == 3
+    assert len(job.move_distances) == 1
+    assert list(job.dwell_process) == [0]
+
+def planned_time(d, speed=50.0, acceleration=500.0, deviation=0.01):
+    entity = LaserEntity(path=Path(d), color_hex='#00FF00', process_type='mark')
+    store, indices = GeometryStore.for_entities([entity])
+    job = flatten_job(store, indices)
+    times = KinematicsEngine.planned_piece_times(
+        job, np.full((1, len(job.piece_lengths)), speed), np.array([[acceleration]]), np.array([[deviation]])
+    )
+    return times.sum()
+
+def reference_planner(lengths, directions, speed, acceleration, deviation):
+    """Plain forward/backward passes over one run, as firmware planners do."""
+    count = len(lengths)
+    limits = [0.0]
+    for i in range(1, count):
+        cos_theta = -float(np.dot(directions[i - 1], directions[i]))
+        sin_half = np.sqrt(max(0.0, 0.5 * (1 - cos_theta)))
+        junction = acceleration * deviation * sin_half / (1 - sin_half) if sin_half < 1 else np.inf
+        limits.append(min(junction, speed ** 2))
+    limits.append(0.0)
+
+    speeds = list(limits)
+    for i in range(count):
+        speeds[i + 1] = min(speeds[i + 1], speeds[i] + 2 * acceleration * lengths[i])
+    for i in reversed(range(count)):
+        speeds[i] = min(speeds[i], speeds[i + 1] + 2 * acceleration * lengths[i])
+
+    total = 0.0
+    for i in range(count):
+        entry, exit_ = speeds[i], speeds[i + 1]
+        peak_sq = min(speed ** 2, acceleration * lengths[i] + (entry + exit_) / 2)
+        ramp = (2 * peak_sq - entry - exit_) / (2 * acceleration)
+        total += (2 * np.sqrt(peak_sq) - np.sqrt(entry) - np.sqrt(exit_)) / acceleration
+        total += max(lengths[i] - ramp, 0.0) / np.sqrt(peak_sq)
+    return total
+
+def test_lookahead_straight_line_is_one_trapezoid():
+    # Accelerate to 50 mm/s over 2.5 mm, cruise, decelerate: 100 / 50 + 50 / 500
+    assert planned_time("M 0 0 L 100 0") == pytest.approx(2.1)
+    # Splitting the line into collinear pieces costs nothing extra
+    assert planned_time("M 0 0 " + " ".join(f"L {x} 0" for x in range(1, 101))) == pytest.approx(2.1)
+
+def test_lookahead_reversal_stops_the_head():
+    single = planned_time("M 0 0 L 100 0")
+    assert planned_time("M 0 0 L 100 0 L 0 0") == pytest.approx(2 * single)
+
+def test_lookahead_matches_sequential_planner():
+    rng = np.random.default_rng(3)
+    points = np.cumsum(rng.uniform(-3, 3, size=(400, 2)), axis=0)
+    d = "M 0 0 " + " ".join(f"L {x} {y}" for x, y in points)
+    steps = np.diff(np.vstack([[0, 0], points]), axis=0)
+    lengths = np.hypot(steps[:, 0], steps[:, 1])
+    expected = reference_planner(lengths, steps / lengths[:, None], 50.0, 500.0, 0.05)
+    assert planned_time(d, deviation=0.05) == pytest.approx(expected, rel=1e-9)
+
+def test_lookahead_is_cheaper_than_constant_delay_on_curves():
+    entity = LaserEntity(path=Path("M 0 0 A 20 20 0 1 1 0 0.1"), color_hex='#FF0000', process_type='cut')
+    constant = LaserTimeCalculator(10.0, 50.0, 100.0, 200.0, junction_model='constant')
+    lookahead = LaserTimeCalculator(10.0, 50.0, 100.0, 200.0)
+    length = constant.calculate_total_job([entity])['total_distance_burned_mm']
+    planned = lookahead.calculate_total_job([entity])['layer_breakdown']['cut']['time']
+    # A smooth circle runs at nearly full speed: only the two ramps and the dwell are added
+    assert planned == pytest.approx(length / 10.0 + 10.0 / 500.0 + 0.1, rel=1e-3)
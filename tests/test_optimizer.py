@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from svgelements import Path
+from src.parsers.svg_parser import LaserEntity
+from src.engine.optimizer import (
+    TransitOptimizer, entity_endpoints, nearest_neighbour_reference
+)
+
+def random_endpoints(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 500, size=(count, 2))
+    ends = starts + rng.uniform(-5, 5, size=(count, 2))
+    valid = np.ones(count, dtype=bool)
+    return starts, ends, valid
+
+@pytest.mark.parametrize("count", [1, 2, 50, 700])
+def test_optimizer_matches_reference(count):
+    starts, ends, valid = random_endpoints(count, seed=count)
+    expected = nearest_neighbour_reference(starts, ends, valid)
+    result = TransitOptimizer().order(starts, ends, valid)
+    assert list(result) == expected
+
+def test_optimizer_breaks_ties_by_index():
+    # A grid has many equidistant candidates, every tie must resolve to the lowest index
+    xs, ys = np.meshgrid(np.arange(20.0), np.arange(20.0))
+    starts = np.column_stack([xs.ravel(), ys.ravel()])
+    valid = np.ones(len(starts), dtype=bool)
+    valid[[3, 77]] = False
+    expected = nearest_neighbour_reference(starts, starts, valid)
+    result = TransitOptimizer(initial_k=2).order(starts, starts, valid)
+    assert list(result) == expected
+    assert list(result[:2]) == [3, 77]
+
+def test_entity_endpoints_use_first_drawn_point():
+    entity = LaserEntity(path=Path("M 5 5 L 10 5 L 10 10"), color_hex='#FF0000', process_type='cut')
+    starts, ends, valid = entity_endpoints([entity])
+    assert tuple(starts[0]) == (5.0, 5.0)
+    assert tuple(ends[0]) == (10.0, 10.0)
+    assert valid[0]
+
+def test_calculator_orders_by_distance():
+    from src.engine.calculator import LaserTimeCalculator
+    far = LaserEntity(path=Path("M 100 100 L 110 100"), color_hex='#FF0000', process_type='cut')
+    near = LaserEntity(path=Path("M 1 1 L 2 1"), color_hex='#FF0000', process_type='cut')
+    calculator = LaserTimeCalculator(10.0, 50.0, 100.0, 200.0)
+    assert calculator.optimize_transit_path([far, near]) == [near, far]
+
+def test_optimizer_respects_precedence():
+    starts, ends, valid = random_endpoints(300, seed=5)
+    rng = np.random.default_rng(5)
+    # Random forest: every entity may depend on one with a higher index
+    parents = np.where(rng.random(300) < 0.6, rng.integers(0, 300, size=300), -1)
+    parents = np.where(parents > np.arange(300), parents, -1)
+
+    expected = nearest_neighbour_reference(starts, ends, valid, parents=parents)
+    result = TransitOptimizer().order(starts, ends, valid, parents=parents)
+    assert list(result) == expected
+    position = np.empty(300, dtype=np.int64)
+    position[result] = np.arange(300)
+    nested = parents >= 0
+    assert (position[nested] < position[parents[nested]]).all()
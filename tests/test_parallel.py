@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from src.parsers import parallel
+from src.parsers.parallel import split_document
+from src.parsers.svg_parser import SVGParser
+from src.utils.diagnostics import Diagnostics
+
+def sheet(groups: int = 6, per_group: int = 5) -> bytes:
+    """Groups with their own transforms and inherited colours, plus a <use> of a shared symbol."""
+    elements = ['<defs><circle id="hole" r="1.5" stroke="#FF0000" fill="none"/></defs>']
+    for g in range(groups):
+        elements.append(f'<g transform="translate({g * 40} 10) rotate({g * 7})" stroke="#00FF00" fill="none">')
+        for i in range(per_group):
+            elements.append(f'<path d="M {i * 5} 0 c 2 6 5 -6 8 0 a 3 2 20 0 1 4 4"/>')
+            elements.append(f'<rect x="{i * 5}" y="12" width="4" height="3" fill="#0000FF" stroke="none"/>')
+        elements.append(f'<use href="#hole" x="{g * 3}" y="25"/>')
+        elements.append('</g>')
+    return ('<svg xmlns="http://www.w3.org/2000/svg" width="300" height="120" viewBox="0 0 300 120">'
+            + ''.join(elements) + '</svg>').encode()
+
+def test_split_document_keeps_context_of_every_element(monkeypatch):
+    monkeypatch.setattr(parallel, 'MIN_SHARD_ELEMENTS', 1)
+    shards = split_document(sheet(), 3)
+    assert len(shards) == 3
+    for shard in shards:
+        # Every shard is a full document with the viewBox, the shared <defs> and the group transforms
+        assert b'viewBox="0 0 300 120"' in shard
+        assert b'id="hole"' in shard
+        assert b'transform="translate(' in shard
+
+    # A <use> of an element outside the shared containers cannot be split
+    assert split_document(sheet().replace(b'href="#hole"', b'href="#missing"'), 3) is None
+    # Too small to be worth it
+    monkeypatch.setattr(parallel, 'MIN_SHARD_ELEMENTS', 10**6)
+    assert split_document(sheet(), 3) is None
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_parallel_parse_matches_serial_parse(monkeypatch, streaming):
+    monkeypatch.setattr(parallel, 'MIN_SHARD_ELEMENTS', 1)
+    data = sheet()
+    serial = SVGParser(data, ppi=25.4)
+    serial.parse(streaming=streaming)
+    diagnostics = Diagnostics()
+    sharded = SVGParser(data, ppi=25.4)
+    sharded.parse(streaming=streaming, diagnostics=diagnostics, workers=2)
+
+    assert diagnostics.counters['parse.shards'] == 2
+    assert [(e.process_type, e.color_hex, e.index) for e in sharded.entities] == \
+        [(e.process_type, e.color_hex, e.index) for e in serial.entities]
+    for name in ('vertices', 'vertex_flags', 'segment_lengths', 'entity_offsets', 'process_codes', 'bboxes'):
+        assert np.array_equal(getattr(sharded.store, name), getattr(serial.store, name))
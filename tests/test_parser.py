@@ -50,3 +50,127 @@ def test_parser_detects_cut_mark_raster(parser_env):
     raster_entities = [e for e in entities if e.process_type == 'raster']
     assert len(raster_entities) == 1
     assert raster_entities[0].color_hex == '#0000FF'
+
+def test_parser_fills_geometry_store(parser_env):
+    svg_content = """<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="0" y="0" width="96" height="96" stroke="#FF0000" fill="none" />
+    <line x1="0" y1="0" x2="96" y2="0" stroke="#00FF00" />
+</svg>
+    """
+    svg_file = os.path.join(parser_env, "store.svg")
+    create_svg(svg_file, svg_content)
+
+    parser = SVGParser(svg_file, ppi=96.0)
+    entities = parser.parse()
+
+    assert all(e.store is parser.store and e.path is None for e in entities)
+    assert [e.index for e in entities] == [0, 1]
+    # 96 px at 96 ppi = 25.4 mm per side
+    assert parser.store.entity_length(0) == pytest.approx(4 * 25.4)
+    assert tuple(parser.store.bboxes[1]) == pytest.approx((0.0, 0.0, 25.4, 0.0))
+
+    kept = SVGParser(svg_file, ppi=96.0, keep_paths=True).parse()
+    assert kept[0].path is not None
+
+def test_streaming_parse_matches_document_parse(parser_env):
+    svg_content = """<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="200mm" height="100mm" viewBox="0 0 400 200">
+    <defs>
+        <rect id="hidden" x="0" y="0" width="10" height="10" stroke="#FF0000" />
+    </defs>
+    <g transform="translate(10, 20)" stroke="#00FF00" fill="none">
+        <rect x="10" y="10" width="20" height="20" />
+        <g style="stroke:#FF0000" transform="scale(2)">
+            <circle cx="50" cy="50" r="10" />
+            <path d="M 0 0 C 10 10 20 10 30 0" stroke-opacity="0.5" />
+        </g>
+    </g>
+    <polygon points="70,10 90,10 80,30" stroke="none" fill="#0000FF" />
+    <line x1="0" y1="0" x2="100" y2="100" stroke="#000000" />
+    <g display="none"><rect x="1" y="1" width="5" height="5" stroke="#FF0000" /></g>
+</svg>
+    """
+    svg_file = os.path.join(parser_env, "stream.svg")
+    create_svg(svg_file, svg_content)
+
+    document = SVGParser(svg_file, ppi=25.4)
+    document.parse()
+    streamed = SVGParser(svg_file, ppi=25.4)
+    streamed.parse(streaming=True)
+
+    assert [e.process_type for e in streamed.entities] == ['mark', 'cut', 'raster']
+    assert [e.color_hex for e in streamed.entities] == [e.color_hex for e in document.entities]
+    assert list(streamed.store.entity_offsets) == list(document.store.entity_offsets)
+    assert streamed.store.vertices == pytest.approx(document.store.vertices)
+    assert streamed.store.segment_lengths == pytest.approx(document.store.segment_lengths)
+
+def test_iter_entities_yields_paths(parser_env):
+    svg_content = """<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="0" y="0" width="10" height="10" stroke="#FF0000" fill="none" />
+    <rect x="20" y="0" width="10" height="10" stroke="#123456" fill="none" />
+</svg>"""
+    svg_file = os.path.join(parser_env, "iter.svg")
+    create_svg(svg_file, svg_content)
+
+    entities = list(SVGParser(svg_file).iter_entities())
+    assert len(entities) == 1
+    assert entities[0].path is not None
+    assert entities[0].process_type == 'cut'
+
+def test_parser_accepts_bytes_and_file_objects(parser_env):
+    import io
+    svg_content = b"""<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="0" y="0" width="10" height="10" stroke="#FF0000" fill="none" />
+    <circle cx="50" cy="50" r="10" stroke="#00FF00" fill="none" />
+</svg>"""
+    from_bytes = SVGParser(svg_content).parse()
+    buffer = io.BytesIO(svg_content)
+    buffer.read()  # A consumed buffer is rewound by the parser
+    from_buffer = SVGParser(buffer).parse(streaming=True)
+
+    assert [e.process_type for e in from_bytes] == ['cut', 'mark']
+    assert [e.process_type for e in from_buffer] == ['cut', 'mark']
+
+def test_document_parse_drops_shapes_that_are_never_laser():
+    from src.utils.diagnostics import Diagnostics
+    svg_content = b"""<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="0" y="0" width="10" height="10" stroke="#000000" fill="none" />
+    <rect x="0" y="0" width="10" height="10" style="stroke:#FF000080;fill:none" />
+    <g fill="#0000FF"><rect x="20" y="0" width="10" height="10" stroke="black" /></g>
+    <circle cx="50" cy="50" r="10" stroke="#00FF00" fill="none" />
+</svg>"""
+    diagnostics = Diagnostics()
+    entities = SVGParser(svg_content).parse(diagnostics=diagnostics)
+    # The semi-transparent red is a laser colour without its alpha, so svgelements decides (and skips it)
+    assert diagnostics.counters['parse.prefiltered'] == 1
+    assert [e.process_type for e in entities] == ['raster', 'mark']
+
+    # A stylesheet may restyle any shape, so nothing is dropped
+    styled = b"""<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <style>.outline { stroke: #FF0000 }</style>
+    <rect class="outline" x="0" y="0" width="10" height="10" stroke="#000000" fill="none" />
+</svg>"""
+    diagnostics = Diagnostics()
+    entities = SVGParser(styled).parse(diagnostics=diagnostics)
+    assert 'parse.prefiltered' not in diagnostics.counters
+    assert [e.process_type for e in entities] == ['cut']
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_batched_scale_matches_scaled_paths(streaming):
+    svg_content = b"""<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <g transform="rotate(30) translate(5 5)">
+        <path d="M 0 0 C 10 20 30 -10 40 10 A 8 4 15 0 1 60 10" stroke="#FF0000" fill="none" />
+        <ellipse cx="50" cy="50" rx="10" ry="4" fill="#0000FF" />
+    </g>
+</svg>"""
+    # Kept paths are scaled one by one; otherwise the flattened pixels are scaled in one pass
+    scaled = SVGParser(svg_content, ppi=72, keep_paths=True)
+    scaled.parse(streaming=streaming)
+    batched = SVGParser(svg_content, ppi=72)
+    batched.parse(streaming=streaming)
+
+    assert scaled.store.vertices == pytest.approx(batched.store.vertices)
+    assert scaled.store.segment_lengths == pytest.approx(batched.store.segment_lengths)
+    assert scaled.store.bboxes == pytest.approx(batched.store.bboxes)
+    assert scaled.entities[0].path.length() == pytest.approx(batched.store.entity_length(0), rel=1e-4)
@@ -0,0 +1,44 @@
+import io
+import numpy as np
+import pytest
+from src.engine.plan import JobPlan
+
+@pytest.mark.parametrize("merge_raster", [False, True])
+def test_plan_evaluates_like_full_calculation(merge_raster, sample_entities, make_calculator):
+    entities = sample_entities
+    plan = make_calculator(merge_raster=merge_raster).plan_job(entities)
+    assert sorted(plan.order.tolist()) == list(range(len(entities)))
+    for overrides in ({}, {'cut_speed': 25.0, 'acceleration': 1500.0}, {'scan_gap': 0.2, 'raster_model': 'bbox'}):
+        calculator = make_calculator(merge_raster=merge_raster, **overrides)
+        assert calculator.evaluate_plan(plan) == calculator.calculate_total_job(entities)
+
+def test_plan_rejects_other_merge_setting(sample_entities, make_calculator):
+    plan = make_calculator().plan_job(sample_entities)
+    with pytest.raises(ValueError):
+        make_calculator(merge_raster=True).evaluate_plan(plan)
+
+def test_plan_save_load_round_trip(sample_entities, make_calculator):
+    plan = make_calculator(merge_raster=True, refine_seconds=0.2).plan_job(sample_entities)
+    buffer = io.BytesIO()
+    plan.save(buffer)
+    buffer.seek(0)
+    loaded = JobPlan.load(buffer)
+
+    assert np.array_equal(loaded.order, plan.order)
+    assert loaded.merge_raster and loaded.sections == plan.sections
+    assert np.array_equal(loaded.job.store.vertices, plan.job.store.vertices)
+    calculator = make_calculator(merge_raster=True, transit_speed=120.0)
+    assert calculator.evaluate_plan(loaded) == calculator.evaluate_plan(plan)
+
+def test_plan_load_rejects_other_versions():
+    buffer = io.BytesIO()
+    np.savez(buffer, version=np.array(99))
+    buffer.seek(0)
+    with pytest.raises(ValueError):
+        JobPlan.load(buffer)
+
+def test_plan_keeps_a_bounded_number_of_scan_gaps(sample_entities, make_calculator):
+    plan = make_calculator().plan_job(sample_entities)
+    for gap in (0.05, 0.1, 0.15, 0.2, 0.25, 0.3):
+        make_calculator(scan_gap=gap).evaluate_plan(plan)
+    assert list(plan.job._raster_plans) == [0.15, 0.2, 0.25, 0.3]
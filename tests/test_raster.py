@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from src.engine.raster import MergedRasterPlan, raster_bands, scan_lines
+
+def test_scan_lines_rectangle(build_store):
+    store = build_store("M 0 0 L 10 0 L 10 5 L 0 5 Z", process='raster')
+    lines = scan_lines(store, np.arange(1), 1.0)
+    assert len(lines) == 5
+    assert list(lines.y) == pytest.approx([0.5, 1.5, 2.5, 3.5, 4.5])
+    assert lines.extents == pytest.approx(np.full(5, 10.0))
+
+def test_scan_lines_keep_outer_extent_of_rings(build_store):
+    # Square frame: the hole does not shorten the sweep, it runs from the first to the last crossing
+    store = build_store("M 0 0 L 10 0 L 10 10 L 0 10 Z M 3 3 L 7 3 L 7 7 L 3 7 Z", process='raster')
+    lines = scan_lines(store, np.arange(1), 1.0)
+    assert len(lines) == 10
+    assert lines.x_start == pytest.approx(np.zeros(10))
+    assert lines.x_end == pytest.approx(np.full(10, 10.0))
+
+def test_scan_lines_close_open_subpaths_and_track_entities(build_store):
+    # An open "L" shape is filled as if closed back to its start
+    store = build_store("M 0 0 L 4 0 L 4 2 L 0 2 Z", "M 10 0 L 20 0 L 10 10", process='raster')
+    lines = scan_lines(store, np.array([1, 0]), 1.0)
+    assert list(lines.entity) == [0] * 10 + [1] * 2
+    triangle = lines.extents[:10]
+    assert triangle == pytest.approx(10.0 - (np.arange(10) + 0.5))
+    assert lines.x_start[:10] == pytest.approx(np.full(10, 10.0))
+
+def test_scan_lines_empty_selection(build_store):
+    store = build_store("M 0 0 L 10 0 L 10 5 Z", process='raster')
+    assert len(scan_lines(store, np.zeros(0, dtype=np.int64), 0.1)) == 0
+
+def test_raster_bands_group_overlapping_y_ranges():
+    bboxes = np.array([
+        [0, 0, 10, 5],
+        [50, 4, 60, 8],    # overlaps the first block
+        [0, 20, 10, 30],   # separate band
+        [20, 8, 30, 12],   # touches the second block
+    ], dtype=float)
+    assert list(raster_bands(bboxes)) == [0, 0, 1, 0]
+
+def test_merged_plan_sweeps_through_narrow_gaps(build_store):
+    # Two 10 x 5 blocks on the same rows, 2 mm apart
+    store = build_store("M 0 0 L 10 0 L 10 5 L 0 5 Z", "M 12 0 L 22 0 L 22 5 L 12 5 Z", process='raster')
+    indices = np.arange(2)
+    plan = MergedRasterPlan(scan_lines(store, indices, 1.0, raster_bands(store.bboxes)), 1)
+    assert plan.line_count == 5
+
+    # Overscan of 0.5 mm per side: the 2 mm gap is cheaper to stop at, and the 1 mm between
+    # the two overscans is a triangular transit move of 2 * sqrt(1 / 100) s on each line
+    figures = plan.sweep_figures(np.array([10.0]), np.array([100.0]), np.array([50.0]))
+    assert figures['sweeps'][0] == 10
+    assert figures['merged_time'][0] == pytest.approx(100 / 10 + 10 * 0.2 + 5 * 0.2)
+    assert figures['per_entity_time'][0] == pytest.approx(100 / 10 + 10 * 0.2)
+
+    # Overscan of 2 mm per side: one sweep per line across both blocks
+    figures = plan.sweep_figures(np.array([20.0]), np.array([100.0]), np.array([50.0]))
+    assert figures['sweeps'][0] == 5
+    assert figures['merged_time'][0] == pytest.approx(110 / 20 + 5 * 0.4)
+    assert figures['per_entity_time'][0] == pytest.approx(100 / 20 + 10 * 0.4)
+
+def test_merged_plan_charges_the_move_across_wide_gaps(build_store):
+    def merged_time(gap):
+        store = build_store("M 0 0 L 10 0 L 10 5 L 0 5 Z",
+                            f"M {10 + gap} 0 L {20 + gap} 0 L {20 + gap} 5 L {10 + gap} 5 Z", process='raster')
+        plan = MergedRasterPlan(scan_lines(store, np.arange(2), 1.0, raster_bands(store.bboxes)), 1)
+        return plan.sweep_figures(np.array([10.0]), np.array([100.0]), np.array([50.0]))['merged_time'][0]
+
+    near, far = merged_time(5.0), merged_time(500.0)
+    # Five lines, each moving 499 mm (trapezoidal) instead of 4 mm (triangular) between the overscans
+    assert far - near == pytest.approx(5 * ((2 * 0.5 + (499 - 25) / 50) - 2 * np.sqrt(4 / 100)))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from src.engine.kinematics import flatten_job
+from src.engine.optimizer import transit_order
+from src.engine.refine import TourRefiner
+
+def transit_distance(store, indices):
+    return float(flatten_job(store, indices).move_distances.sum())
+
+def test_refine_reverses_open_paths(build_store):
+    # Nearest-neighbour enters the second line at its far end; burning it backwards saves 18 mm
+    store = build_store(("M 0 0 L 10 0", 'cut'), ("M 30 0 L 12 0", 'cut'))
+    tour = TourRefiner(time_budget=1.0).refine(store, np.arange(2))
+    assert tour.positions.tolist() == [0, 1]
+    assert tour.reverse.tolist() == [False, True]
+    assert tour.distance_before == pytest.approx(20.0)
+    assert tour.distance_after == pytest.approx(2.0)
+
+    oriented = store.oriented(tour.positions, tour.reverse, tour.start_vertex)
+    assert transit_distance(oriented, np.arange(2)) == pytest.approx(2.0)
+    assert oriented.segment_lengths.sum() == pytest.approx(store.segment_lengths.sum())
+
+def test_refine_rotates_closed_contours_and_keeps_raster(build_store):
+    store = build_store(
+        ("M 0 0 L 1 0", 'cut'),
+        ("M 10 10 L 20 10 L 20 20 L 10 20 Z", 'cut'),
+        ("M 40 0 L 30 0 L 30 5 Z", 'raster'),
+    )
+    tour = TourRefiner(time_budget=1.0).refine(store, np.arange(3))
+    assert not tour.reverse[tour.positions == 2].any()
+    oriented = store.oriented(tour.positions, tour.reverse, tour.start_vertex)
+    assert transit_distance(oriented, np.arange(3)) == pytest.approx(tour.distance_after)
+    assert tour.distance_after < tour.distance_before
+    assert tour.moves['rotation'] >= 1
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_refine_never_lengthens_nearest_neighbour_tour(seed, build_store):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(300):
+        x, y = rng.uniform(0, 200, 2)
+        if i % 3:
+            dx, dy = rng.uniform(-8, 8, 2)
+            paths.append((f"M {x} {y} l {dx} {dy} l {dy} {-dx}", 'cut'))
+        else:
+            paths.append((f"M {x} {y} h 4 v 4 h -4 Z", 'mark'))
+    store = build_store(*paths)
+    indices = np.arange(len(store))
+    ordered = indices[transit_order(store, indices)]
+
+    tour = TourRefiner(time_budget=0.5).refine(store, ordered)
+    assert sorted(tour.positions.tolist()) == list(range(len(store)))
+    assert tour.distance_before == pytest.approx(transit_distance(store, ordered))
+    assert tour.distance_after < tour.distance_before
+
+    oriented = store.oriented(ordered[tour.positions], tour.reverse, tour.start_vertex)
+    assert transit_distance(oriented, indices) == pytest.approx(tour.distance_after)
+    assert oriented.segment_lengths.sum() == pytest.approx(store.segment_lengths.sum())
+
+def test_refine_keeps_inner_contours_first(build_store):
+    store = build_store(
+        ("M 50 50 H 55 V 55 H 50 Z", 'cut'),
+        ("M 60 60 H 65 V 65 H 60 Z", 'cut'),
+        ("M 0 0 L 1 0", 'cut'),
+    )
+    # Cutting the last entity first is shorter, but it has to wait for the other two
+    free = TourRefiner(time_budget=1.0).refine(store, np.arange(3))
+    assert free.positions.tolist()[0] == 2
+
+    tour = TourRefiner(time_budget=1.0).refine(store, np.arange(3), parents=np.array([2, 2, -1]))
+    assert tour.positions.tolist()[-1] == 2
+    assert tour.distance_after <= tour.distance_before
+
+def test_refine_stops_after_a_fixed_step_count(build_store):
+    rng = np.random.default_rng(5)
+    store = build_store(*[(f"M {x} {y} l 3 1", 'cut') for x, y in rng.uniform(0, 200, size=(200, 2))])
+    ordered = np.arange(len(store))[transit_order(store, np.arange(len(store)))]
+
+    first = TourRefiner(time_budget=60.0, max_steps=40).refine(store, ordered)
+    second = TourRefiner(time_budget=60.0, max_steps=40).refine(store, ordered)
+    assert (first.steps, first.timed_out) == (40, False)
+    assert first.positions.tolist() == second.positions.tolist()
+    assert first.reverse.tolist() == second.reverse.tolist()
+
+    # The wall clock still bounds the search, and says so
+    assert TourRefiner(time_budget=0.0, max_steps=10 ** 9).refine(store, ordered).timed_out
@@ -0,0 +1,54 @@
+import io
+import os
+import stat
+import subprocess
+import sys
+import time
+import pytest
+from src.main import build_parser, run
+from src.server import forward
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">
+    <rect x="10" y="10" width="20" height="20" stroke="#FF0000" fill="none" />
+    <circle cx="60" cy="60" r="10" stroke="#00FF00" fill="none" />
+</svg>"""
+
+ARGUMENTS = ['--cut_speed', '10', '--vector_engrave_speed', '50', '--raster_engrave_speed', '100',
+             '--transit_speed', '200']
+
+def test_cli_parses_arguments_without_the_engine():
+    code = "import sys; from src.main import build_parser; build_parser(); print(sorted({'numpy', 'scipy', 'svgelements'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    assert output.strip() == '[]'
+
+def test_forward_without_server_runs_locally(tmp_path):
+    assert forward(str(tmp_path / 'missing.sock'), ['--help']) is None
+
+def test_warm_server_output_matches_local_run(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'job.svg').write_text(SVG)
+    socket_path = str(tmp_path / 'laser.sock')
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'src', 'server.py'), socket_path],
+                              stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while not os.path.exists(socket_path):
+            if server.poll() is not None or time.monotonic() > deadline:
+                pytest.fail("The server did not start")
+            time.sleep(0.05)
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+        # Relative paths resolve against the caller's working directory
+        monkeypatch.chdir(tmp_path)
+        local = io.StringIO()
+        assert run(build_parser().parse_args(['job.svg'] + ARGUMENTS), local) == 0
+        for _ in range(2):
+            assert forward(socket_path, ['job.svg'] + ARGUMENTS) == 0
+            assert capsys.readouterr().out == local.getvalue()
+        assert forward(socket_path, ['missing.svg'] + ARGUMENTS) == 1
+        assert 'File not found: missing.svg' in capsys.readouterr().out
+    finally:
+        server.terminate()
+        server.wait()
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,69 @@
+import io
+import json
+import numpy as np
+import pytest
+from src.engine.timeline import MOVE, ROW_BYTES, TIMELINE_PROCESSES, Timeline
+
+@pytest.mark.parametrize("overrides", [
+    {},
+    {'junction_model': 'constant'},
+    {'raster_model': 'bbox'},
+    {'merge_raster': True},
+])
+def test_timeline_adds_up_to_report_total(overrides, sample_entities, make_calculator):
+    entities = sample_entities
+    report = make_calculator(**overrides).calculate_total_job(entities, timeline=True)
+    timeline = report['timeline']
+    assert timeline.total_time == pytest.approx(report['estimated_total_time_seconds'], abs=0.01)
+    assert (timeline.duration >= 0).all()
+    assert np.all(np.diff(timeline.t_start) >= -1e-9)
+
+def test_timeline_rows_name_input_entities_and_processes(sample_entities, make_calculator):
+    entities = sample_entities
+    timeline = make_calculator().calculate_total_job(entities, timeline=True)['timeline']
+    burned = timeline.process != MOVE
+    assert set(timeline.entity[burned].tolist()) == set(range(len(entities)))
+    for row in np.flatnonzero(burned):
+        entity = entities[timeline.entity[row]]
+        assert TIMELINE_PROCESSES[timeline.process[row]] == entity.process_type
+
+def test_plan_timeline_matches_full_calculation(sample_entities, make_calculator):
+    entities = sample_entities
+    calculator = make_calculator()
+    plan = calculator.plan_job(entities, timeline=True)
+    assert plan.has_timeline
+    from_plan = calculator.evaluate_plan(plan, timeline=True)['timeline']
+    direct = calculator.calculate_total_job(entities, timeline=True)['timeline']
+    assert from_plan.entity.tolist() == direct.entity.tolist()
+    assert from_plan.duration == pytest.approx(direct.duration)
+    with pytest.raises(ValueError):
+        calculator.evaluate_plan(calculator.plan_job(entities), timeline=True)
+
+def test_downsample_keeps_total_time():
+    rng = np.random.default_rng(0)
+    count = 5000
+    timeline = Timeline.from_durations(rng.uniform(0, 0.1, count), rng.uniform(0, 100, (count, 2)),
+                                       rng.integers(0, len(TIMELINE_PROCESSES), count), np.arange(count))
+    small = timeline.downsample(100)
+    assert len(small) <= 100
+    assert small.total_time == pytest.approx(timeline.total_time)
+    assert small.duration.sum() == pytest.approx(timeline.duration.sum())
+    assert timeline.downsample(count) is timeline
+
+def test_binary_round_trip_and_ndjson(sample_entities, make_calculator):
+    timeline = make_calculator().calculate_total_job(sample_entities, timeline=True)['timeline']
+    data = timeline.to_bytes()
+    buffer = io.BytesIO()
+    timeline.write(buffer)
+    assert buffer.getvalue() == data
+    loaded = Timeline.from_bytes(data)
+    assert len(data) == 24 + len(timeline) * ROW_BYTES
+    assert loaded.entity.tolist() == timeline.entity.tolist()
+    assert loaded.t_start == pytest.approx(timeline.t_start, abs=1e-3)
+    with pytest.raises(ValueError):
+        Timeline.from_bytes(b'XXXX' + data[4:])
+
+    rows = [json.loads(line) for line in timeline.iter_ndjson()]
+    assert len(rows) == len(timeline)
+    assert set(rows[0]) == {'t_start', 'duration', 'x', 'y', 'process_type', 'entity_index'}
+    assert rows[0]['process_type'] in TIMELINE_PROCESSES